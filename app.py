@@ -1,18 +1,69 @@
+import atexit
+from datetime import datetime
+
 from flask import Flask, _app_ctx_stack
 from flask_apscheduler import APScheduler
 from sqlalchemy.orm import scoped_session
 
+from cws.api.capture import FeedRecorder
+from cws.api.feed_client import FeedClient
+from cws.bots.bot_manager import BotManager
 from cws.config import AppConfig
+from cws.core.adaptive_scheduler import AdaptiveScheduler
 from cws.core.status_monitor import StatusMonitor
 from cws.core.scanner import Scanner
 from cws.database import SessionLocal
 from cws.redis_manager import RedisManager
+from cws.update_broadcaster import UpdateBroadcaster
 from cws.views.app import bp as app_bp
 from cws.views.auth import bp as auth_bp
 from cws.views.config import bp as config_bp
 from cws.views.bots import bp as bot_bp
 
 
+def create_scanner() -> Scanner:
+    # Feed responses are recorded for replay when a capture file is configured
+    capture_path = AppConfig.get(AppConfig.Variables.SCANNER_CAPTURE_PATH)
+    feed_client = FeedClient(recorder=FeedRecorder(capture_path)) if capture_path else None
+
+    # noinspection PyTypeChecker
+    return Scanner(
+        scoped_session(SessionLocal),
+        pipelined=AppConfig.get(AppConfig.Variables.SCANNER_PIPELINED),
+        sharded_fetch=AppConfig.get(AppConfig.Variables.SCANNER_SHARDED_FETCH),
+        streaming=AppConfig.get(AppConfig.Variables.SCANNER_STREAMING_DECODE),
+        snapshot_engine=AppConfig.get(AppConfig.Variables.SCANNER_SNAPSHOT_ENGINE),
+        workers=AppConfig.get(AppConfig.Variables.SCANNER_WORKERS),
+        feed_client=feed_client
+    )
+
+
+def schedule_core(scheduler, scanner: Scanner, cycle=None, bot_refresh=None):
+    # Works with both the Flask-APScheduler wrapper and a plain APScheduler scheduler
+    status_monitor = StatusMonitor()
+    cycle = cycle or scanner.cycle
+    bot_refresh = bot_refresh or BotManager(SessionLocal()).refresh
+
+    if AppConfig.get(AppConfig.Variables.SCANNER_ADAPTIVE_SCHEDULE):
+        scanner.scheduler = AdaptiveScheduler(
+            cycle, status_monitor,
+            target_period=AppConfig.get(AppConfig.Variables.SCANNER_TARGET_PERIOD),
+            min_period=AppConfig.get(AppConfig.Variables.SCANNER_MIN_PERIOD),
+            max_period=AppConfig.get(AppConfig.Variables.SCANNER_MAX_PERIOD),
+            min_gap=AppConfig.get(AppConfig.Variables.SCANNER_MIN_GAP)
+        )
+        scanner.scheduler.start()
+    else:
+        scheduler.add_job(func=cycle, trigger='interval', seconds=5, id=StatusMonitor.CYCLE_JOB_ID)
+
+    # Bookmaker and proxy requests of the bots run on their own schedule, away from the scan cycle
+    scheduler.add_job(
+        func=bot_refresh, trigger='interval', seconds=AppConfig.get(AppConfig.Variables.BOT_REFRESH_INTERVAL),
+        id=StatusMonitor.BOT_REFRESH_JOB_ID, next_run_time=datetime.now(), coalesce=True
+    )
+    scheduler.add_listener(status_monitor.scheduler_monitor, StatusMonitor.SUBSCRIBED_EVENTS)
+
+
 def init_app(launch_core: bool = True):
     app = Flask(__name__)
     app.secret_key = AppConfig.get(AppConfig.Variables.SECRET_KEY)
@@ -22,20 +73,18 @@ def init_app(launch_core: bool = True):
 
     # Redis
     app.redis_manager = RedisManager()
+    app.update_broadcaster = UpdateBroadcaster(app.redis_manager)
 
     if launch_core:
-        # Core
-        # noinspection PyTypeChecker
-        scanner = Scanner(scoped_session(SessionLocal))
-
-        # Status monitor
-        status_monitor = StatusMonitor()
+        # Core running inside the web process, for development with a single server process.
+        # In production the web workers are created by wsgi.py and the core runs in run_scanner.py.
+        scanner = create_scanner()
 
         # Scheduler
         scheduler = APScheduler(app=app)
-        scheduler.add_job(func=scanner.cycle, trigger='interval', seconds=5, id='Scanner cycle')
-        scheduler.add_listener(status_monitor.scheduler_monitor, StatusMonitor.SUBSCRIBED_EVENTS)
+        schedule_core(scheduler, scanner)
         scheduler.start()
+        atexit.register(scanner.stop)
 
     # Blueprints
     app.register_blueprint(app_bp)
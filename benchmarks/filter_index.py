@@ -0,0 +1,108 @@
+from argparse import ArgumentParser
+from random import Random
+from time import perf_counter
+from typing import Dict, List, Tuple
+
+from benchmarks.synthetic_feed import SyntheticFeed
+from cws.api.models import Event
+from cws.core.filter_index import FilterIndex
+
+
+def make_filters(events: List[Event], disabled_sports: float, disabled_markets: float,
+                 disabled_bets: float, seed: int) -> List[Tuple[int, int, int, int]]:
+    rng = Random(seed)
+    sports = {e.sport_id for e in events}
+    markets = {(e.sport_id, t.market_group_id) for e in events for t in e.tips}
+    bets = {(e.sport_id, t.market_group_id, t.bet_group_id) for e in events for t in e.tips}
+
+    enabled_sports = {s for s in sorted(sports) if rng.random() >= disabled_sports}
+    enabled_markets = {m for m in sorted(markets) if rng.random() >= disabled_markets}
+
+    return [
+        (sport_id, market_id, bet_id, 60)
+        for sport_id, market_id, bet_id in sorted(bets)
+        if sport_id in enabled_sports and (sport_id, market_id) in enabled_markets and rng.random() >= disabled_bets
+    ]
+
+
+def filter_flat(events: List[Event], filters: Dict[int, int]) -> int:
+    # Lookup as it was done before the index: one tuple hash per tip of every event
+    accepted = 0
+
+    for event in events:
+        for tip in event.tips:
+            if hash((event.sport_id, tip.market_group_id, tip.bet_group_id)) in filters:
+                accepted += 1
+
+    return accepted
+
+
+def filter_indexed(events: List[Event], index: FilterIndex) -> Tuple[int, int, int, int]:
+    accepted = skipped_by_sport = skipped_by_market = skipped_by_bet = 0
+
+    for event in events:
+        market_filters = index.get_sport_filters(event.sport_id)
+
+        if market_filters is None:
+            skipped_by_sport += len(event.tips)
+            continue
+
+        for tip in event.tips:
+            bet_filters = market_filters.get(tip.market_group_id)
+
+            if bet_filters is None:
+                skipped_by_market += 1
+            elif tip.bet_group_id not in bet_filters:
+                skipped_by_bet += 1
+            else:
+                accepted += 1
+
+    return accepted, skipped_by_sport, skipped_by_market, skipped_by_bet
+
+
+def best_of(repeat: int, f, *args) -> float:
+    best = float('inf')
+
+    for _ in range(repeat):
+        start = perf_counter()
+        f(*args)
+        best = min(best, perf_counter() - start)
+
+    return best
+
+
+def main():
+    parser = ArgumentParser(description='Tips rejected per cycle by the hierarchical filter index')
+    parser.add_argument('--events', type=int, default=2000)
+    parser.add_argument('--tips', type=int, default=40, help='tips per event')
+    parser.add_argument('--disabled-sports', type=float, default=0.3, help='fraction of sports disabled')
+    parser.add_argument('--disabled-markets', type=float, default=0.3, help='fraction of markets disabled')
+    parser.add_argument('--disabled-bets', type=float, default=0.2, help='fraction of bets disabled')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    events = Event.from_json_multiple(SyntheticFeed(args.events, args.tips, seed=args.seed).payload())
+    filters = make_filters(events, args.disabled_sports, args.disabled_markets, args.disabled_bets, args.seed)
+
+    flat = {hash((sport_id, market_id, bet_id)): trigger_time for sport_id, market_id, bet_id, trigger_time in filters}
+    index = FilterIndex(filters)
+
+    tip_count = sum(len(e.tips) for e in events)
+    accepted, by_sport, by_market, by_bet = filter_indexed(events, index)
+    assert accepted == filter_flat(events, flat)
+
+    flat_time = best_of(args.repeat, filter_flat, events, flat)
+    indexed_time = best_of(args.repeat, filter_indexed, events, index)
+
+    print(f'{args.events} events, {tip_count} tips, {len(index)} enabled bets')
+    print(f'accepted:            {accepted:8d}')
+    print(f'skipped by sport:    {by_sport:8d} ({100 * by_sport / tip_count:.1f} %, never touched)')
+    print(f'skipped by market:   {by_market:8d} ({100 * by_market / tip_count:.1f} %)')
+    print(f'skipped by bet:      {by_bet:8d} ({100 * by_bet / tip_count:.1f} %)')
+    print(f'flat hash lookup:    {flat_time * 1000:8.2f} ms/cycle')
+    print(f'filter index:        {indexed_time * 1000:8.2f} ms/cycle')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+import json
+import sys
+import tracemalloc
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+from io import StringIO
+from statistics import median
+from time import perf_counter
+from typing import Dict, List, Optional
+
+from benchmarks.standins import (InMemoryRedisManager, StaticFeedClient, TelegramNotifierStandIn, offline_session,
+                                 use_offline_environment)
+from benchmarks.synthetic_feed import SyntheticFeed
+from cws.api.models import Event, EventParseCache
+
+STAGES = ('decode', 'parse', 'parse_cached', 'snapshot_update', 'notifications')
+
+
+class StageRecorder:
+    def __init__(self, trace_memory: bool):
+        self.trace_memory = trace_memory
+        self.durations = {stage: [] for stage in STAGES}
+        self.peaks = dict.fromkeys(STAGES, 0)
+
+    def run(self, stage: str, func, *args):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+
+        start = perf_counter()
+        result = func(*args)
+        self.durations[stage].append(perf_counter() - start)
+
+        if self.trace_memory:
+            self.peaks[stage] = max(self.peaks[stage], tracemalloc.get_traced_memory()[1] - before)
+
+        return result
+
+
+def offline_scanner(events: List[Event], engine: str, trigger_time: int, idle_time: int, timestamp: datetime):
+    # A scanner built like the real one, on an in-memory database where every market of the events is enabled and
+    # with in-process services. Its feed is empty, the stages are fed by the benchmark.
+    from cws.core.scanner import Scanner
+    from cws.models import AppOption
+
+    session = offline_session(events, trigger_time, {
+        AppOption.OptionType.MIN_ODDS: 1.0,
+        AppOption.OptionType.MAX_ODDS: 100.0,
+        AppOption.OptionType.AUTO_BREAK_MIN_IDLE_TIME: idle_time,
+        AppOption.OptionType.TELEGRAM_NOTIFICATION_MIN_UPTIME: 0,
+        AppOption.OptionType.TELEGRAM_SECOND_NOTIFICATION_MIN_UPTIME: 0
+    })
+
+    # noinspection PyTypeChecker
+    return Scanner(
+        session,
+        snapshot_engine=engine,
+        feed_client=StaticFeedClient({'el': []}, timestamp),
+        telegram_notifier=TelegramNotifierStandIn(),
+        redis_manager=InMemoryRedisManager()
+    )
+
+
+def run_pass(event_count: int, args, trace_memory: bool) -> StageRecorder:
+    feed = SyntheticFeed(event_count, args.tips, args.churn, seed=args.seed)
+    parse_cache = EventParseCache()
+    recorder = StageRecorder(trace_memory)
+    timestamp = datetime(2021, 1, 1)
+
+    initial_events = Event.from_json_multiple(json.loads(feed.serialize()))
+    scanner = offline_scanner(initial_events, args.engine, args.trigger, args.idle, timestamp)
+    engine = scanner.snapshot_engine
+
+    if trace_memory:
+        tracemalloc.start()
+
+    try:
+        for _ in range(args.cycles):
+            raw = feed.serialize()
+            feed.advance()
+
+            data = recorder.run('decode', json.loads, raw)
+            recorder.run('parse', Event.from_json_multiple, data)
+            events = recorder.run('parse_cached', Event.from_json_multiple, data, parse_cache)
+
+            recorder.run('snapshot_update', engine.update, events, timestamp, scanner.enabled_filters)
+
+            with redirect_stdout(StringIO()):
+                recorder.run('notifications', scanner._generate_notifications)
+
+            timestamp += timedelta(seconds=5)
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+
+    return recorder
+
+
+def summarize(event_count: int, tip_count: int, timing: StageRecorder, memory: Optional[StageRecorder]) -> Dict[str, dict]:
+    results = {}
+
+    for stage in STAGES:
+        durations = timing.durations[stage]
+        steady = median(durations[1:]) if len(durations) > 1 else durations[0]
+
+        results[stage] = {
+            'first_ms': durations[0] * 1000,
+            'median_ms': steady * 1000,
+            'events_per_second': event_count / steady if steady > 0 else 0.0,
+            'tips_per_second': tip_count / steady if steady > 0 else 0.0,
+            'peak_bytes': memory.peaks[stage] if memory is not None else None
+        }
+
+    return results
+
+
+def print_results(name: str, results: Dict[str, dict], baseline: Optional[Dict[str, dict]], tolerance: float) -> List[str]:
+    regressions = []
+
+    print(name)
+    print(f'  {"stage":<16}{"first ms":>10}{"median ms":>11}{"events/s":>12}{"tips/s":>13}{"peak MiB":>10}  vs baseline')
+
+    for stage, r in results.items():
+        peak = '' if r['peak_bytes'] is None else f'{r["peak_bytes"] / 2 ** 20:.1f}'
+        line = f'  {stage:<16}{r["first_ms"]:10.1f}{r["median_ms"]:11.1f}{r["events_per_second"]:12.0f}' \
+               f'{r["tips_per_second"]:13.0f}{peak:>10}'
+
+        b = (baseline or {}).get(stage)
+
+        if b is not None:
+            time_ratio = r['median_ms'] / b['median_ms'] if b['median_ms'] > 0 else 1.0
+            line += f'  time {time_ratio:5.2f}x'
+            regressed = time_ratio > 1 + tolerance
+
+            if r['peak_bytes'] is not None and b['peak_bytes']:
+                memory_ratio = r['peak_bytes'] / b['peak_bytes']
+                line += f', memory {memory_ratio:5.2f}x'
+                regressed = regressed or memory_ratio > 1 + tolerance
+
+            if regressed:
+                line += '  REGRESSION'
+                regressions.append(f'{stage} ({name})')
+
+        print(line)
+
+    print()
+
+    return regressions
+
+
+def main() -> int:
+    # The scanner is only importable once the offline environment is set up
+    use_offline_environment()
+
+    from cws.core.scanner import Scanner
+
+    parser = ArgumentParser(description='Throughput and peak memory of the stages of a scanner cycle on a synthetic feed')
+    parser.add_argument('--events', type=int, nargs='+', default=[200, 2000], help='event counts, e.g. 200 2000 20000')
+    parser.add_argument('--tips', type=int, default=40, help='tips per event')
+    parser.add_argument('--churn', type=float, default=0.05, help='fraction of tips changing odds per cycle')
+    parser.add_argument('--cycles', type=int, default=12)
+    parser.add_argument('--engine', choices=Scanner.SNAPSHOT_ENGINES.keys(), default='incremental')
+    parser.add_argument('--trigger', type=int, default=10, help='filter trigger time in seconds')
+    parser.add_argument('--idle', type=int, default=15, help='auto break minimum idle time in seconds')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc pass')
+    parser.add_argument('--save', metavar='FILE', help='save the results as a baseline')
+    parser.add_argument('--baseline', metavar='FILE', help='compare against results saved with --save')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='slowdown or memory growth reported as a regression')
+    args = parser.parse_args()
+
+    baseline = {}
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+
+    all_results = {}
+    regressions = []
+
+    for event_count in args.events:
+        tip_count = SyntheticFeed(event_count, args.tips, args.churn, seed=args.seed).tip_count
+        name = f'{event_count} events x {args.tips} tips, churn {args.churn}, {args.engine}'
+
+        # Timed without tracemalloc, which slows allocations down several times
+        timing = run_pass(event_count, args, trace_memory=False)
+        memory = None if args.no_memory else run_pass(event_count, args, trace_memory=True)
+
+        all_results[name] = summarize(event_count, tip_count, timing, memory)
+        regressions += print_results(name, all_results[name], baseline.get(name), args.tolerance)
+
+    if args.save is not None:
+        with open(args.save, 'w') as f:
+            json.dump({'created_on': datetime.now().isoformat(), 'python': sys.version, 'cycles': args.cycles,
+                       'results': all_results}, f, indent=2)
+
+    if len(regressions) > 0:
+        print(f'{len(regressions)} regressions:')
+        print('\n'.join(f'  {r}' for r in regressions))
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
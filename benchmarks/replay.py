@@ -0,0 +1,126 @@
+import json
+import sys
+from argparse import ArgumentParser
+from datetime import datetime
+from time import perf_counter, sleep
+from typing import Iterator
+
+from benchmarks.standins import InMemoryRedisManager, TelegramNotifierStandIn, offline_session, use_offline_environment
+from cws.api.capture import CaptureExhaustedError, FeedCapture, ReplayFeedClient
+from cws.api.errors import InvalidApiResponseError
+from cws.api.models import Event, EventParseCache
+from cws.core.clock import ManualClock
+from cws.core.metrics import CycleMetrics
+
+
+def captured_events(capture: FeedCapture) -> Iterator[Event]:
+    # Every event of the capture, so that the offline database knows all of its sports, markets and bets
+    parse_cache = EventParseCache()
+
+    for entry in capture.entries:
+        try:
+            yield from Event.from_json_multiple(json.loads(capture.read(entry)), parse_cache)
+        except (ValueError, InvalidApiResponseError):
+            pass
+
+
+def main() -> int:
+    # The scanner imports the database module, which needs the settings
+    use_offline_environment()
+
+    from cws.core.scanner import Scanner
+    from cws.models import AppOption
+
+    parser = ArgumentParser(
+        description='Replays a feed capture recorded with CWS_SCANNER_CAPTURE_PATH through the scanner. The scanner '
+                    'runs on an in-memory database with every sport, market and bet of the capture enabled and the '
+                    'default options, and on an in-memory Redis. Telegram messages are rendered but never sent.'
+    )
+    parser.add_argument('capture', help='capture file, next to its .idx index')
+    parser.add_argument('--speed', type=float, default=0.0,
+                        help='replay speed relative to the recording, 1 for wall-clock speed, 0 for as fast as possible')
+    parser.add_argument('--cycles', type=int, default=None, help='stop after this many cycles')
+    parser.add_argument('--pipelined', action='store_true')
+    parser.add_argument('--sharded-fetch', action='store_true')
+    parser.add_argument('--streaming', action='store_true')
+    parser.add_argument('--engine', choices=Scanner.SNAPSHOT_ENGINES.keys(), default='incremental')
+    parser.add_argument('--workers', type=int, default=0)
+    parser.add_argument('--trigger', type=int, default=300, help='filter trigger time in seconds')
+    args = parser.parse_args()
+
+    capture = FeedCapture(args.capture)
+
+    if len(capture) == 0:
+        print('The capture is empty')
+        return 1
+
+    print(f'{len(capture)} responses recorded over {capture.duration:.0f} seconds')
+
+    clock = ManualClock(datetime.fromtimestamp(capture.entries[0].recorded_on))
+    client = ReplayFeedClient(capture, clock)
+    telegram_notifier = TelegramNotifierStandIn()
+
+    session = offline_session(captured_events(capture), args.trigger, {
+        option: option.value['default'] for option in AppOption.OptionType
+    })
+
+    # noinspection PyTypeChecker
+    scanner = Scanner(
+        session,
+        pipelined=args.pipelined,
+        sharded_fetch=args.sharded_fetch,
+        streaming=args.streaming,
+        snapshot_engine=args.engine,
+        workers=args.workers,
+        feed_client=client,
+        telegram_notifier=telegram_notifier,
+        redis_manager=InMemoryRedisManager(),
+        clock=clock
+    )
+
+    # Quantiles over the whole replay rather than the last cycles only
+    scanner.metrics = CycleMetrics(window=args.cycles or len(capture))
+
+    # The first cycle starts where the recording of the second response started
+    first_recorded_on = client.next_recorded_on
+    cycles = 0
+    start = perf_counter()
+
+    try:
+        while args.cycles is None or cycles < args.cycles:
+            next_recorded_on = client.next_recorded_on
+
+            if next_recorded_on is None:
+                break
+
+            if args.speed > 0:
+                sleep(max(0.0, (next_recorded_on - first_recorded_on) / args.speed - (perf_counter() - start)))
+
+            try:
+                scanner.cycle()
+            except CaptureExhaustedError:
+                break
+
+            cycles += 1
+    finally:
+        scanner.stop()
+
+    elapsed = perf_counter() - start
+
+    print(f'{cycles} cycles in {elapsed:.1f} seconds ({cycles / elapsed if elapsed > 0 else 0:.1f} cycles/s)')
+    dispatcher = telegram_notifier.dispatcher
+    print(f'{dispatcher.sent_notifications} Telegram notifications in {dispatcher.sent_messages} messages, '
+          f'{dispatcher.coalesced_notifications} coalesced, {dispatcher.dropped_notifications} dropped, '
+          f'{dispatcher.queue_depth} still queued')
+    print()
+    print(f'{"stage":<18}{"count":>7}{"mean ms":>10}' + ''.join(f'{f"p{q * 100:g} ms":>10}' for q in CycleMetrics.QUANTILES))
+
+    for stage, h in scanner.metrics.stages.items():
+        quantiles = ''.join(f'{h.quantile(q) * 1000:10.1f}' for q in CycleMetrics.QUANTILES)
+        print(f'{stage:<18}{h.count:7d}{h.sum / h.count * 1000:10.1f}{quantiles}')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,80 @@
+from argparse import ArgumentParser
+from datetime import datetime, timedelta
+from time import perf_counter
+from typing import List, Tuple
+
+from benchmarks.synthetic_feed import SyntheticFeed
+from cws.api.models import Event, EventParseCache
+from cws.core.filter_index import FilterIndex
+from cws.core.sharded_engine import ShardedSnapshotEngine
+from cws.core.snapshot_store import SnapshotStore
+from cws.core.snapshots import SnapshotEngine, DictSnapshotEngine
+
+# Same names as Scanner.SNAPSHOT_ENGINES, without importing the scanner and its services
+ENGINES = {
+    'incremental': SnapshotStore,
+    'dict': DictSnapshotEngine
+}
+
+
+def run(engine: SnapshotEngine, payloads: List[dict], index: FilterIndex) -> Tuple[float, list]:
+    parse_cache = EventParseCache()
+    timestamp = datetime(2021, 1, 1)
+    elapsed = 0.0
+    output = []
+
+    for payload in payloads:
+        events = Event.from_json_multiple(payload, parse_cache)
+
+        start = perf_counter()
+        engine.update(events, timestamp, index)
+        triggered = engine.find_triggered_tip_groups(index, 1.0, 100.0, 30)
+        elapsed += perf_counter() - start
+
+        output.append([(event.id, [t.id for t in tips]) for event, tips in triggered])
+        timestamp += timedelta(seconds=5)
+
+    return elapsed / len(payloads), output
+
+
+def main():
+    parser = ArgumentParser(description='Snapshot cycle time of the sharded engine by number of worker processes')
+    parser.add_argument('--events', type=int, default=2000)
+    parser.add_argument('--tips', type=int, default=40, help='tips per event')
+    parser.add_argument('--churn', type=float, default=0.05, help='fraction of tips changing odds per cycle')
+    parser.add_argument('--cycles', type=int, default=20)
+    parser.add_argument('--engine', choices=ENGINES.keys(), default='incremental')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    args = parser.parse_args()
+
+    feed = SyntheticFeed(args.events, args.tips, args.churn)
+    payloads = []
+
+    for _ in range(args.cycles):
+        payloads.append(feed.payload())
+        feed.advance()
+
+    index = FilterIndex({
+        (e['ci'], m['bggi'], m['bgi'], 20) for payload in payloads[:1] for e in payload['el'] for m in e['ml']
+    })
+
+    engine_class = ENGINES[args.engine]
+    baseline, expected = run(engine_class(), payloads, index)
+
+    print(f'{args.events} events, {feed.tip_count} tips, {args.cycles} cycles, {args.engine} engine')
+    print(f'single process: {baseline * 1000:8.1f} ms/cycle')
+
+    for workers in args.workers:
+        engine = ShardedSnapshotEngine(engine_class, workers)
+
+        try:
+            elapsed, output = run(engine, payloads, index)
+        finally:
+            engine.stop()
+
+        assert output == expected, f'{workers} workers triggered different tip groups'
+        print(f'{workers:2d} workers:     {elapsed * 1000:8.1f} ms/cycle ({baseline / elapsed:.2f}x)')
+
+
+if __name__ == '__main__':
+    main()
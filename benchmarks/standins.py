@@ -0,0 +1,145 @@
+import os
+from collections import deque
+from datetime import datetime
+from typing import Collection, Dict, List, Optional, Tuple, Any, Iterable
+
+from requests.structures import CaseInsensitiveDict
+from sqlalchemy import create_engine
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from cws.api.feed_client import FeedResponse
+from cws.config import AppConfig
+from cws.core.telegram_dispatcher import TelegramDispatcher
+
+# Values for the required settings that are not set, so the benchmarks import the scanner without a .env file.
+# The configured database and Redis are never queried, offline_session and the stand-ins below replace them.
+OFFLINE_ENVIRONMENT = {
+    AppConfig.Variables.DATABASE_URL: 'sqlite://',
+    AppConfig.Variables.REDIS_PORT: '6379',
+    AppConfig.Variables.TELEGRAM_TOKEN: '0:benchmark',
+    AppConfig.Variables.TELEGRAM_CHAT_ID: '0',
+}
+
+
+def use_offline_environment():
+    for var in AppConfig.Variables:
+        name, var_type, *default = var.value
+
+        if len(default) == 0:
+            os.environ.setdefault(name, OFFLINE_ENVIRONMENT.get(var, 'benchmark'))
+
+
+@compiles(JSONB, 'sqlite')
+def _compile_jsonb_on_sqlite(element, compiler, **kw):
+    return 'JSON'
+
+
+def offline_session(events: Iterable, trigger_time: int, options: Dict[Any, Any]) -> Session:
+    # An in-memory SQLite database with every sport, market and bet of the events enabled, and the given options as
+    # {AppOption.OptionType: value}. Only ever read by the scanner, which upserts with PostgreSQL statements.
+    from cws.database import Base
+    from cws.models import Sport, Market, Bet, AppOption
+
+    engine = create_engine('sqlite://', poolclass=StaticPool, connect_args={'check_same_thread': False})
+    Base.metadata.create_all(engine, tables=[t.__table__ for t in (Sport, Market, Bet, AppOption)])
+    session = sessionmaker(bind=engine)()
+
+    sports = {}
+    markets = {}
+    bets = {}
+
+    for e in events:
+        sports[e.sport_id] = e.sport_name
+
+        for t in e.tips:
+            markets[(e.sport_id, t.market_group_id)] = t.market_group_name
+            bets[(e.sport_id, t.market_group_id, t.bet_group_id)] = t.bet_group_name
+
+    session.add_all(Sport(id=i, name=name, trigger_time=trigger_time) for i, name in sports.items())
+    session.add_all(Market(id=i, sport_id=sport_id, name=name) for (sport_id, i), name in markets.items())
+    session.add_all(
+        Bet(id=i, sport_id=sport_id, market_id=market_id, name=name) for (sport_id, market_id, i), name in bets.items()
+    )
+    session.add_all(
+        AppOption(id=option.value['id'], value={'name': option.value['name'], 'value': value})
+        for option, value in options.items()
+    )
+    session.commit()
+
+    return session
+
+
+class StaticFeedClient:
+    # Answers every feed request with the same payload
+
+    def __init__(self, data: Any, date: datetime):
+        self.data = data
+        self.headers = CaseInsensitiveDict({'Date': date.strftime('%a, %d %b %Y %H:%M:%S GMT')})
+        self.last_timings = None
+
+    def get_json(self, url: str, params: dict = None) -> FeedResponse:
+        return FeedResponse(self.data, self.headers, self.last_timings)
+
+
+class InMemoryRedisManager:
+    # The parts of RedisManager the scanner writes to on every cycle, with the notifications in a dict like the hash
+
+    notifications_json: Dict[str, str]
+    app_status: Optional[Tuple[int, int]]
+
+    def __init__(self):
+        self.notifications_json = {}
+        self.notifications_version = 0
+        self.app_status = None
+        self.metrics = None
+
+    def update_notifications(self, changed: Dict[str, str], removed: Collection[str], replace: bool = False) -> Tuple[int, int]:
+        if replace:
+            self.notifications_json.clear()
+
+        self.notifications_json.update(changed)
+
+        for n_id in removed:
+            del self.notifications_json[n_id]
+
+        if replace or len(changed) > 0 or len(removed) > 0:
+            self.notifications_version += 1
+
+        return self.notifications_version, len(self.notifications_json)
+
+    def get_notifications(self) -> Tuple[int, List[str]]:
+        return self.notifications_version, list(self.notifications_json.values())
+
+    def set_app_status(self, event_count: int, notification_count: int):
+        self.app_status = (event_count, notification_count)
+
+    def get_config_version(self) -> int:
+        return 0
+
+    def get_scanner_control(self) -> Tuple[int, Optional[int]]:
+        return 0, None
+
+    def set_metrics(self, metrics: str):
+        self.metrics = metrics
+
+    def get_snapshot_checkpoint(self) -> Optional[bytes]:
+        return None
+
+    def set_snapshot_checkpoint(self, data: bytes, max_age: int):
+        pass
+
+
+class TelegramNotifierStandIn:
+    # Renders and queues the messages like TelegramNotifier, but its dispatcher keeps them instead of sending them
+
+    def __init__(self):
+        self.chat_id = '0'
+        self.messages = deque(maxlen=100)
+        self.dispatcher = TelegramDispatcher(lambda chat_id, text: self.messages.append(text))
+        self.dispatcher.start()
+
+    def send_notifications(self, notifications: list):
+        self.dispatcher.submit(self.chat_id, ((hash(n), n.construct_telegram_message()) for n in notifications))
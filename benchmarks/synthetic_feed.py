@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+from copy import deepcopy
+from json import dumps
+from random import Random
+from typing import List, Tuple
+
+# sport id -> (sport name, phase name, number of phases)
+SPORTS = {
+    1: ('Football', 'half', 2),
+    2: ('Ice Hockey', 'period', 3),
+    4: ('Basketball', 'quarter', 4),
+    9: ('Volleyball', 'set', 5),
+    11: ('Tennis', 'set', 3),
+    26: ('Cricket', 'innings', 2),
+    119: ('Esports', 'map', 3),
+}
+
+MARKET_GROUPS = ['Main', 'Totals', 'Handicaps', 'Periods', 'Specials']
+
+# (bet group name template, bet name template, tip names); {n} is the phase number, {p} the phase name
+BET_TEMPLATES = [
+    ('Match Result', 'Match Result', ['1', 'X', '2']),
+    ('Total #{line}#', 'Total {line}', ['Over', 'Under']),
+    ('Handicap #{line}#', 'Handicap {line}', ['1', '2']),
+    ('{n} {p} - Winner', '{n} {p} - Winner', ['1', 'X', '2']),
+    ('{n} {p} - Total #{line}#', '{n} {p} - Total {line}', ['Over', 'Under']),
+    ('{p} {n} - Both Teams To Score', '{p} {n} - Both Teams To Score', ['Yes', 'No']),
+    ('Next Goal #{line}#', 'Next Goal {line}', ['1', 'None', '2']),
+]
+
+ORDINALS = {1: '1st', 2: '2nd', 3: '3rd'}
+
+
+class SyntheticFeed:
+    # Deterministic stand-in for the live events feed with the same el/ml/msl shape as the real API
+
+    def __init__(self, event_count: int = 200, tips_per_event: int = 40, churn_rate: float = 0.05, seed: int = 0):
+        self.event_count = event_count
+        self.tips_per_event = tips_per_event
+        self.churn_rate = churn_rate
+
+        self._random = Random(seed)
+        self._next_id = 1_000_000
+        self._events = [self._make_event() for _ in range(event_count)]
+        self._clock = 1_600_000_000
+
+    @property
+    def tip_count(self) -> int:
+        return sum(len(m['msl']) for e in self._events for m in e['ml'])
+
+    def payload(self) -> dict:
+        return {'el': deepcopy(self._events), 'ts': self._clock}
+
+    def serialize(self) -> bytes:
+        return dumps({'el': self._events, 'ts': self._clock}, ensure_ascii=False).encode('utf-8')
+
+    def advance(self, seconds: int = 5) -> List[Tuple[int, int]]:
+        # Moves the odds of `churn_rate` of all tips and returns the (event id, tip id) pairs that changed
+        self._clock += seconds
+        changed = []
+
+        for event in self._events:
+            event['sb']['gmc']['s'] += seconds
+
+            if event['sb']['gmc']['s'] >= 60:
+                event['sb']['gmc']['m'] += 1
+                event['sb']['gmc']['s'] -= 60
+
+            for market in event['ml']:
+                for tip in market['msl']:
+                    if self._random.random() < self.churn_rate:
+                        tip['msp'] = self._odds()
+                        changed.append((event['ei'], tip['msi']))
+
+        return changed
+
+    def _id(self) -> int:
+        self._next_id += 1
+        return self._next_id
+
+    def _odds(self) -> float:
+        return round(1.01 + self._random.expovariate(0.4), 2)
+
+    def _make_event(self) -> dict:
+        sport_id = self._random.choice(list(SPORTS))
+        sport_name, phase_name, phase_count = SPORTS[sport_id]
+        current_phase = self._random.randint(1, phase_count)
+
+        markets = []
+        tip_count = 0
+
+        while tip_count < self.tips_per_event:
+            market = self._make_market(sport_id, phase_name, self._random.randint(current_phase, phase_count))
+            markets.append(market)
+            tip_count += len(market['msl'])
+
+        return {
+            'ei': self._id(),
+            'ed': '2020-09-13T13:26:40Z',
+            'ci': sport_id,
+            'cn': sport_name,
+            'scn': f'{sport_name} League {self._random.randint(1, 40)}',
+            'ss': f'{self._random.randint(0, 3)} - {self._random.randint(0, 3)}',
+            'sb': {
+                'gmc': {'m': self._random.randint(0, 80), 's': self._random.randint(0, 59)},
+                'gcp': {'gpn': f'{ORDINALS.get(current_phase, f"{current_phase}th")} {phase_name}'}
+            },
+            'epl': [{'pn': f'Team {self._random.randint(1, 5000)}'}, {'pn': f'Team {self._random.randint(1, 5000)}'}],
+            'ml': markets
+        }
+
+    def _make_market(self, sport_id: int, phase_name: str, phase: int) -> dict:
+        bet_index = self._random.randrange(len(BET_TEMPLATES))
+        group_template, name_template, tip_names = BET_TEMPLATES[bet_index]
+        market_group_index = bet_index % len(MARKET_GROUPS)
+
+        values = {
+            'n': ORDINALS.get(phase, f'{phase}th'),
+            'p': phase_name,
+            'line': f'{self._random.randint(0, 6)}.5'
+        }
+
+        return {
+            'mi': self._id(),
+            'bggi': market_group_index + 1,
+            'bggn': MARKET_GROUPS[market_group_index],
+            'bgi': sport_id * 100 + bet_index,
+            'bgn': group_template.format(**values),
+            'mn': name_template.format(**values).capitalize(),
+            'ms': 10 if self._random.random() < 0.9 else 20,
+            'msl': [
+                {'msi': self._id(), 'mst': tip_name, 'msp': self._odds(), 'mss': 1}
+                for tip_name in tip_names
+            ]
+        }
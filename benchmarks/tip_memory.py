@@ -0,0 +1,83 @@
+import gc
+import tracemalloc
+from argparse import ArgumentParser
+from dataclasses import make_dataclass, fields
+from json import loads
+from typing import Callable, List
+
+from benchmarks.synthetic_feed import SyntheticFeed
+from cws.api.models import Event, Tip, TeamInfo
+
+# Layout of the models before they were slotted: plain dataclasses with a per-instance __dict__
+# that keep references to whatever strings the JSON decoder produced
+LegacyEvent = make_dataclass('LegacyEvent', [f.name for f in fields(Event)])
+LegacyTeamInfo = make_dataclass('LegacyTeamInfo', [f.name for f in fields(TeamInfo)])
+LegacyTip = make_dataclass('LegacyTip', [f.name for f in fields(Tip)])
+
+
+def parse_legacy(data: dict) -> List[LegacyEvent]:
+    events = []
+
+    for e in data['el']:
+        tips = []
+
+        for m in e['ml']:
+            bet_group_name = Tip.parse_bet_group_name(m['bgn'])
+
+            for t in m['msl']:
+                tips.append(LegacyTip(
+                    t['msi'], m['mi'], t['mst'], t['msp'], m['bggi'], m['bggn'], m['bgi'], bet_group_name, m['mn'], m['ms'] == 10
+                ))
+
+        team1_score, team2_score = [int(s) for s in e['ss'].split(' - ')]
+
+        events.append(LegacyEvent(
+            e['ei'], (e['sb']['gmc']['m'], e['sb']['gmc']['s']), False, e['sb']['gcp']['gpn'], e['ci'], e['cn'], e['scn'],
+            LegacyTeamInfo(e['epl'][0]['pn'], team1_score), LegacyTeamInfo(e['epl'][1]['pn'], team2_score), tips, set(), None
+        ))
+
+    return events
+
+
+def measure(parse: Callable[[dict], list], payloads: List[bytes]) -> int:
+    gc.collect()
+    tracemalloc.start()
+
+    # Every generation is decoded separately, just like consecutive feed responses
+    generations = [parse(loads(payload)) for payload in payloads]
+    gc.collect()
+
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    del generations
+    return size
+
+
+def main():
+    parser = ArgumentParser(description='Memory retained per tip by the parsed live events')
+    parser.add_argument('--events', type=int, default=2000)
+    parser.add_argument('--tips', type=int, default=40, help='tips per event')
+    parser.add_argument('--generations', type=int, default=2, help='number of feed generations kept alive')
+    args = parser.parse_args()
+
+    feed = SyntheticFeed(args.events, args.tips)
+    payloads = []
+
+    for _ in range(args.generations):
+        payloads.append(feed.serialize())
+        feed.advance()
+
+    tip_count = feed.tip_count * args.generations
+
+    before = measure(parse_legacy, payloads)
+    after = measure(Event.from_json_multiple, payloads)
+
+    print(f'{args.events} events, {tip_count} tips in {args.generations} generations')
+    print(f'before: {before / tip_count:8.1f} B/tip ({before / 2 ** 20:.1f} MiB)')
+    print(f'after:  {after / tip_count:8.1f} B/tip ({after / 2 ** 20:.1f} MiB)')
+    print(f'saved:  {100 * (1 - after / before):7.1f} %')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import zlib
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from queue import Queue, Full
+from time import perf_counter, time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from requests.structures import CaseInsensitiveDict
+
+from cws.core.clock import ManualClock
+from .feed_client import FeedClient, FeedRequestTimings, FeedResponse
+
+# A capture is an append-only file of zlib-compressed response bodies plus an index with one JSON line per
+# response. The body is written before its index line, so a capture cut short by a crash is still readable.
+INDEX_SUFFIX = '.idx'
+
+
+class CaptureExhaustedError(Exception):
+    pass
+
+
+@dataclass
+class CaptureEntry:
+    offset: int
+    length: int
+    size: int
+    recorded_on: float  # POSIX timestamp
+    date: str  # Date header of the response
+    params: dict
+
+
+def _params_key(params: Optional[dict]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((str(k), str(v)) for k, v in (params or {}).items()))
+
+
+class FeedRecorder:
+    QUEUE_SIZE = 16
+    COMPRESSION_LEVEL = 6
+
+    def __init__(self, path: str, queue_size: int = QUEUE_SIZE):
+        self.path = path
+        self.recorded_responses = 0
+        self.dropped_responses = 0
+
+        # Compressing and writing a payload takes a while, so it is done on its own thread instead of the fetching one
+        self._queue = Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, name='Feed recorder', daemon=True)
+        self._thread.start()
+
+    def record(self, params: Optional[dict], headers: CaseInsensitiveDict, body: bytes):
+        try:
+            self._queue.put_nowait((time(), headers.get('Date'), params or {}, body))
+        except Full:
+            self.dropped_responses += 1
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        with open(self.path, 'ab') as data, open(self.path + INDEX_SUFFIX, 'a') as index:
+            offset = data.seek(0, os.SEEK_END)
+
+            while True:
+                item = self._queue.get()
+
+                if item is None:
+                    return
+
+                recorded_on, date, params, body = item
+                compressed = zlib.compress(body, FeedRecorder.COMPRESSION_LEVEL)
+
+                data.write(compressed)
+                data.flush()
+
+                index.write(json.dumps({
+                    'offset': offset,
+                    'length': len(compressed),
+                    'size': len(body),
+                    'recorded_on': recorded_on,
+                    'date': date,
+                    'params': params
+                }) + '\n')
+                index.flush()
+
+                offset += len(compressed)
+                self.recorded_responses += 1
+
+
+class FeedCapture:
+    entries: List[CaptureEntry]
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries = []
+
+        with open(path + INDEX_SUFFIX) as index:
+            for line in index:
+                try:
+                    self.entries.append(CaptureEntry(**json.loads(line)))
+                except ValueError:
+                    # Index line cut short by a crash of the recorder
+                    break
+
+        self._data = open(path, 'rb')
+
+    def read(self, entry: CaptureEntry) -> bytes:
+        self._data.seek(entry.offset)
+        return zlib.decompress(self._data.read(entry.length))
+
+    @property
+    def duration(self) -> float:
+        return self.entries[-1].recorded_on - self.entries[0].recorded_on if len(self.entries) > 0 else 0.0
+
+    def close(self):
+        self._data.close()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class _ReplayStream:
+    def __init__(self, headers: CaseInsensitiveDict, body: bytes):
+        self.headers = headers
+        self.download = 0.0
+        self.size = len(body)
+        self._body = body
+
+    def iter_chunks(self) -> Iterator[bytes]:
+        for i in range(0, len(self._body), FeedClient.CHUNK_SIZE):
+            yield self._body[i:i + FeedClient.CHUNK_SIZE]
+
+
+class ReplayFeedClient:
+    # Serves the responses of a capture in the order they were recorded, separately for every set of request
+    # parameters so that sharded requests get their own shard back. The clock follows the replayed responses.
+
+    def __init__(self, capture: FeedCapture, clock: Optional[ManualClock] = None):
+        self.capture = capture
+        self.clock = clock
+        self.last_timings = None
+        self.replayed_responses = 0
+
+        self._queues: Dict[Tuple[Tuple[str, str], ...], deque] = {}
+        self._lock = threading.Lock()
+
+        for entry in capture.entries:
+            self._queues.setdefault(_params_key(entry.params), deque()).append(entry)
+
+    @property
+    def next_recorded_on(self) -> Optional[float]:
+        heads = [q[0].recorded_on for q in self._queues.values() if len(q) > 0]
+        return min(heads) if len(heads) > 0 else None
+
+    def get_json(self, url: str, params: dict = None) -> FeedResponse:
+        entry, body = self._next(params)
+
+        start = perf_counter()
+        data = json.loads(body)
+        self.last_timings = FeedRequestTimings(connect=None, tls=None, ttfb=0.0, download=0.0,
+                                               decode=perf_counter() - start, size=len(body))
+
+        return FeedResponse(data, CaseInsensitiveDict({'Date': entry.date}), self.last_timings)
+
+    @contextmanager
+    def stream(self, url: str, params: dict = None) -> Iterator[_ReplayStream]:
+        entry, body = self._next(params)
+        stream = _ReplayStream(CaseInsensitiveDict({'Date': entry.date}), body)
+
+        start = perf_counter()
+        yield stream
+
+        self.last_timings = FeedRequestTimings(connect=None, tls=None, ttfb=0.0, download=0.0,
+                                               decode=perf_counter() - start, size=len(body))
+
+    def _next(self, params: Optional[dict]) -> Tuple[CaptureEntry, bytes]:
+        with self._lock:
+            queue = self._queues.get(_params_key(params))
+
+            if not queue:
+                raise CaptureExhaustedError(f'No more captured responses for {params}')
+
+            entry = queue.popleft()
+            body = self.capture.read(entry)
+            self.replayed_responses += 1
+
+            if self.clock is not None:
+                self.clock.set(datetime.fromtimestamp(entry.recorded_on))
+
+        return entry, body
+
+    def close(self):
+        self.capture.close()
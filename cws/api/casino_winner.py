@@ -1,24 +1,46 @@
 from datetime import datetime
-from typing import Tuple, List
+from time import perf_counter
+from typing import Tuple, List, Optional
 
-from requests import get
-
-from .models import Event
+from .feed_client import FeedClient
+from .models import Event, EventParseCache
 
 
 class CasinoWinnerApi:
     EVENTS_URL = 'https://krn-api-a.bpsgameserver.com/isa/v2/1101/en/event'
     DATE_FORMAT = '%a, %d %b %Y %H:%M:%S GMT'
+    EVENTS_PARAMS = {
+        'eventCount': 999,
+        'eventPhase': 2,
+        'include': 'scoreboard,scoresummary',
+        'override': 'Mst1X2ParticipantName'
+    }
+    SPORT_FILTER_PARAM = 'categoryIds'
+
+    def __init__(self, client: FeedClient, parse_cache: EventParseCache = None, streaming: bool = False):
+        self.client = client
+        self.parse_cache = parse_cache
+        self.streaming = streaming
+
+        # Parsing of a streamed payload is interleaved with decoding and counts into the decode time of the client
+        self.last_parse_duration: Optional[float] = None
+
+    def get_all_live_events(self) -> Tuple[List[Event], datetime]:
+        return self._get_live_events(CasinoWinnerApi.EVENTS_PARAMS)
 
-    @classmethod
-    def get_all_live_events(cls) -> Tuple[List[Event], datetime]:
-        r = get(cls.EVENTS_URL, params={
-            'eventCount': 999,
-            'eventPhase': 2,
-            'include': 'scoreboard,scoresummary',
-            'override': 'Mst1X2ParticipantName'
-        })
+    def get_live_sport_events(self, sport_id: int) -> Tuple[List[Event], datetime]:
+        return self._get_live_events({**CasinoWinnerApi.EVENTS_PARAMS, CasinoWinnerApi.SPORT_FILTER_PARAM: sport_id})
 
-        r.raise_for_status()
+    def _get_live_events(self, params: dict) -> Tuple[List[Event], datetime]:
+        if self.streaming:
+            with self.client.stream(CasinoWinnerApi.EVENTS_URL, params=params) as stream:
+                events = list(Event.from_json_stream(stream.iter_chunks(), self.parse_cache))
+                headers = stream.headers
+        else:
+            r = self.client.get_json(CasinoWinnerApi.EVENTS_URL, params=params)
+            start = perf_counter()
+            events = Event.from_json_multiple(r.data, self.parse_cache)
+            self.last_parse_duration = perf_counter() - start
+            headers = r.headers
 
-        return Event.from_json_multiple(r.json()), datetime.strptime(r.headers['Date'], cls.DATE_FORMAT)
+        return events, datetime.strptime(headers['Date'], CasinoWinnerApi.DATE_FORMAT)
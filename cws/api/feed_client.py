@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from json import loads
+from time import perf_counter
+from typing import Any, Optional, NamedTuple, Iterator, Tuple, List, TYPE_CHECKING
+
+from requests import Session, Response
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.connection import HTTPSConnection
+from urllib3.connectionpool import HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+if TYPE_CHECKING:
+    from .capture import FeedRecorder
+
+# Connection set-up times are recorded by the connection objects themselves, which are created
+# deep inside urllib3 on the requesting thread, so they are handed back through thread-local storage.
+_connection_timings = threading.local()
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def _new_conn(self):
+        start = perf_counter()
+        conn = super(_TimedHTTPSConnection, self)._new_conn()
+        _connection_timings.connect = perf_counter() - start
+
+        return conn
+
+    def connect(self):
+        start = perf_counter()
+        super(_TimedHTTPSConnection, self).connect()
+        _connection_timings.tls = perf_counter() - start - (getattr(_connection_timings, 'connect', None) or 0)
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedHTTPAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super(_TimedHTTPAdapter, self).init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            **self.poolmanager.pool_classes_by_scheme,
+            'https': _TimedHTTPSConnectionPool
+        }
+
+
+@dataclass
+class FeedRequestTimings:
+    connect: Optional[float]  # DNS lookup + TCP handshake, None if a pooled connection was reused
+    tls: Optional[float]
+    ttfb: float
+    download: float
+    decode: float
+    size: int
+
+    @property
+    def new_connection(self) -> bool:
+        return self.connect is not None
+
+    @property
+    def total(self) -> float:
+        return (self.connect or 0) + (self.tls or 0) + self.ttfb + self.download + self.decode
+
+
+class FeedResponse(NamedTuple):
+    data: Any
+    headers: CaseInsensitiveDict
+    timings: FeedRequestTimings
+
+
+class FeedStream:
+    def __init__(self, response: Response, keep_chunks: bool = False):
+        self._response = response
+        self.headers = response.headers
+        self.download = 0.0
+        self.size = 0
+        self.chunks: Optional[List[bytes]] = [] if keep_chunks else None
+
+    def iter_chunks(self) -> Iterator[bytes]:
+        chunks = self._response.iter_content(FeedClient.CHUNK_SIZE)
+
+        while True:
+            start = perf_counter()
+            chunk = next(chunks, None)
+            self.download += perf_counter() - start
+
+            if chunk is None:
+                return
+
+            self.size += len(chunk)
+
+            if self.chunks is not None:
+                self.chunks.append(chunk)
+
+            yield chunk
+
+
+class FeedClient:
+    CONNECT_TIMEOUT = 3.05
+    READ_TIMEOUT = 10.0
+    RETRIES = 2
+    RETRY_BACKOFF_FACTOR = 0.25
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+    POOL_SIZE = 4
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, connect_timeout: float = CONNECT_TIMEOUT, read_timeout: float = READ_TIMEOUT,
+                 retries: int = RETRIES, pool_size: int = POOL_SIZE, recorder: FeedRecorder = None):
+        self.timeout = (connect_timeout, read_timeout)
+        self.last_timings = None
+        self.recorder = recorder
+
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=FeedClient.RETRY_BACKOFF_FACTOR,
+            status_forcelist=FeedClient.RETRY_STATUSES,
+            raise_on_status=False
+        )
+
+        self.session = Session()
+        self.session.headers.update({
+            'Accept': 'application/json',
+            'Accept-Encoding': 'gzip, deflate'
+        })
+        self.session.mount('https://', _TimedHTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry))
+
+    def get_json(self, url: str, params: dict = None) -> FeedResponse:
+        r, ttfb = self._get(url, params)
+        headers_received = perf_counter()
+
+        try:
+            r.raise_for_status()
+            content = r.content
+        finally:
+            r.close()
+
+        downloaded = perf_counter()
+        data = loads(content)
+        decoded = perf_counter()
+
+        self._record_timings(ttfb, downloaded - headers_received, decoded - downloaded, len(content))
+
+        if self.recorder is not None:
+            self.recorder.record(params, r.headers, content)
+
+        return FeedResponse(data, r.headers, self.last_timings)
+
+    @contextmanager
+    def stream(self, url: str, params: dict = None) -> Iterator[FeedStream]:
+        r, ttfb = self._get(url, params)
+        headers_received = perf_counter()
+
+        try:
+            r.raise_for_status()
+            stream = FeedStream(r, keep_chunks=self.recorder is not None)
+            yield stream
+        finally:
+            r.close()
+
+        # Decoding happens while the body is read, so everything that is not spent waiting for data counts as decoding
+        elapsed = perf_counter() - headers_received
+        self._record_timings(ttfb, stream.download, elapsed - stream.download, stream.size)
+
+        if self.recorder is not None:
+            self.recorder.record(params, stream.headers, b''.join(stream.chunks))
+
+    def _get(self, url: str, params: Optional[dict]) -> Tuple[Response, float]:
+        _connection_timings.connect = _connection_timings.tls = None
+
+        start = perf_counter()
+        r = self.session.get(url, params=params, timeout=self.timeout, stream=True)
+
+        return r, perf_counter() - start - (_connection_timings.connect or 0) - (_connection_timings.tls or 0)
+
+    def _record_timings(self, ttfb: float, download: float, decode: float, size: int):
+        self.last_timings = FeedRequestTimings(
+            connect=_connection_timings.connect,
+            tls=_connection_timings.tls,
+            ttfb=ttfb,
+            download=download,
+            decode=decode,
+            size=size
+        )
+
+    def close(self):
+        self.session.close()
+
+        if self.recorder is not None:
+            self.recorder.close()
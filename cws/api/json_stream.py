@@ -0,0 +1,135 @@
+import re
+from codecs import getincrementaldecoder
+from json import JSONDecoder, JSONDecodeError
+from typing import Iterable, Iterator, Any
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_NUMBER_CHARS = re.compile(r'[0-9.eE+-]*')
+_decoder = JSONDecoder()
+
+
+class JsonArrayStream:
+    # Walks a top-level JSON object that is delivered in chunks and yields the items of one of its
+    # array members one by one. Everything else is kept in `envelope`.
+
+    def __init__(self, chunks: Iterable[bytes], key: str):
+        self.key = key
+        self.envelope = {}
+
+        self._chunks = iter(chunks)
+        self._text_decoder = getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+    def __iter__(self) -> Iterator[Any]:
+        found = False
+
+        if self._peek() != '{':
+            value = self._decode_value()
+            raise TypeError(f'Top-level value is not an object: {type(value).__name__}')
+
+        self._pos += 1
+
+        if self._peek() == '}':
+            self._pos += 1
+        else:
+            while True:
+                name = self._decode_value()
+
+                if not isinstance(name, str):
+                    raise self._error('Expecting property name enclosed in double quotes')
+
+                self._expect(':')
+
+                if name == self.key and self._peek() == '[':
+                    found = True
+                    yield from self._iter_array()
+                else:
+                    self.envelope[name] = self._decode_value()
+
+                if self._next_char(',}') == '}':
+                    break
+
+        if not found:
+            if self.key in self.envelope:
+                raise TypeError(f'{self.key!r} is not an array: {type(self.envelope[self.key]).__name__}')
+            else:
+                raise KeyError(self.key)
+
+    def _iter_array(self) -> Iterator[Any]:
+        self._expect('[')
+
+        if self._peek() == ']':
+            self._pos += 1
+            return
+
+        while True:
+            yield self._decode_value()
+
+            if self._next_char(',]') == ']':
+                return
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+
+        try:
+            chunk = self._text_decoder.decode(next(self._chunks))
+        except StopIteration:
+            chunk = self._text_decoder.decode(b'', final=True)
+            self._eof = True
+
+        # Already consumed text is dropped, so the buffer never holds more than one item and a chunk
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+
+        return True
+
+    def _peek(self) -> str:
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+
+            if not self._fill():
+                raise self._error('Unexpected end of data')
+
+    def _expect(self, char: str):
+        if self._peek() != char:
+            raise self._error(f'Expecting {char!r}')
+
+        self._pos += 1
+
+    def _next_char(self, allowed: str) -> str:
+        char = self._peek()
+
+        if char not in allowed:
+            raise self._error(f'Expecting one of {allowed!r}')
+
+        self._pos += 1
+        return char
+
+    def _decode_value(self) -> Any:
+        self._peek()
+
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buffer, self._pos)
+            except JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+
+            # A number or literal that ends with the buffer may continue in the next chunk. A number cut after
+            # its '.' or 'e' is decoded without the fraction or exponent, with the rest still in the buffer.
+            if _NUMBER_CHARS.match(self._buffer, end).end() == len(self._buffer) and self._fill():
+                continue
+
+            self._pos = end
+
+            return value
+
+    def _error(self, message: str) -> JSONDecodeError:
+        return JSONDecodeError(message, self._buffer, self._pos)
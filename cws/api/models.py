@@ -1,14 +1,30 @@
 from __future__ import annotations
 
 import re
+import threading
 from dataclasses import dataclass
-from typing import Optional, List, Tuple, Set
+from functools import lru_cache
+from operator import attrgetter
+from sys import intern
+from time import monotonic
+from typing import Optional, List, Tuple, Set, Dict, Iterable, Iterator, Any
 
 from .errors import InvalidApiResponseError
+from .json_stream import JsonArrayStream
+
+
+def _intern(value: Any) -> Any:
+    # Names repeat across tips, events and cycles, so all of them share a single string object
+    return intern(value) if isinstance(value, str) else value
 
 
 @dataclass
 class Event:
+    __slots__ = (
+        'id', 'time', 'is_break', 'game_phase', 'sport_id', 'sport_name', 'league_name',
+        'first_team', 'second_team', 'tips', 'phase_related_bet_names', 'current_phase_bet_names'
+    )
+
     id: int
     time: Optional[Tuple[int, int]]  # (minutes, seconds)
     is_break: Optional[int]
@@ -22,6 +38,9 @@ class Event:
     phase_related_bet_names: Set[str]
     current_phase_bet_names: Optional[Set[str]]
 
+    # Pickling the fields positionally is much faster than the generic state of a slotted instance
+    _FIELD_VALUES = attrgetter(*__slots__)
+
     SPORT_EMOJI = {
         1: '⚽️',
         2: '🏒',
@@ -80,36 +99,37 @@ class Event:
         return f'https://www.casinowinner.com/en/live-betting#/event/{self.id}'
 
     def _generate_phase_related_bet_name_list(self):
-        phase_names = Event.SPORT_PHASE_NAMES.get(self.sport_id)
-
-        if phase_names is None:
+        if self.sport_id not in Event.SPORT_PHASE_NAMES:
             return
 
-        bet_names = {t.bet_group_name_real.lower() for t in self.tips}
-        current_phase_bets = set()
-
-        for phase_name in phase_names:
-            phase_related_bets = [bet_name for bet_name in bet_names if phase_name in bet_name]
+        bet_phases = [_parse_bet_phases(self.sport_id, bet_name) for bet_name in {t.bet_group_name_real for t in self.tips}]
+        current_phases = {}
 
-            pattern_pre = re.compile('(\d+)\S* ' + phase_name, re.IGNORECASE)
-            pattern_post = re.compile(phase_name + ' (\d+)', re.IGNORECASE)
+        for _, phases in bet_phases:
+            for phase_name, phase in phases:
+                current_phases[phase_name] = min(phase, current_phases.get(phase_name, phase))
 
-            bet_names_with_phases = []
+        phase_related_bets = set()
+        current_phase_bets = set()
 
-            for bet_name in phase_related_bets:
-                match = pattern_pre.search(bet_name) or pattern_post.search(bet_name)
-                if match is not None:
-                    bet_names_with_phases.append((bet_name, int(match.group(1))))
+        for bet_name, phases in bet_phases:
+            for phase_name, phase in phases:
+                phase_related_bets.add(bet_name)
 
-            if len(bet_names_with_phases) == 0:
-                continue
+                if phase == current_phases[phase_name]:
+                    current_phase_bets.add(bet_name)
 
-            current_phase = min(x[1] for x in bet_names_with_phases)
-            current_phase_bets.update(x[0] for x in bet_names_with_phases if x[1] == current_phase)
+        self.phase_related_bet_names = phase_related_bets
+        self.current_phase_bet_names = current_phase_bets
 
-            self.phase_related_bet_names.update(x[0] for x in bet_names_with_phases)
+    def inherit_phase_analysis(self, old_event: Event):
+        # A new version of an event whose bets are the same has the same current phase
+        if old_event.current_phase_bet_names is None or old_event.sport_id != self.sport_id:
+            return
 
-        self.current_phase_bet_names = current_phase_bets
+        if {t.bet_group_name_real for t in self.tips} == {t.bet_group_name_real for t in old_event.tips}:
+            self.phase_related_bet_names = old_event.phase_related_bet_names
+            self.current_phase_bet_names = old_event.current_phase_bet_names
 
     def is_tip_eligible_for_notification(self, tip: Tip) -> bool:
         if self.sport_id not in Event.SPORT_PHASE_NAMES:
@@ -126,7 +146,7 @@ class Event:
             return bet_name in self.current_phase_bet_names
 
     @staticmethod
-    def from_json(data: dict) -> Event:
+    def from_json(data: dict, tips: List[Tip] = None) -> Event:
         try:
             if data['ss'] is not None:
                 team1_score, team2_score = [int(s) for s in data['ss'].split(' - ')]
@@ -146,13 +166,13 @@ class Event:
                 id=data['ei'],
                 time=time,
                 is_break=game_phase == 'Halftime',
-                game_phase=game_phase,
+                game_phase=_intern(game_phase),
                 sport_id=data['ci'],
-                sport_name=data['cn'],
-                league_name=data['scn'],
+                sport_name=_intern(data['cn']),
+                league_name=_intern(data['scn']),
                 first_team=TeamInfo(name=data['epl'][0]['pn'], score=team1_score),
                 second_team=TeamInfo(name=data['epl'][1]['pn'], score=team2_score),
-                tips=Tip.from_json(data),
+                tips=Tip.from_json(data) if tips is None else tips,
                 phase_related_bet_names=set(),
                 current_phase_bet_names=None
             )
@@ -162,26 +182,84 @@ class Event:
         return event
 
     @staticmethod
-    def from_json_multiple(data: dict) -> List[Event]:
+    def from_json_multiple(data: dict, parse_cache: EventParseCache = None) -> List[Event]:
+        parse = Event.from_json if parse_cache is None else parse_cache.from_json
+
         try:
-            events = [Event.from_json(event) for event in data['el']]
+            events = [parse(event) for event in data['el']]
         except (KeyError, TypeError) as e:
             raise InvalidApiResponseError(data, e)
 
         return events
 
+    @staticmethod
+    def from_json_stream(chunks: Iterable[bytes], parse_cache: EventParseCache = None) -> Iterator[Event]:
+        stream = JsonArrayStream(chunks, 'el')
+
+        try:
+            for event in stream:
+                if parse_cache is None:
+                    yield Event.from_json(event)
+                else:
+                    yield parse_cache.from_json(event)
+        except (KeyError, TypeError) as e:
+            raise InvalidApiResponseError(stream.envelope, e)
+
+    def __reduce__(self):
+        return Event, Event._FIELD_VALUES(self)
+
     def __hash__(self):
         return self.id
 
 
+# sport id -> [(phase name, pattern with the phase number before the name, pattern with the number after the name)]
+_SPORT_PHASE_PATTERNS = {
+    sport_id: [
+        (phase_name, re.compile(r'(\d+)\S* ' + phase_name, re.IGNORECASE), re.compile(phase_name + r' (\d+)', re.IGNORECASE))
+        for phase_name in phase_names
+    ]
+    for sport_id, phase_names in Event.SPORT_PHASE_NAMES.items()
+}
+
+
+@lru_cache(maxsize=8192)
+def _parse_bet_phases(sport_id: int, bet_name: str) -> Tuple[str, Tuple[Tuple[str, int], ...]]:
+    # Returns the lowercase bet name and the (phase name, phase number) pairs it mentions
+    bet_name = bet_name.lower()
+    phases = []
+
+    for phase_name, pattern_pre, pattern_post in _SPORT_PHASE_PATTERNS[sport_id]:
+        if phase_name not in bet_name:
+            continue
+
+        match = pattern_pre.search(bet_name) or pattern_post.search(bet_name)
+
+        if match is not None:
+            phases.append((phase_name, int(match.group(1))))
+
+    return bet_name, tuple(phases)
+
+
 @dataclass
 class TeamInfo:
+    __slots__ = ('name', 'score')
+
     name: str
     score: Optional[int]
 
+    _FIELD_VALUES = attrgetter(*__slots__)
+
+    def __reduce__(self):
+        return TeamInfo, TeamInfo._FIELD_VALUES(self)
+
 
 @dataclass
 class Tip:
+    __slots__ = (
+        'id', 'unique_tip_group_id', 'name', 'odds', 'market_group_id', 'market_group_name',
+        'bet_group_id', 'bet_group_name', 'bet_group_name_real', 'is_active'
+    )
+
     id: int
     unique_tip_group_id: int
     name: str
@@ -193,6 +271,8 @@ class Tip:
     bet_group_name_real: str
     is_active: bool
 
+    _FIELD_VALUES = attrgetter(*__slots__)
+
     BGN_TEMPLATE_REGEX = re.compile('#[^#]+#')
 
     @classmethod
@@ -208,31 +288,125 @@ class Tip:
 
         try:
             for market in data['ml']:
-                unique_tip_group_id = market['mi']
-                market_group_id = market['bggi']
-                market_group_name = market['bggn']
-                bet_group_id = market['bgi']
-                bet_group_name = Tip.parse_bet_group_name(market['bgn'])
-                bet_group_name_real = market['mn']
-                is_active = market['ms'] == 10
-
-                for tip in market['msl']:
-                    tips.append(Tip(
-                        id=tip['msi'],
-                        unique_tip_group_id=unique_tip_group_id,
-                        name=tip['mst'],
-                        odds=tip['msp'],
-                        market_group_id=market_group_id,
-                        market_group_name=market_group_name,
-                        bet_group_id=bet_group_id,
-                        bet_group_name=bet_group_name,
-                        bet_group_name_real=bet_group_name_real,
-                        is_active=is_active
-                    ))
+                tips.extend(Tip.from_market_json(market))
         except (KeyError, TypeError, ValueError) as e:
             raise InvalidApiResponseError(data, e)
 
         return tips
 
+    @staticmethod
+    def from_market_json(market: dict) -> List[Tip]:
+        unique_tip_group_id = market['mi']
+        market_group_id = market['bggi']
+        market_group_name = _intern(market['bggn'])
+        bet_group_id = market['bgi']
+        bet_group_name = _intern(Tip.parse_bet_group_name(market['bgn']))
+        bet_group_name_real = _intern(market['mn'])
+        is_active = market['ms'] == 10
+
+        return [
+            Tip(
+                id=tip['msi'],
+                unique_tip_group_id=unique_tip_group_id,
+                name=_intern(tip['mst']),
+                odds=tip['msp'],
+                market_group_id=market_group_id,
+                market_group_name=market_group_name,
+                bet_group_id=bet_group_id,
+                bet_group_name=bet_group_name,
+                bet_group_name_real=bet_group_name_real,
+                is_active=is_active
+            )
+            for tip in market['msl']
+        ]
+
+    def __reduce__(self):
+        return Tip, Tip._FIELD_VALUES(self)
+
     def __hash__(self):
         return hash((self.market_group_id, self.bet_group_id, self.id))
+
+
+class EventParseCache:
+    # The clock and the score of a live event change on almost every poll, the odds of a few markets at a time.
+    # So the markets are digested one by one and the parsed tips of the unchanged ones reused, the rest of the
+    # event is parsed again every time.
+
+    EVICT_AFTER = 60  # seconds
+
+    def __init__(self, evict_after: float = EVICT_AFTER):
+        self.evict_after = evict_after
+        self.hits = 0  # markets
+        self.misses = 0
+
+        # event id -> ({market id: (digest, tips)}, event, last seen)
+        self._entries: Dict[int, Tuple[Dict[int, Tuple[int, List[Tip]]], Event, float]] = {}
+        self._last_eviction = monotonic()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def digest(market: dict) -> int:
+        # Everything Tip.from_market_json reads, several times cheaper to build than the tips themselves
+        return hash((
+            market['mi'], market['bggi'], market['bggn'], market['bgi'], market['bgn'], market['mn'], market['ms'],
+            tuple((t['msi'], t['mst'], t['msp']) for t in market['msl'])
+        ))
+
+    def from_json(self, data: dict) -> Event:
+        now = monotonic()
+
+        try:
+            event_id = data['ei']
+            entry = self._entries.get(event_id)
+            cached_markets = entry[0] if entry is not None else {}
+
+            markets = {}
+            tips = []
+            hits = 0
+
+            for market in data['ml']:
+                digest = EventParseCache.digest(market)
+                cached = cached_markets.get(market['mi'])
+
+                if cached is not None and cached[0] == digest:
+                    markets[market['mi']] = cached
+                    hits += 1
+                else:
+                    markets[market['mi']] = (digest, Tip.from_market_json(market))
+
+                tips.extend(markets[market['mi']][1])
+        except (KeyError, TypeError, ValueError) as e:
+            raise InvalidApiResponseError(data, e)
+
+        event = Event.from_json(data, tips=tips)
+
+        if entry is not None:
+            if hits == len(markets) == len(cached_markets):
+                # The phase analysis only depends on the tips
+                event.phase_related_bet_names = entry[1].phase_related_bet_names
+                event.current_phase_bet_names = entry[1].current_phase_bet_names
+            else:
+                event.inherit_phase_analysis(entry[1])
+
+        # Shards of one feed may be parsed concurrently
+        with self._lock:
+            self.hits += hits
+            self.misses += len(markets) - hits
+
+            self._entries[event_id] = (markets, event, now)
+
+            if now - self._last_eviction >= self.evict_after:
+                self._evict(now)
+
+        return event
+
+    def _evict(self, now: float):
+        self._entries = {
+            event_id: entry
+            for event_id, entry in self._entries.items()
+            if now - entry[2] < self.evict_after
+        }
+        self._last_eviction = now
+
+    def __len__(self):
+        return len(self._entries)
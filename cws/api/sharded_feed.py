@@ -0,0 +1,88 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Tuple, List, Set, Iterable, AbstractSet
+
+from .casino_winner import CasinoWinnerApi
+from .feed_client import FeedClient
+from .models import Event
+
+
+class ShardedEventFeed:
+    # Requests the live events one sport at a time, in parallel. The sports to request are discovered through the
+    # full list, the only listing of live sports the API offers. It is capped at EVENT_CAP events, so when a
+    # discovery hits the cap every sport known from earlier cycles gets a shard as well, and those without live
+    # events drop out again after one cycle. A sport never seen before that is left out by the cap cannot be found.
+
+    DISCOVERY_INTERVAL = 4  # cycles
+    MAX_CONCURRENCY = FeedClient.POOL_SIZE
+    EVENT_CAP = CasinoWinnerApi.EVENTS_PARAMS['eventCount']
+
+    def __init__(self, api: CasinoWinnerApi, max_concurrency: int = MAX_CONCURRENCY, discovery_interval: int = DISCOVERY_INTERVAL):
+        self.api = api
+        self.discovery_interval = discovery_interval
+        self.active_sport_ids = set()
+        self.foreign_events = 0
+        self.fallbacks = 0
+
+        self._cycles_since_discovery = discovery_interval
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='Feed shard')
+
+    def get_live_events(self, disabled_sport_ids: Set[int],
+                        known_sport_ids: AbstractSet[int] = frozenset()) -> Tuple[List[Event], datetime]:
+        if self._cycles_since_discovery >= self.discovery_interval or len(self.active_sport_ids) == 0:
+            events, timestamp = self._discover(known_sport_ids)
+        else:
+            events, timestamp = self._fetch_shards(self.active_sport_ids.difference(disabled_sport_ids))
+            self._cycles_since_discovery += 1
+
+        return [e for e in events if e.sport_id not in disabled_sport_ids], timestamp
+
+    def _discover(self, known_sport_ids: AbstractSet[int] = frozenset()) -> Tuple[List[Event], datetime]:
+        events, timestamp = self.api.get_all_live_events()
+
+        # Sports seen in the shards fetched since the previous discovery are kept even if they did not make it into
+        # the full list
+        self.active_sport_ids.update(e.sport_id for e in events)
+        self._cycles_since_discovery = 0
+
+        if len(events) >= self.EVENT_CAP:
+            self.active_sport_ids.update(known_sport_ids)
+
+        return events, timestamp
+
+    def _fetch_shards(self, sport_ids: Iterable[int]) -> Tuple[List[Event], datetime]:
+        try:
+            shards = list(self._executor.map(
+                lambda sport_id: (sport_id, *self.api.get_live_sport_events(sport_id)),
+                sport_ids
+            ))
+        # noinspection PyBroadException
+        except Exception as e:
+            # A shard that failed would leave its sport out of the cycle, the full list is requested instead
+            print(f'Fetching a feed shard failed, falling back to the full feed: {type(e).__name__}: {e}')
+            self.fallbacks += 1
+            return self.api.get_all_live_events()
+
+        if len(shards) == 0:
+            return self._discover()
+
+        events = []
+        event_ids = set()
+        timestamp = None
+
+        for sport_id, shard_events, shard_timestamp in shards:
+            # Only the events of the requested sport are kept, in case the sport filter is not applied by the server
+            own_events = [e for e in shard_events if e.sport_id == sport_id and e.id not in event_ids]
+            self.foreign_events += len(shard_events) - len(own_events)
+
+            if len(own_events) == 0:
+                self.active_sport_ids.discard(sport_id)
+
+            events.extend(own_events)
+            event_ids.update(e.id for e in own_events)
+
+            # The oldest shard response decides the cycle timestamp, so idle times are never overstated
+            if timestamp is None or shard_timestamp < timestamp:
+                timestamp = shard_timestamp
+
+        return events, timestamp
@@ -96,6 +96,8 @@ class BotInvalidCredentialsError(Exception):
 
 
 class BetBot:
+    REQUEST_TIMEOUT = (3.05, 10.0)  # seconds, connect and read
+
     def __init__(self, username: str, password: str, bookmaker: BookmakerType, country_code: str, is_enabled: bool, log_in: bool = False):
         self._username = username
         self._password = password
@@ -152,7 +154,7 @@ class BetBot:
         }
 
         print('Logging in...', end=' ')
-        r = self._get_session().post(self.bookmaker.url + '/api/v1/single-sign-on-sessions', json=data)
+        r = self._get_session().post(self.bookmaker.url + '/api/v1/single-sign-on-sessions', json=data, timeout=BetBot.REQUEST_TIMEOUT)
 
         try:
             r.raise_for_status()
@@ -181,7 +183,7 @@ class BetBot:
             return
 
         print('Logging out...', end=' ')
-        r = self._get_session().delete(self.bookmaker.url + '/api/v1/current-single-sign-on-session')
+        r = self._get_session().delete(self.bookmaker.url + '/api/v1/current-single-sign-on-session', timeout=BetBot.REQUEST_TIMEOUT)
         r.raise_for_status()
         print('done!')
 
@@ -190,7 +192,7 @@ class BetBot:
     @bet_login_required
     def _get_sportsbook_token(self):
         print('Getting sportsbook token...', end=' ')
-        r = self._get_session().get(f'{self.bookmaker.url}/api/sb/v2/sportsbookgames/betsson/{self._customer_id}')
+        r = self._get_session().get(f'{self.bookmaker.url}/api/sb/v2/sportsbookgames/betsson/{self._customer_id}', timeout=BetBot.REQUEST_TIMEOUT)
         r.raise_for_status()
         print('done!')
 
@@ -200,7 +202,7 @@ class BetBot:
     def get_wallet_balance(self, reload: bool = False) -> WalletBalance:
         if reload:
             print('Getting wallet balance...', end=' ')
-            r = self._get_session().get(self.bookmaker.url + '/api/v2/wallet/balance')
+            r = self._get_session().get(self.bookmaker.url + '/api/v2/wallet/balance', timeout=BetBot.REQUEST_TIMEOUT)
             r.raise_for_status()
             print('done!')
 
@@ -222,7 +224,7 @@ class BetBot:
         headers = {'sportsbookToken': self._sportsbook_token}
 
         print('Getting bet history...', end=' ')
-        r = self._get_session().get(self.bookmaker.url + '/api/sb/v1/widgets/coupon-history/v1', headers=headers, params=params)
+        r = self._get_session().get(self.bookmaker.url + '/api/sb/v1/widgets/coupon-history/v1', headers=headers, params=params, timeout=BetBot.REQUEST_TIMEOUT)
         r.raise_for_status()
         print('done!')
 
@@ -252,7 +254,7 @@ class BetBot:
         headers = {'sportsbookToken': self._sportsbook_token}
 
         print('Placing bet...', end=' ')
-        r = self._get_session().post(self.bookmaker.url + '/api/sb/v1/coupons', headers=headers, json=data)
+        r = self._get_session().post(self.bookmaker.url + '/api/sb/v1/coupons', headers=headers, json=data, timeout=BetBot.REQUEST_TIMEOUT)
         r.raise_for_status()
         print('done! Response:')
 
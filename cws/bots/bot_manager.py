@@ -1,4 +1,5 @@
-import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from time import perf_counter
 from typing import List, Dict, Tuple, Optional
 
 from sqlalchemy.exc import SQLAlchemyError
@@ -11,14 +12,19 @@ from cws.redis_manager import RedisManager
 
 
 class BotManager:
+    REFRESH_TIMEOUT = 40  # seconds
+    MAX_CONCURRENCY = 8
+
     _bots: Dict[int, BetBot]
+    _pending: Dict[int, Future]
 
-    def __init__(self, session: Session):
+    def __init__(self, session: Session, max_concurrency: int = MAX_CONCURRENCY):
         self.session = session
         self.redis_manager = RedisManager()
 
         self._bots = {}
-        self.load_bots(log_in_bots=True)
+        self._pending = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='Bot refresh')
 
     @property
     def enabled_bots(self) -> List[BetBot]:
@@ -41,7 +47,7 @@ class BotManager:
         else:
             return bots
 
-    def load_bots(self, log_in_bots: bool = False):
+    def load_bots(self):
         bots = self._get_bots_from_db()
         db_bot_ids = set()
 
@@ -57,60 +63,57 @@ class BotManager:
         for bot_id in set(self._bots.keys()).difference(db_bot_ids):
             del self._bots[bot_id]
 
-        if log_in_bots:
-            asyncio.run(self._log_in_bots())
-
-    async def _log_in_bots(self):
-        logged_off_bots = [bot for bot in self._bots.values() if not bot.has_session()]
-
-        if len(logged_off_bots) == 0:
-            return
+    def refresh(self):
+        # Runs as its own scheduled job. Each bot is logged in if needed and its wallet balance and bet history are
+        # fetched on a thread of its own, so one bookmaker or proxy that is slow or down only affects its own bots.
+        start = perf_counter()
+        self.load_bots()
 
-        loop = asyncio.get_event_loop()
-        futures = [
-            loop.run_in_executor(None, BetBot.login, bot, True)
-            for bot in logged_off_bots
-        ]
+        # A bot still busy with a refresh that timed out is left alone, its session is not thread-safe
+        self._pending = {bot_id: f for bot_id, f in self._pending.items() if not f.done() and bot_id in self._bots}
+        futures = {
+            bot_id: self._executor.submit(BotManager._refresh_bot, bot_id, bot)
+            for bot_id, bot in self._bots.items() if bot_id not in self._pending
+        }
 
-        await asyncio.gather(*futures)
+        done, not_done = wait(futures.values(), timeout=BotManager.REFRESH_TIMEOUT)
+        self._pending.update((bot_id, f) for bot_id, f in futures.items() if f in not_done)
 
-    async def _get_bots_wallet_balance(self) -> Dict[int, Optional[WalletBalance]]:
-        loop = asyncio.get_event_loop()
+        wallet_balances = {}
+        bet_histories = {}
 
-        def get_wallet_balance(bot_id: int, bot: BetBot) -> Tuple[int, Optional[WalletBalance]]:
-            # noinspection PyBroadException
-            try:
-                return bot_id, bot.get_wallet_balance(reload=True)
-            except:
-                return bot_id, None
+        for bot_id, f in futures.items():
+            if f in done:
+                wallet_balances[bot_id], bet_histories[bot_id] = f.result()
 
-        futures = [
-            loop.run_in_executor(None, get_wallet_balance, bot_id, bot)
-            for bot_id, bot in self._bots.items()
-        ]
-
-        return {bot_id: wallet_balance for bot_id, wallet_balance in await asyncio.gather(*futures)}
+        self.redis_manager.set_bet_bots_wallet_balance(wallet_balances)
+        self.redis_manager.set_bet_bots_bet_history(bet_histories)
 
-    async def _get_bots_bet_history(self) -> Dict[int, Optional[List[BetHistoryItem]]]:
-        loop = asyncio.get_event_loop()
+        print(f'{len(done)} of {len(self._bots)} bots refreshed in {perf_counter() - start:.1f} s, {len(self._pending)} still busy')
 
-        def get_bet_history(bot_id: int, bot: BetBot) -> Tuple[int, Optional[List[BetHistoryItem]]]:
-            # noinspection PyBroadException
-            try:
-                return bot_id, bot.get_bet_history()
-            except:
-                return bot_id, None
+    @staticmethod
+    def _refresh_bot(bot_id: int, bot: BetBot) -> Tuple[Optional[WalletBalance], Optional[List[BetHistoryItem]]]:
+        wallet_balance = None
+        bet_history = None
 
-        futures = [
-            loop.run_in_executor(None, get_bet_history, bot_id, bot)
-            for bot_id, bot in self._bots.items()
-        ]
+        # noinspection PyBroadException
+        try:
+            if not bot.has_session():
+                bot.login(True)
+        except Exception as e:
+            print(f'Logging in bot {bot_id} failed: {type(e).__name__}: {e}')
+            return wallet_balance, bet_history
 
-        return {bot_id: bet_history for bot_id, bet_history in await asyncio.gather(*futures)}
+        # noinspection PyBroadException
+        try:
+            wallet_balance = bot.get_wallet_balance(reload=True)
+        except Exception as e:
+            print(f'Getting wallet balance of bot {bot_id} failed: {type(e).__name__}: {e}')
 
-    def save_bots_info_to_redis(self):
-        wallet_balances = asyncio.run(self._get_bots_wallet_balance())
-        bet_histories = asyncio.run(self._get_bots_bet_history())
+        # noinspection PyBroadException
+        try:
+            bet_history = bot.get_bet_history()
+        except Exception as e:
+            print(f'Getting bet history of bot {bot_id} failed: {type(e).__name__}: {e}')
 
-        self.redis_manager.set_bet_bots_wallet_balance(wallet_balances)
-        self.redis_manager.set_bet_bots_bet_history(bet_histories)
+        return wallet_balance, bet_history
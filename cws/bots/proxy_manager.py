@@ -9,6 +9,7 @@ from cws.config import AppConfig
 class ProxyManager:
     WEBSHARE_API_TOKEN = None
     WEBSHARE_API_URL = 'https://proxy.webshare.io/api'
+    REQUEST_TIMEOUT = (3.05, 10.0)  # seconds, connect and read
 
     @classmethod
     def _get_token(cls) -> str:
@@ -30,7 +31,7 @@ class ProxyManager:
             'Authorization': f'Token {cls._get_token()}'
         }
 
-        r = get(cls.WEBSHARE_API_URL + '/proxy/list', headers=headers, params=params)
+        r = get(cls.WEBSHARE_API_URL + '/proxy/list', headers=headers, params=params, timeout=ProxyManager.REQUEST_TIMEOUT)
         r.raise_for_status()
 
         proxies = []
@@ -16,6 +16,19 @@ class AppConfig:
         TELEGRAM_TOKEN = 'CWS_TELEGRAM_TOKEN', str
         TELEGRAM_CHAT_ID = 'CWS_TELEGRAM_CHAT_ID', str
         WEBSHARE_API_TOKEN = 'WEBSHARE_API_TOKEN', str
+        SCANNER_PIPELINED = 'CWS_SCANNER_PIPELINED', bool, False
+        SCANNER_SHARDED_FETCH = 'CWS_SCANNER_SHARDED_FETCH', bool, False
+        SCANNER_STREAMING_DECODE = 'CWS_SCANNER_STREAMING_DECODE', bool, False
+        SCANNER_SNAPSHOT_ENGINE = 'CWS_SCANNER_SNAPSHOT_ENGINE', str, 'incremental'
+        SCANNER_WORKERS = 'CWS_SCANNER_WORKERS', int, 0
+        SCANNER_ADAPTIVE_SCHEDULE = 'CWS_SCANNER_ADAPTIVE_SCHEDULE', bool, False
+        SCANNER_TARGET_PERIOD = 'CWS_SCANNER_TARGET_PERIOD', float, 5.0
+        SCANNER_MIN_PERIOD = 'CWS_SCANNER_MIN_PERIOD', float, 1.0
+        SCANNER_MAX_PERIOD = 'CWS_SCANNER_MAX_PERIOD', float, 15.0
+        SCANNER_MIN_GAP = 'CWS_SCANNER_MIN_GAP', float, 0.5
+        SCANNER_CAPTURE_PATH = 'CWS_SCANNER_CAPTURE_PATH', str, None
+        BOT_REFRESH_INTERVAL = 'CWS_BOT_REFRESH_INTERVAL', int, 50
+        METRICS_TOKEN = 'CWS_METRICS_TOKEN', str, None
 
     _vars = {}
     _loaded = False
@@ -26,9 +39,14 @@ class AppConfig:
             load_dotenv(find_dotenv())
 
             for var in cls.Variables.__members__.values():
-                name, var_type = var.value
+                name, var_type, *default = var.value
 
                 env = os.getenv(name)
+
+                if env is None and len(default) > 0:
+                    cls._vars[var] = default[0]
+                    continue
+
                 assert env is not None, f'Environment variable: {name} is not set!'
 
                 if var_type is str:
@@ -38,6 +56,11 @@ class AppConfig:
                         env = int(env)
                     except ValueError:
                         raise ValueError(f'Environment variable: {name} should be an integer. Current value: {env}')
+                elif var_type is float:
+                    try:
+                        env = float(env)
+                    except ValueError:
+                        raise ValueError(f'Environment variable: {name} should be a number. Current value: {env}')
                 elif var_type is bool:
                     env = env.lower()
                     if env not in ['true', 'false']:
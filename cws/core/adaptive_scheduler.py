@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import threading
+import traceback
+from time import monotonic
+from typing import Callable, Optional, Hashable
+
+from cws.core.status_monitor import StatusMonitor
+
+
+class AdaptiveScheduler:
+    # Runs the scanner cycle back to back instead of on a fixed interval. The next cycle starts one period after the
+    # previous one started, or a short gap after it finished when it ran longer than that. The cycle returns a digest
+    # of the odds in the feed, the clock and score of live events change on every poll and do not count.
+    #
+    # The period starts at the target period and follows the update cadence of the feed: it stretches when polls keep
+    # returning the same odds, up to the maximum period so that the first movement after a lull is not seen late, and
+    # shrinks while every poll returns new ones, down to the minimum period or the time the cycle itself takes.
+    #
+    # With a pipelined scanner the feed prefetcher fetches one payload per cycle, so it follows this period as well.
+
+    TARGET_PERIOD = 5.0  # seconds
+    MIN_PERIOD = 1.0  # seconds
+    MAX_PERIOD = 15.0  # seconds
+    MIN_GAP = 0.5  # seconds
+    EWMA_WEIGHT = 0.3
+    SPEEDUP = 0.5  # of the interval between two polls that both returned new odds
+
+    cycles: int
+    late_cycles: int
+    skipped_cycles: int
+    stale_cycles: int
+    cycle_latency: Optional[float]
+    feed_period: Optional[float]
+
+    def __init__(self, cycle: Callable[[], Optional[Hashable]], status_monitor: StatusMonitor,
+                 target_period: float = TARGET_PERIOD, min_period: float = MIN_PERIOD, max_period: float = MAX_PERIOD,
+                 min_gap: float = MIN_GAP):
+        self._cycle = cycle
+        self.status_monitor = status_monitor
+        self.target_period = target_period
+        self.min_period = min_period
+        self.max_period = max(max_period, target_period)
+        self.min_gap = min_gap
+
+        self.cycles = 0
+        self.late_cycles = 0
+        self.skipped_cycles = 0
+        self.stale_cycles = 0
+        self.cycle_latency = None
+        self.feed_period = None
+
+        self._last_feed_digest = None
+        self._last_feed_change = None
+        self._stale_since_change = 0
+
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='Adaptive scheduler', daemon=True)
+
+    @property
+    def period(self) -> float:
+        if self.feed_period is None:
+            return self.target_period
+
+        # Polling faster than a cycle takes only makes every cycle late
+        period = max(self.min_period, min(self.max_period, self.feed_period))
+        return max(period, (self.cycle_latency or 0.0) + self.min_gap)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        next_start = monotonic()
+
+        while not self._stopped.wait(max(0.0, next_start - monotonic())):
+            start = monotonic()
+            period = self.period
+
+            try:
+                feed_digest = self._cycle()
+            except Exception as e:
+                self.status_monitor.cycle_failed(e, traceback.format_exc())
+                feed_digest = None
+
+            end = monotonic()
+
+            self.cycles += 1
+            self.cycle_latency = self._ewma(self.cycle_latency, end - start)
+
+            if feed_digest is not None:
+                self._record_feed_digest(feed_digest, end)
+
+            next_start = start + period
+
+            if end + self.min_gap > next_start:
+                # The cycle overran its period: the periods it covered are skipped and the next one follows the gap
+                self.late_cycles += 1
+                self.skipped_cycles += int((end + self.min_gap - next_start) / period)
+                self.status_monitor.cycle_late()
+
+                next_start = end + self.min_gap
+
+    def _record_feed_digest(self, feed_digest: Hashable, now: float):
+        if feed_digest == self._last_feed_digest:
+            self.stale_cycles += 1
+            self._stale_since_change += 1
+            return
+
+        if self._last_feed_change is not None:
+            if self._stale_since_change > 0:
+                # A lull of minutes counts as no more than the maximum period, or it would take many changes to recover
+                sample = min(now - self._last_feed_change, self.max_period)
+                self.feed_period = self._ewma(self.feed_period, sample)
+            else:
+                # The odds changed on every poll, so changes may be missed: the period is probed downwards until polls
+                # start returning the same odds again
+                interval = now - self._last_feed_change
+                self.feed_period = self._ewma(self.feed_period or interval, interval * AdaptiveScheduler.SPEEDUP)
+
+        self._last_feed_digest = feed_digest
+        self._last_feed_change = now
+        self._stale_since_change = 0
+
+    @staticmethod
+    def _ewma(current: Optional[float], sample: float) -> float:
+        if current is None:
+            return sample
+        else:
+            return current + AdaptiveScheduler.EWMA_WEIGHT * (sample - current)
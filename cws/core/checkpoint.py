@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import zlib
+from datetime import datetime
+from json import dumps, loads
+from typing import List, Tuple, Dict, Iterable
+
+from cws.api.models import Event
+from cws.core.clock import Clock, SYSTEM_CLOCK
+from cws.core.notification import Notification
+from cws.core.snapshots import SnapshotEngine, TipState_t
+
+# (event id, tip group id, triggered on as a POSIX timestamp, first notification sent, second notification sent)
+NotificationState_t = Tuple[int, int, float, bool, bool]
+
+
+class SnapshotCheckpoint:
+    VERSION = 1
+    DATE_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+    timestamp: datetime
+    tip_states: List[TipState_t]
+    notification_states: List[NotificationState_t]
+
+    def __init__(self, timestamp: datetime, tip_states: List[TipState_t], notification_states: List[NotificationState_t]):
+        self.timestamp = timestamp
+        self.tip_states = tip_states
+        self.notification_states = notification_states
+
+    @staticmethod
+    def create(timestamp: datetime, engine: SnapshotEngine, notifications: Iterable[Notification]) -> SnapshotCheckpoint:
+        return SnapshotCheckpoint(timestamp, engine.export_tip_states(), [
+            (n.event.id, n.tip_group[0].unique_tip_group_id, n.triggered_on.timestamp(),
+             n.first_notification_sent, n.second_notification_sent)
+            for n in notifications
+        ])
+
+    def dumps(self) -> bytes:
+        return zlib.compress(dumps({
+            'version': SnapshotCheckpoint.VERSION,
+            'timestamp': self.timestamp.strftime(SnapshotCheckpoint.DATE_FORMAT),
+            'tips': self.tip_states,
+            'notifications': self.notification_states
+        }, separators=(',', ':')).encode('utf-8'))
+
+    @staticmethod
+    def loads(data: bytes) -> SnapshotCheckpoint:
+        checkpoint = loads(zlib.decompress(data).decode('utf-8'))
+
+        if checkpoint['version'] != SnapshotCheckpoint.VERSION:
+            raise ValueError(f'Unsupported snapshot checkpoint version: {checkpoint["version"]}')
+
+        return SnapshotCheckpoint(
+            datetime.strptime(checkpoint['timestamp'], SnapshotCheckpoint.DATE_FORMAT),
+            [tuple(s) for s in checkpoint['tips']],
+            [tuple(s) for s in checkpoint['notifications']]
+        )
+
+    def restore(self, engine: SnapshotEngine, events: List[Event],
+                clock: Clock = SYSTEM_CLOCK) -> Tuple[int, Dict[int, Notification]]:
+        # The engine must already hold the first fresh feed. Only tips that still exist with unchanged odds get their
+        # idle time back. The time the scanner was down is not added, the odds may have moved and come back meanwhile.
+        restored_tips = engine.restore_tip_states(self.tip_states)
+
+        events_by_id = {e.id: e for e in events}
+        notifications = {}
+
+        for event_id, tip_group_id, triggered_on, first_sent, second_sent in self.notification_states:
+            event = events_by_id.get(event_id)
+
+            if event is None:
+                continue
+
+            tip_group = [t for t in event.tips if t.unique_tip_group_id == tip_group_id]
+
+            if len(tip_group) == 0:
+                continue
+
+            n = Notification(event, tip_group, clock)
+            n.triggered_on = datetime.fromtimestamp(triggered_on)
+            n.first_notification_sent = first_sent
+            n.second_notification_sent = second_sent
+
+            notifications[hash(n)] = n
+
+        return restored_tips, notifications
@@ -0,0 +1,22 @@
+from datetime import datetime
+
+
+class Clock:
+    # Wall-clock time for everything that ages in real time, replaceable so a captured feed can be replayed faster
+
+    def now(self) -> datetime:
+        return datetime.now()
+
+
+class ManualClock(Clock):
+    def __init__(self, now: datetime):
+        self._now = now
+
+    def now(self) -> datetime:
+        return self._now
+
+    def set(self, now: datetime):
+        self._now = now
+
+
+SYSTEM_CLOCK = Clock()
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import List, Tuple, Optional, Iterable
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from cws.api.models import Event, Tip
+from cws.core.filter_index import FilterIndex
+from cws.core.snapshots import SnapshotEngine, TipState_t
+
+_ROW_FIELDS = [
+    ('event_index', 'i8'),
+    ('event_id', 'i8'),
+    ('sport_id', 'i8'),
+    ('market_id', 'i8'),
+    ('bet_id', 'i8'),
+    ('tip_group_id', 'i8'),
+    ('tip_id', 'i8'),
+    ('odds', 'f8'),
+    ('is_active', '?'),
+    ('trigger_time', 'i8')
+]
+
+_KEY_FIELDS = ['event_id', 'market_id', 'tip_group_id', 'tip_id']
+
+
+class ColumnarSnapshotEngine(SnapshotEngine):
+    # Holds the filtered tips of a cycle as parallel arrays, one row per tip. Odds changes are found by joining
+    # the rows with the previous cycle on (event, market, tip group, tip) and tip groups are reduced in bulk.
+
+    events: List[Event]
+    timestamp: Optional[datetime]
+    changed_tips: int
+
+    def __init__(self):
+        if np is None:
+            raise RuntimeError('The columnar snapshot engine requires numpy to be installed')
+
+        self.events = []
+        self.timestamp = None
+        self.changed_tips = 0
+
+        self._rows = np.empty(0, dtype=_ROW_FIELDS)
+        self._tips = []
+        self._idle = np.empty(0, dtype=np.int64)
+        self._sorted_keys = np.empty(0, dtype=[(f, 'i8') for f in _KEY_FIELDS])
+        self._key_order = np.empty(0, dtype=np.intp)
+
+        self._group_order = np.empty(0, dtype=np.intp)
+        self._group_starts = np.empty(0, dtype=np.intp)
+        self._event_is_break = np.empty(0, dtype=bool)
+        self._event_has_few_tips = np.empty(0, dtype=bool)
+
+    def update(self, events: List[Event], timestamp: datetime, enabled_filters: FilterIndex):
+        rows = []
+        tips = []
+
+        for event_index, event in enumerate(events):
+            market_filters = enabled_filters.get_sport_filters(event.sport_id)
+
+            if market_filters is None:
+                continue
+
+            for tip in event.tips:
+                bet_filters = market_filters.get(tip.market_group_id)
+
+                if bet_filters is None:
+                    continue
+
+                trigger_time = bet_filters.get(tip.bet_group_id)
+
+                if trigger_time is None:
+                    continue
+
+                rows.append((
+                    event_index, event.id, event.sport_id, tip.market_group_id, tip.bet_group_id,
+                    tip.unique_tip_group_id, tip.id, tip.odds, tip.is_active, trigger_time
+                ))
+                tips.append(tip)
+
+        rows = np.array(rows, dtype=_ROW_FIELDS)
+        keys = self._make_keys(rows)
+        idle = np.zeros(len(rows), dtype=np.int64)
+        self.changed_tips = 0
+
+        if len(rows) > 0 and len(self._sorted_keys) > 0:
+            time_between_updates = int((timestamp - self.timestamp).total_seconds())
+
+            positions = np.minimum(np.searchsorted(self._sorted_keys, keys), len(self._sorted_keys) - 1)
+            is_known = self._sorted_keys[positions] == keys
+            old_rows = self._key_order[positions]
+
+            is_unchanged = is_known & (self._rows['odds'][old_rows] == rows['odds'])
+            idle = np.where(is_unchanged, self._idle[old_rows] + time_between_updates, 0)
+            self.changed_tips = int(np.count_nonzero(is_known & ~is_unchanged))
+
+        self.events = events
+        self.timestamp = timestamp
+
+        self._rows = rows
+        self._tips = tips
+        self._idle = idle
+        self._key_order = np.argsort(keys, kind='stable')
+        self._sorted_keys = keys[self._key_order]
+
+        # Stable sort keeps the feed order of tips inside their group
+        self._group_order = np.lexsort((rows['tip_group_id'], rows['market_id'], rows['event_index']))
+        grouped = rows[self._group_order]
+        is_group_start = np.ones(len(grouped), dtype=bool)
+        is_group_start[1:] = (grouped['event_index'][1:] != grouped['event_index'][:-1]) \
+            | (grouped['market_id'][1:] != grouped['market_id'][:-1]) \
+            | (grouped['tip_group_id'][1:] != grouped['tip_group_id'][:-1])
+        self._group_starts = np.flatnonzero(is_group_start)
+
+        self._event_is_break = np.array([bool(e.is_break) for e in events], dtype=bool)
+        self._event_has_few_tips = np.array([len(e.tips) <= 5 for e in events], dtype=bool)
+
+    def find_triggered_tip_groups(self, enabled_filters: FilterIndex, min_odds: float, max_odds: float,
+                                  auto_break_min_idle_time: int) -> List[Tuple[Event, List[Tip]]]:
+        if len(self._rows) == 0:
+            return []
+
+        order, starts = self._group_order, self._group_starts
+        first_rows = self._rows[order[starts]]
+
+        group_min_idle = np.minimum.reduceat(self._idle[order], starts)
+        group_min_odds = np.minimum.reduceat(self._rows['odds'][order], starts)
+        group_max_odds = np.maximum.reduceat(self._rows['odds'][order], starts)
+        group_event = first_rows['event_index']
+
+        is_triggered = first_rows['is_active'] \
+            & (group_min_idle >= first_rows['trigger_time']) \
+            & (group_min_odds >= min_odds) \
+            & (group_max_odds <= max_odds)
+
+        # An event is on an auto-break when none of its tip groups changed recently
+        has_recent_change = np.bincount(
+            group_event[group_min_idle < auto_break_min_idle_time], minlength=len(self.events)
+        ) > 0
+        is_event_eligible = ~self._event_is_break & (has_recent_change | self._event_has_few_tips)
+
+        ends = np.append(starts[1:], len(order))
+
+        return [
+            (self.events[group_event[g]], [self._tips[r] for r in order[starts[g]:ends[g]]])
+            for g in np.flatnonzero(is_triggered & is_event_eligible[group_event])
+        ]
+
+    def export_tip_states(self) -> List[TipState_t]:
+        return list(zip(
+            *(self._rows[f].tolist() for f in _KEY_FIELDS), self._rows['odds'].tolist(), self._idle.tolist()
+        ))
+
+    def restore_tip_states(self, tip_states: Iterable[TipState_t]) -> int:
+        states = np.array(list(tip_states), dtype=[(f, 'i8') for f in _KEY_FIELDS] + [('odds', 'f8'), ('idle', 'i8')])
+
+        if len(states) == 0 or len(self._sorted_keys) == 0:
+            return 0
+
+        keys = self._make_keys(states)
+        positions = np.minimum(np.searchsorted(self._sorted_keys, keys), len(self._sorted_keys) - 1)
+        rows = self._key_order[positions]
+
+        is_restored = (self._sorted_keys[positions] == keys) & (self._rows['odds'][rows] == states['odds'])
+        self._idle[rows[is_restored]] = states['idle'][is_restored]
+
+        return int(np.count_nonzero(is_restored))
+
+    @staticmethod
+    def _make_keys(rows: np.ndarray) -> np.ndarray:
+        keys = np.empty(len(rows), dtype=[(f, 'i8') for f in _KEY_FIELDS])
+
+        for f in _KEY_FIELDS:
+            keys[f] = rows[f]
+
+        return keys
+
+    def __len__(self):
+        return len(self.events)
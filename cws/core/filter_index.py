@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+from typing import Dict, Iterable, Tuple, Optional
+
+SportID_t = MarketID_t = BetID_t = int
+MarketFilters_t = Dict[MarketID_t, Dict[BetID_t, int]]
+
+
+class FilterIndex:
+    # Trigger times of the enabled bets nested as sport -> market -> bet. A sport or market is present only when it
+    # has at least one enabled bet, so whole events and markets can be rejected before their tips are looked at.
+
+    _sports: Dict[SportID_t, MarketFilters_t]
+
+    def __init__(self, filters: Iterable[Tuple[SportID_t, MarketID_t, BetID_t, int]] = ()):
+        self._sports = {}
+
+        for sport_id, market_id, bet_id, trigger_time in filters:
+            self._sports.setdefault(sport_id, {}).setdefault(market_id, {})[bet_id] = trigger_time
+
+        self._size = sum(len(bets) for markets in self._sports.values() for bets in markets.values())
+
+    def get_sport_filters(self, sport_id: SportID_t) -> Optional[MarketFilters_t]:
+        return self._sports.get(sport_id)
+
+    def get_trigger_time(self, sport_id: SportID_t, market_id: MarketID_t, bet_id: BetID_t) -> Optional[int]:
+        try:
+            return self._sports[sport_id][market_id][bet_id]
+        except KeyError:
+            return None
+
+    def __len__(self):
+        return self._size
+
+    def __eq__(self, other):
+        return isinstance(other, FilterIndex) and self._sports == other._sports
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+from typing import Set, Tuple, Iterable, List
+
+from sqlalchemy.orm import Session
+
+from cws.models import Sport, Market, Bet
+
+SportRow_t = Tuple[int, str]
+MarketRow_t = Tuple[int, str, bool, None, int]
+BetRow_t = Tuple[int, str, bool, int, int]
+
+
+class KnownEntityCache:
+    # Primary keys of the sports, markets and bets that are already stored in the database, so that only entities
+    # never seen before have to be upserted.
+
+    EWMA_WEIGHT = 0.3
+
+    sports: Set[int]
+    markets: Set[Tuple[int, int]]
+    bets: Set[Tuple[int, int, int]]
+
+    inserted_rows: int
+    skipped_rows: int
+    skipped_round_trips: int
+    time_saved: float
+
+    def __init__(self):
+        self.sports = set()
+        self.markets = set()
+        self.bets = set()
+
+        self.inserted_rows = 0
+        self.skipped_rows = 0
+        self.skipped_round_trips = 0
+        self.time_saved = 0.0
+
+        self._upsert_duration = None
+
+    def load(self, session: Session):
+        self.sports = {sport_id for sport_id, in session.query(Sport.id)}
+        self.markets = set(session.query(Market.sport_id, Market.id))
+        self.bets = set(session.query(Bet.sport_id, Bet.market_id, Bet.id))
+
+    def filter_new(self, sports: Iterable[SportRow_t], markets: Iterable[MarketRow_t],
+                   bets: Iterable[BetRow_t]) -> Tuple[List[SportRow_t], List[MarketRow_t], List[BetRow_t]]:
+        new_sports = [s for s in sports if s[0] not in self.sports]
+        new_markets = [m for m in markets if (m[4], m[0]) not in self.markets]
+        new_bets = [b for b in bets if (b[3], b[4], b[0]) not in self.bets]
+
+        return new_sports, new_markets, new_bets
+
+    def add(self, sports: Iterable[SportRow_t], markets: Iterable[MarketRow_t], bets: Iterable[BetRow_t]):
+        self.sports.update(s[0] for s in sports)
+        self.markets.update((m[4], m[0]) for m in markets)
+        self.bets.update((b[3], b[4], b[0]) for b in bets)
+
+    def record_upsert(self, inserted_rows: int, skipped_rows: int, duration: float):
+        self.inserted_rows += inserted_rows
+        self.skipped_rows += skipped_rows
+
+        if self._upsert_duration is None:
+            self._upsert_duration = duration
+        else:
+            self._upsert_duration += KnownEntityCache.EWMA_WEIGHT * (duration - self._upsert_duration)
+
+    def record_skip(self, skipped_rows: int):
+        self.skipped_rows += skipped_rows
+        self.skipped_round_trips += 1
+
+        # Nothing to measure when the round trip did not happen, so the average upsert duration is what it would cost
+        if self._upsert_duration is not None:
+            self.time_saved += self._upsert_duration
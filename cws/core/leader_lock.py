@@ -0,0 +1,88 @@
+import os
+import socket
+import threading
+from time import monotonic
+from typing import Optional
+from uuid import uuid4
+
+from redis import RedisError
+
+from cws.redis_manager import RedisManager
+
+
+class LeaderLock:
+    # Lease in Redis that allows a single scanner across all hosts. Standby processes keep trying to take it over,
+    # so a scanner that dies is replaced as soon as its lease expires.
+
+    TTL = 10.0  # seconds
+    RENEW_INTERVAL = 2.0  # seconds
+    RETRY_INTERVAL = 1.0  # seconds
+
+    token: str
+    acquired: threading.Event
+    lost: threading.Event
+
+    def __init__(self, redis_manager: RedisManager, ttl: float = TTL, renew_interval: float = RENEW_INTERVAL,
+                 retry_interval: float = RETRY_INTERVAL):
+        self.redis_manager = redis_manager
+        self.ttl = ttl
+        self.renew_interval = renew_interval
+        self.retry_interval = retry_interval
+
+        self.token = f'{socket.gethostname()}:{os.getpid()}:{uuid4().hex}'
+        self.acquired = threading.Event()
+        self.lost = threading.Event()
+
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='Scanner leader lock', daemon=True)
+
+    @property
+    def is_leader(self) -> bool:
+        return self.acquired.is_set() and not self.lost.is_set()
+
+    def start(self):
+        self._thread.start()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self.acquired.wait(timeout)
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+        if self.is_leader:
+            try:
+                self.redis_manager.release_scanner_leader(self.token)
+            except RedisError:
+                pass
+
+    def _run(self):
+        ttl_ms = int(self.ttl * 1000)
+
+        while not self._stopped.is_set():
+            try:
+                if self.redis_manager.acquire_scanner_leader(self.token, ttl_ms):
+                    break
+            except RedisError as e:
+                print(f'Scanner leader lock not acquired: {e}')
+
+            self._stopped.wait(self.retry_interval)
+        else:
+            return
+
+        self.acquired.set()
+        last_renewal = monotonic()
+
+        while not self._stopped.wait(self.renew_interval):
+            try:
+                renewed = self.redis_manager.renew_scanner_leader(self.token, ttl_ms)
+            except RedisError as e:
+                print(f'Scanner leader lock not renewed: {e}')
+                renewed = None
+
+            if renewed:
+                last_renewal = monotonic()
+            elif renewed is False or monotonic() - last_renewal >= self.ttl - self.renew_interval:
+                # Give up before the lease can expire, so two scanners never run at the same time
+                self.lost.set()
+                return
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Dict, Iterator, List, Tuple, Optional, Union
+
+Number_t = Union[int, float]
+
+
+class Histogram:
+    # Cumulative Prometheus buckets plus the samples of the most recent cycles for rolling quantiles
+
+    buckets: Tuple[float, ...]
+    bucket_counts: List[int]
+    sum: float
+    count: int
+    recent: deque
+
+    def __init__(self, buckets: Tuple[float, ...], window: int):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value: float):
+        i = bisect_left(self.buckets, value)
+
+        if i < len(self.buckets):
+            self.bucket_counts[i] += 1
+
+        self.sum += value
+        self.count += 1
+        self.recent.append(value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if len(self.recent) == 0:
+            return None
+
+        values = sorted(self.recent)
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class CycleMetrics:
+    # Stage durations and counters of the scanner, rendered in the Prometheus text format
+
+    PREFIX = 'cws'
+    STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+    QUANTILES = (0.5, 0.9, 0.99)
+    WINDOW = 120  # cycles
+
+    stages: Dict[str, Histogram]
+    gauges: Dict[str, Tuple[str, Number_t]]
+    counters: Dict[str, Tuple[str, Number_t]]
+
+    def __init__(self, window: int = WINDOW):
+        self.window = window
+        self.stages = {}
+        self.gauges = {}
+        self.counters = {}
+
+    @contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        start = perf_counter()
+
+        try:
+            yield
+        finally:
+            self.observe(stage, perf_counter() - start)
+
+    def observe(self, stage: str, seconds: float):
+        histogram = self.stages.get(stage)
+
+        if histogram is None:
+            histogram = self.stages[stage] = Histogram(CycleMetrics.STAGE_BUCKETS, self.window)
+
+        histogram.observe(seconds)
+
+    def set_gauge(self, name: str, value: Number_t, description: str):
+        self.gauges[name] = (description, value)
+
+    def set_counter(self, name: str, value: Number_t, description: str):
+        self.counters[name] = (description, value)
+
+    def render(self) -> str:
+        prefix = CycleMetrics.PREFIX
+        lines = [
+            f'# HELP {prefix}_stage_duration_seconds Duration of the stages of a scanner cycle',
+            f'# TYPE {prefix}_stage_duration_seconds histogram'
+        ]
+
+        for stage, h in self.stages.items():
+            cumulative = 0
+
+            for le, count in zip(h.buckets, h.bucket_counts):
+                cumulative += count
+                lines.append(f'{prefix}_stage_duration_seconds_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+
+            lines.append(f'{prefix}_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {h.count}')
+            lines.append(f'{prefix}_stage_duration_seconds_sum{{stage="{stage}"}} {h.sum}')
+            lines.append(f'{prefix}_stage_duration_seconds_count{{stage="{stage}"}} {h.count}')
+
+        lines.append(f'# HELP {prefix}_stage_duration_recent_seconds Quantiles of the stage durations over the last {self.window} cycles')
+        lines.append(f'# TYPE {prefix}_stage_duration_recent_seconds gauge')
+
+        for stage, h in self.stages.items():
+            for q in CycleMetrics.QUANTILES:
+                value = h.quantile(q)
+
+                if value is not None:
+                    lines.append(f'{prefix}_stage_duration_recent_seconds{{stage="{stage}",quantile="{q}"}} {value}')
+
+        for metric_type, metrics in (('gauge', self.gauges), ('counter', self.counters)):
+            for name, (description, value) in metrics.items():
+                lines.append(f'# HELP {prefix}_{name} {description}')
+                lines.append(f'# TYPE {prefix}_{name} {metric_type}')
+                lines.append(f'{prefix}_{name} {value}')
+
+        return '\n'.join(lines) + '\n'
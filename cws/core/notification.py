@@ -1,8 +1,9 @@
 import json
 from datetime import datetime
-from typing import List
+from typing import List, Optional, Tuple
 
 from cws.api.models import Event, Tip
+from cws.core.clock import Clock, SYSTEM_CLOCK
 
 
 class Notification:
@@ -11,45 +12,65 @@ class Notification:
     triggered_on: datetime
     first_notification_sent: bool
     second_notification_sent: bool
+    clock: Clock
 
-    def __init__(self, event: Event, tip_group: List[Tip]):
+    def __init__(self, event: Event, tip_group: List[Tip], clock: Clock = SYSTEM_CLOCK):
         self.event = event
         self.tip_group = tip_group
-        self.triggered_on = datetime.now()
+        self.clock = clock
+        self.triggered_on = clock.now()
         self.first_notification_sent = False
         self.second_notification_sent = False
 
+        self._json: Optional[str] = None
+        self._json_state: Optional[Tuple[str, str]] = None
+
+    @property
+    def id(self) -> str:
+        # Stable across cycles and scanner restarts and exact in JavaScript, unlike the hash
+        return f'{self.event.id}-{self.tip_group[0].unique_tip_group_id}'
+
     def update(self, updated_event: Event):
         self.event = updated_event
 
     @property
     def uptime_seconds(self) -> int:
-        return int((datetime.now() - self.triggered_on).total_seconds())
+        return int((self.clock.now() - self.triggered_on).total_seconds())
 
     @property
     def uptime_formatted(self) -> str:
-        uptime = datetime.now() - self.triggered_on
+        uptime = self.clock.now() - self.triggered_on
         minutes = int(uptime.total_seconds() // 60)
         seconds = int(uptime.total_seconds() % 60)
 
         return f'{minutes:02}:{seconds:02}'
 
     def to_json(self) -> str:
+        # Nothing in it ages by itself, the uptime is worked out from triggered_on by the browser. So the JSON only
+        # changes with the score and the match time and is cached until one of them does.
+        score = self.event.get_score()
+        time = self.event.get_time_or_phase()
+
+        if self._json is not None and self._json_state == (score, time):
+            return self._json
+
         n = {
-            'id': hash(self),
+            'id': self.id,
             'link': self.event.link,
             'sport_name': self.event.get_sport_name_or_emoji(),
             'first_team': self.event.first_team.name,
             'second_team': self.event.second_team.name,
-            'score': self.event.get_score(),
-            'time': self.event.get_time_or_phase(),
+            'score': score,
+            'time': time,
             'bet_name': self.tip_group[0].bet_group_name_real,
             'tips': [{'name': tip.name, 'odds': tip.odds} for tip in self.tip_group],
-            'uptime': self.uptime_formatted,
-            'uptime_seconds': self.uptime_seconds
+            'triggered_on': self.triggered_on.timestamp()
         }
 
-        return json.dumps(n, ensure_ascii=False)
+        self._json = json.dumps(n, ensure_ascii=False)
+        self._json_state = (score, time)
+
+        return self._json
 
     def construct_telegram_message(self) -> str:
         header = f'{self.event.get_sport_name_or_emoji()} <b>{self.event.first_team.name} vs {self.event.second_team.name}</b>'
@@ -0,0 +1,36 @@
+from typing import Dict, Iterable
+
+from cws.core.notification import Notification
+from cws.redis_manager import RedisManager
+
+
+class NotificationStore:
+    # Keeps the notification hash in Redis in step with the open notifications by writing only what changed since
+    # the previous cycle, so the writes grow with the churn instead of with the number of open notifications
+
+    _written: Dict[str, str]
+
+    def __init__(self, redis_manager: RedisManager):
+        self.redis_manager = redis_manager
+        self.version = 0
+        self.written_notifications = 0
+        self.removed_notifications = 0
+        self.full_writes = 0
+
+        self._written = {}
+
+    def update(self, notifications: Iterable[Notification]):
+        current = {n.id: n.to_json() for n in notifications}
+        changed = {n_id: n_json for n_id, n_json in current.items() if self._written.get(n_id) != n_json}
+        removed = [n_id for n_id in self._written if n_id not in current]
+
+        self.version, size = self.redis_manager.update_notifications(changed, removed)
+
+        # The hash is gone or out of step, e.g. it expired while the scanner was stalled or Redis was restarted
+        if size != len(current):
+            self.version, size = self.redis_manager.update_notifications(current, (), replace=True)
+            self.full_writes += 1
+
+        self.written_notifications += len(changed)
+        self.removed_notifications += len(removed)
+        self._written = current
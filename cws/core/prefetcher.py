@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from queue import Queue, Empty
+from time import monotonic
+from typing import Callable, Generic, TypeVar, Optional
+
+T = TypeVar('T')
+
+
+@dataclass
+class _Payload(Generic[T]):
+    result: Optional[T]
+    error: Optional[Exception]
+    fetched_at: float
+
+
+class FeedPrefetcher(Generic[T]):
+    # Fetches the next payload while the current one is processed. Every get demands exactly one fetch, timed to land
+    # just before the next get is expected, so the feed is polled at the pace of the consumer and not at all while it
+    # stops asking (a stretched adaptive period, a lost leader lock). A payload that went stale waiting for a late
+    # consumer is dropped by get, which then waits for the fetch its own demand started.
+
+    MAX_PAYLOAD_AGE = 4.0
+    GET_TIMEOUT = 30.0
+    EWMA_WEIGHT = 0.3
+    START_MARGIN = 1.25
+
+    def __init__(self, fetch: Callable[[], T], max_payload_age: float = MAX_PAYLOAD_AGE):
+        self._fetch = fetch
+        self._max_payload_age = max_payload_age
+
+        # Hand-off queue of depth 1: a payload that has not been picked up is replaced by a fresher one
+        self._slot = Queue(maxsize=1)
+        self._demand = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='Feed prefetcher', daemon=True)
+
+        self._last_get = None
+        self._get_interval = None
+        self._fetch_duration = None
+
+        self.dropped_payloads = 0
+
+    def start(self):
+        self._demand.set()
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._demand.set()
+
+    def get(self, timeout: float = GET_TIMEOUT) -> T:
+        while True:
+            try:
+                payload = self._slot.get(timeout=timeout)
+            except Empty:
+                raise TimeoutError(f'No feed payload was fetched within {timeout} seconds')
+
+            self._record_get()
+            self._demand.set()
+
+            if payload.error is not None:
+                raise payload.error
+
+            if monotonic() - payload.fetched_at > self._max_payload_age:
+                self.dropped_payloads += 1
+                continue
+
+            return payload.result
+
+    def _record_get(self):
+        now = monotonic()
+
+        if self._last_get is not None:
+            self._get_interval = self._ewma(self._get_interval, now - self._last_get)
+
+        self._last_get = now
+
+    def _next_fetch_delay(self) -> float:
+        # Start fetching so that the payload lands just before the consumer is expected to ask for it
+        if self._last_get is None or self._get_interval is None or self._fetch_duration is None:
+            return 0
+
+        start_at = self._last_get + self._get_interval - self._fetch_duration * FeedPrefetcher.START_MARGIN
+        return max(0.0, start_at - monotonic())
+
+    def _run(self):
+        while True:
+            self._demand.wait()
+
+            if self._stopped.is_set() or self._stopped.wait(self._next_fetch_delay()):
+                return
+
+            self._demand.clear()
+
+            start = monotonic()
+            try:
+                payload = _Payload(self._fetch(), None, monotonic())
+            except Exception as e:
+                payload = _Payload(None, e, monotonic())
+
+            self._fetch_duration = self._ewma(self._fetch_duration, payload.fetched_at - start)
+            self._put(payload)
+
+    def _put(self, payload: _Payload):
+        try:
+            self._slot.get_nowait()
+            self.dropped_payloads += 1
+        except Empty:
+            pass
+
+        self._slot.put_nowait(payload)
+
+    @staticmethod
+    def _ewma(current: Optional[float], sample: float) -> float:
+        if current is None:
+            return sample
+        else:
+            return current + FeedPrefetcher.EWMA_WEIGHT * (sample - current)
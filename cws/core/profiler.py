@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import cProfile
+import io
+import marshal
+import pstats
+from datetime import datetime
+from typing import Callable, Optional, TypeVar
+
+from cws.redis_manager import RedisManager
+
+T = TypeVar('T')
+
+
+class CycleProfiler:
+    # Profiles the next few scanner cycles when an admin asks for it. Only the scanner thread is profiled, so
+    # fetches made by the prefetcher or feed shards show up as time spent waiting for them.
+
+    MAX_CYCLES = 50
+    TOP_FUNCTIONS = 40
+
+    cycles_left: int
+
+    def __init__(self, redis_manager: RedisManager):
+        self.redis_manager = redis_manager
+        self.cycles_left = 0
+
+        self._profile: Optional[cProfile.Profile] = None
+        self._profiled_cycles = 0
+        self._started_on = None
+
+    @property
+    def armed(self) -> bool:
+        return self.cycles_left > 0
+
+    def arm(self, cycles: int):
+        if self.armed:
+            return
+
+        self.cycles_left = max(1, min(cycles, CycleProfiler.MAX_CYCLES))
+        self._profile = cProfile.Profile()
+        self._profiled_cycles = 0
+        self._started_on = datetime.now()
+
+        print(f'Profiling the next {self.cycles_left} cycles')
+
+    def run(self, cycle: Callable[[], T]) -> T:
+        self._profile.enable()
+
+        try:
+            return cycle()
+        finally:
+            self._profile.disable()
+            self._profiled_cycles += 1
+            self.cycles_left -= 1
+
+            if self.cycles_left == 0:
+                self._save()
+
+    def _save(self):
+        stats = pstats.Stats(self._profile)
+
+        summary = io.StringIO()
+        summary.write(f'{self._profiled_cycles} cycles profiled from {self._started_on} to {datetime.now()}\n\n')
+        pstats.Stats(self._profile, stream=summary).sort_stats('cumulative').print_stats(CycleProfiler.TOP_FUNCTIONS)
+        pstats.Stats(self._profile, stream=summary).sort_stats('tottime').print_stats(CycleProfiler.TOP_FUNCTIONS)
+
+        # Same format as pstats.Stats.dump_stats, so the download opens in pstats, snakeviz and the like
+        self.redis_manager.set_profile(marshal.dumps(stats.stats), summary.getvalue())
+        self._profile = None
+
+        print(f'Profile of {self._profiled_cycles} cycles saved')
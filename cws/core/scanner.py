@@ -1,8 +1,10 @@
 from __future__ import annotations
 
+import zlib
 from datetime import datetime
 from itertools import cycle
-from typing import Dict, List
+from time import perf_counter
+from typing import Dict, List, Tuple, Optional, Set
 
 from sqlalchemy import and_
 from sqlalchemy.dialects.postgresql import insert as psql_insert
@@ -11,71 +13,255 @@ from sqlalchemy.orm import Session
 from sqlalchemy.sql.functions import coalesce
 
 from cws.api.casino_winner import CasinoWinnerApi as Api
-from cws.api.models import Event
-from cws.bots.bot_manager import BotManager
+from cws.api.feed_client import FeedClient
+from cws.api.sharded_feed import ShardedEventFeed
+from cws.api.models import Event, EventParseCache
+from cws.core.adaptive_scheduler import AdaptiveScheduler
 from cws.core.notification import Notification
+from cws.core.notification_store import NotificationStore
 from cws.core.notifier import TelegramNotifier
-from cws.core.snapshots import EventSnapshot
-from cws.database import SessionLocal
+from cws.core.prefetcher import FeedPrefetcher
+from cws.core.profiler import CycleProfiler
+from cws.core.sharded_engine import ShardedSnapshotEngine
+from cws.core.checkpoint import SnapshotCheckpoint
+from cws.core.clock import Clock, SYSTEM_CLOCK
+from cws.core.columnar import ColumnarSnapshotEngine
+from cws.core.filter_index import FilterIndex
+from cws.core.known_entities import KnownEntityCache
+from cws.core.metrics import CycleMetrics
+from cws.core.snapshot_store import SnapshotStore
+from cws.core.snapshots import SnapshotEngine, DictSnapshotEngine
 from cws.models import Sport, Market, Bet, AppOption
 from cws.redis_manager import RedisManager
 
 
 class Scanner:
+    SNAPSHOT_ENGINES = {
+        'incremental': SnapshotStore,
+        'dict': DictSnapshotEngine,
+        'columnar': ColumnarSnapshotEngine
+    }
+
+    CHECKPOINT_INTERVAL = 6  # cycles
+    CHECKPOINT_MAX_AGE = 600  # seconds
+
     session: Session
     redis_manager: RedisManager
-    event_snapshots: Dict[int, EventSnapshot]
-    enabled_filters: Dict[int, int]
+    snapshot_engine: SnapshotEngine
+    enabled_filters: FilterIndex
+    disabled_sport_ids: Set[int]
     notifications: Dict[int, Notification]
+    notification_store: NotificationStore
     min_odds: float
     max_odds: float
     auto_break_min_idle_time: int
     telegram_notification_min_uptime: int
     telegram_second_notification_min_uptime: int
     telegram_notifier: TelegramNotifier
-
-    def __init__(self, session: Session):
+    known_entities: KnownEntityCache
+    metrics: CycleMetrics
+    profiler: CycleProfiler
+    api: Api
+    sharded_feed: Optional[ShardedEventFeed]
+    feed_prefetcher: Optional[FeedPrefetcher[Tuple[List[Event], datetime]]]
+    scheduler: Optional[AdaptiveScheduler]
+    clock: Clock
+
+    def __init__(self, session: Session, pipelined: bool = False, sharded_fetch: bool = False, streaming: bool = False,
+                 snapshot_engine: str = 'incremental', workers: int = 0, feed_client: FeedClient = None,
+                 telegram_notifier: TelegramNotifier = None, redis_manager: RedisManager = None,
+                 clock: Clock = SYSTEM_CLOCK):
         self.session = session
-        self.redis_manager = RedisManager()
-        self.telegram_notifier = TelegramNotifier()
-        self.bot_manager = BotManager(SessionLocal())
-        self._bot_manager_update_cycle = cycle(range(10))
+        self.clock = clock
 
+        if workers > 0:
+            # Snapshots of the events are built in worker processes, each one owning a shard of the events
+            self.snapshot_engine = ShardedSnapshotEngine(Scanner.SNAPSHOT_ENGINES[snapshot_engine], workers)
+        else:
+            self.snapshot_engine = Scanner.SNAPSHOT_ENGINES[snapshot_engine]()
+
+        self.api = Api(feed_client or FeedClient(), EventParseCache(), streaming=streaming)
+        self.sharded_feed = ShardedEventFeed(self.api) if sharded_fetch else None
+        self.redis_manager = redis_manager or RedisManager()
+        self.notification_store = NotificationStore(self.redis_manager)
+        self.telegram_notifier = telegram_notifier or TelegramNotifier()
+        self._checkpoint_cycle = cycle(range(Scanner.CHECKPOINT_INTERVAL))
+        self.known_entities = KnownEntityCache()
+        self.metrics = CycleMetrics()
+        self.profiler = CycleProfiler(self.redis_manager)
+        self.scheduler = None
+        self._observed_feed_timings = None
+
+        self._load_known_entities()
+        self._config_version = self.redis_manager.get_config_version()
         self._load_enabled_filters()
         self._load_odds_options()
         self.notifications = {}
 
-        events, timestamp = Api.get_all_live_events()
-        self.event_snapshots = self._make_snapshots(events, timestamp)
+        events, timestamp = self._get_live_events()
+        self.snapshot_engine.update(events, timestamp, self.enabled_filters)
+        self._restore_checkpoint(events, timestamp)
+
+        if pipelined:
+            # Fetching of the next feed payload overlaps with processing of the current one
+            self.feed_prefetcher = FeedPrefetcher(self._get_live_events)
+            self.feed_prefetcher.start()
+        else:
+            self.feed_prefetcher = None
 
-    def cycle(self):
-        events, timestamp = Api.get_all_live_events()
+    def stop(self):
+        # Ends the threads and worker processes of the scanner, once the scheduler does not start cycles any more
+        if self.scheduler is not None:
+            self.scheduler.stop()
 
-        self._update_database(events)
-        self._load_enabled_filters()
-        self._load_odds_options()
+        if self.feed_prefetcher is not None:
+            self.feed_prefetcher.stop()
 
-        if next(self._bot_manager_update_cycle) == 0:
-            self.bot_manager.load_bots(log_in_bots=True)
-            self.bot_manager.save_bots_info_to_redis()
+        if isinstance(self.snapshot_engine, ShardedSnapshotEngine):
+            self.snapshot_engine.stop()
+
+        # Writes out what a feed recorder still has queued
+        self.api.client.close()
+
+    def cycle(self) -> int:
+        if self.profiler.armed:
+            return self.profiler.run(self._cycle)
+        else:
+            return self._cycle()
+
+    def _cycle(self) -> int:
+        cycle_start = perf_counter()
+
+        with self.metrics.time('fetch'):
+            events, timestamp = self._fetch_events()
+
+        with self.metrics.time('db_upsert'):
+            new_entities = self._update_database(events)
+
+        with self.metrics.time('config_load'):
+            self._reload_config(force=new_entities)
+
+        with self.metrics.time('snapshot_update'):
+            self.snapshot_engine.update(events, timestamp, self.enabled_filters)
 
-        new_event_snapshots = self._make_snapshots(events, timestamp)
-        self._update_snapshots(new_event_snapshots)
         self._generate_notifications()
 
-    def _make_snapshots(self, events: List[Event], timestamp: datetime) -> Dict[int, EventSnapshot]:
-        return {event.id: EventSnapshot(event, timestamp, self.enabled_filters) for event in events}
+        if next(self._checkpoint_cycle) == 0:
+            with self.metrics.time('checkpoint'):
+                self._save_checkpoint(timestamp)
+
+        self.metrics.observe('cycle', perf_counter() - cycle_start)
+        self._save_metrics(events)
+
+        return Scanner._odds_digest(events)
+
+    @staticmethod
+    def _odds_digest(events: List[Event]) -> int:
+        # Tells the adaptive scheduler whether the odds changed since the previous poll, ~12 ms for 80k tips
+        return hash(tuple((t.id, t.odds, t.is_active) for e in events for t in e.tips))
+
+    def _fetch_events(self) -> Tuple[List[Event], datetime]:
+        if self.feed_prefetcher is not None:
+            return self.feed_prefetcher.get()
+        else:
+            return self._get_live_events()
+
+    def _get_live_events(self) -> Tuple[List[Event], datetime]:
+        if self.sharded_feed is not None:
+            return self.sharded_feed.get_live_events(self.disabled_sport_ids, self.known_entities.sports)
+        else:
+            return self.api.get_all_live_events()
+
+    def _save_metrics(self, events: List[Event]):
+        m = self.metrics
+        feed_timings = self.api.client.last_timings
+
+        # With a prefetcher or sharded requests the feed may not have been requested since the previous cycle
+        if feed_timings is not None and feed_timings is not self._observed_feed_timings:
+            self._observed_feed_timings = feed_timings
+
+            if feed_timings.new_connection:
+                m.observe('feed_connect', feed_timings.connect)
+                m.observe('feed_tls', feed_timings.tls or 0)
+
+            m.observe('feed_ttfb', feed_timings.ttfb)
+            m.observe('feed_download', feed_timings.download)
+            m.observe('decode', feed_timings.decode)
+            m.set_gauge('feed_payload_bytes', feed_timings.size, 'Decompressed size of the last feed payload')
+
+            if self.api.last_parse_duration is not None:
+                m.observe('parse', self.api.last_parse_duration)
+
+        m.set_gauge('events', len(events), 'Live events in the last cycle')
+        m.set_gauge('tips', sum(len(e.tips) for e in events), 'Tips of the live events in the last cycle')
+        m.set_gauge('changed_tips', getattr(self.snapshot_engine, 'changed_tips', 0), 'Tracked tips whose odds changed in the last cycle')
+        m.set_gauge('rebuilt_tip_groups', getattr(self.snapshot_engine, 'rebuilt_groups', 0), 'Tip groups built again in the last cycle')
+        m.set_gauge('notifications', len(self.notifications), 'Open notifications')
+
+        parse_cache = self.api.parse_cache
+        m.set_counter('parse_cache_hits_total', parse_cache.hits, 'Markets whose parsed tips were reused from the parse cache')
+        m.set_counter('parse_cache_misses_total', parse_cache.misses, 'Markets parsed from the feed')
+
+        known_entities = self.known_entities
+        m.set_counter('db_inserted_rows_total', known_entities.inserted_rows, 'Sports, markets and bets inserted')
+        m.set_counter('db_skipped_rows_total', known_entities.skipped_rows, 'Sports, markets and bets already known')
+        m.set_counter('db_skipped_round_trips_total', known_entities.skipped_round_trips, 'Cycles without a database upsert')
+        m.set_counter('db_time_saved_seconds_total', known_entities.time_saved, 'Estimated time saved by skipped upserts')
+
+        if self.feed_prefetcher is not None:
+            m.set_counter('prefetch_dropped_payloads_total', self.feed_prefetcher.dropped_payloads, 'Prefetched payloads dropped as stale')
+
+        notification_store = self.notification_store
+        m.set_gauge('notifications_version', notification_store.version, 'Version of the notifications in Redis')
+        m.set_counter('redis_notifications_written_total', notification_store.written_notifications, 'Notifications added or changed in Redis')
+        m.set_counter('redis_notifications_removed_total', notification_store.removed_notifications, 'Notifications removed from Redis')
+        m.set_counter('redis_notifications_full_writes_total', notification_store.full_writes, 'Rewrites of all notifications after Redis lost them')
+
+        dispatcher = getattr(self.telegram_notifier, 'dispatcher', None)
+
+        if dispatcher is not None:
+            for stage, seconds in dispatcher.drain_timings():
+                m.observe(stage, seconds)
+
+            m.set_gauge('telegram_queue_depth', dispatcher.queue_depth, 'Notifications waiting to be sent to Telegram')
+            m.set_counter('telegram_sent_messages_total', dispatcher.sent_messages, 'Telegram messages sent')
+            m.set_counter('telegram_sent_notifications_total', dispatcher.sent_notifications, 'Notifications sent to Telegram')
+            m.set_counter('telegram_coalesced_notifications_total', dispatcher.coalesced_notifications, 'Queued notifications replaced by a newer rendering')
+            m.set_counter('telegram_dropped_notifications_total', dispatcher.dropped_notifications, 'Notifications dropped from a full queue')
+            m.set_counter('telegram_failed_notifications_total', dispatcher.failed_notifications, 'Notifications Telegram did not accept')
+            m.set_counter('telegram_rate_limited_total', dispatcher.rate_limited_sends, 'Sends rejected by Telegram with a retry after')
+
+        if self.scheduler is not None:
+            m.set_counter('cycles_late_total', self.scheduler.late_cycles, 'Cycles that overran their period')
+            m.set_counter('cycles_skipped_total', self.scheduler.skipped_cycles, 'Periods skipped because of late cycles')
+            m.set_counter('cycles_stale_total', self.scheduler.stale_cycles, 'Cycles that got a feed that did not change')
+            m.set_gauge('cycle_period_seconds', self.scheduler.period, 'Current period of the adaptive scheduler')
 
-    def _update_snapshots(self, new_event_snapshots: Dict[int, EventSnapshot]):
-        for event_id, event_snapshot in new_event_snapshots.items():
-            old_event_snapshot = self.event_snapshots.get(event_id)
+        self.redis_manager.set_metrics(m.render())
 
-            if old_event_snapshot is not None:
-                event_snapshot.update(old_event_snapshot)
+    def _save_checkpoint(self, timestamp: datetime):
+        checkpoint = SnapshotCheckpoint.create(timestamp, self.snapshot_engine, self.notifications.values())
+        self.redis_manager.set_snapshot_checkpoint(checkpoint.dumps(), Scanner.CHECKPOINT_MAX_AGE)
 
-        self.event_snapshots = new_event_snapshots
+    def _restore_checkpoint(self, events: List[Event], timestamp: datetime):
+        data = self.redis_manager.get_snapshot_checkpoint()
 
-    def _update_database(self, events: List[Event]):
+        if data is None:
+            return
+
+        try:
+            checkpoint = SnapshotCheckpoint.loads(data)
+        except (ValueError, KeyError, TypeError, zlib.error) as e:
+            print(f'Ignoring invalid snapshot checkpoint: {e}')
+            return
+
+        if not 0 <= (timestamp - checkpoint.timestamp).total_seconds() <= Scanner.CHECKPOINT_MAX_AGE:
+            return
+
+        restored_tips, self.notifications = checkpoint.restore(self.snapshot_engine, events, self.clock)
+        print(f'Snapshot checkpoint restored: {restored_tips} of {len(checkpoint.tip_states)} tips and {len(self.notifications)} notifications')
+
+    def _update_database(self, events: List[Event]) -> bool:
         sports = set()
         markets = set()
         bets = set()
@@ -87,26 +273,35 @@ class Scanner:
                 markets.add((tip.market_group_id, tip.market_group_name, True, None, event.sport_id))
                 bets.add((tip.bet_group_id, tip.bet_group_name, True, event.sport_id, tip.market_group_id))
 
+        new_sports, new_markets, new_bets = self.known_entities.filter_new(sports, markets, bets)
+        new_rows = len(new_sports) + len(new_markets) + len(new_bets)
+        skipped_rows = len(sports) + len(markets) + len(bets) - new_rows
+
+        if new_rows == 0:
+            self.known_entities.record_skip(skipped_rows)
+            return False
+
         db_error = None
         db_change = False
+        start = perf_counter()
 
         try:
-            if len(sports) > 0:
+            if len(new_sports) > 0:
                 db_change = True
                 self.session.execute(
-                    psql_insert(Sport).values(list(sports)).on_conflict_do_nothing()
+                    psql_insert(Sport).values(new_sports).on_conflict_do_nothing()
                 )
 
-            if len(markets) > 0:
+            if len(new_markets) > 0:
                 db_change = True
                 self.session.execute(
-                    psql_insert(Market).values(list(markets)).on_conflict_do_nothing()
+                    psql_insert(Market).values(new_markets).on_conflict_do_nothing()
                 )
 
-            if len(bets) > 0:
+            if len(new_bets) > 0:
                 db_change = True
                 self.session.execute(
-                    psql_insert(Bet).values(list(bets)).on_conflict_do_nothing()
+                    psql_insert(Bet).values(new_bets).on_conflict_do_nothing()
                 )
 
             if db_change:
@@ -121,6 +316,42 @@ class Scanner:
         if db_error is not None:
             raise db_error
 
+        self.known_entities.add(new_sports, new_markets, new_bets)
+        self.known_entities.record_upsert(new_rows, skipped_rows, perf_counter() - start)
+        print(f'{len(new_sports)} new sports, {len(new_markets)} new markets and {len(new_bets)} new bets saved')
+
+        return True
+
+    def _load_known_entities(self):
+        db_error = None
+
+        try:
+            self.known_entities.load(self.session)
+        except SQLAlchemyError as e:
+            self.session.rollback()
+            db_error = e
+        finally:
+            self.session.close()
+
+        if db_error is not None:
+            raise db_error
+
+    def _reload_config(self, force: bool = False):
+        # Filters and options change only through the config views, which bump the version. New entities are
+        # enabled by default, so inserting them changes the filters too.
+        version, profile_cycles = self.redis_manager.get_scanner_control()
+
+        if profile_cycles is not None:
+            self.redis_manager.clear_profile_request()
+            self.profiler.arm(profile_cycles)
+
+        if version == self._config_version and not force:
+            return
+
+        self._config_version = version
+        self._load_enabled_filters()
+        self._load_odds_options()
+
     def _load_enabled_filters(self):
         db_error = None
 
@@ -137,10 +368,9 @@ class Scanner:
                 Sport.is_enabled, Market.is_enabled, Bet.is_enabled
             )).all()
 
-            self.enabled_filters = {
-                hash((sport_id, market_id, bet_id)): trigger_time
-                for sport_id, market_id, bet_id, trigger_time in enabled
-            }
+            self.enabled_filters = FilterIndex(enabled)
+
+            self.disabled_sport_ids = {sport_id for sport_id, in self.session.query(Sport.id).filter(~Sport.is_enabled)}
         except SQLAlchemyError as e:
             self.session.rollback()
             db_error = e
@@ -171,51 +401,21 @@ class Scanner:
             raise db_error
 
     def _generate_notifications(self):
+        start = perf_counter()
         new_notifications = []
         updated_notifications = []
 
-        for event_id, event_snapshot in self.event_snapshots.items():
-            if event_snapshot.event.is_break:
-                continue
+        triggered_tip_groups = self.snapshot_engine.find_triggered_tip_groups(
+            self.enabled_filters, self.min_odds, self.max_odds, self.auto_break_min_idle_time
+        )
 
-            event_updated_notifications = []
-            event_new_notifications = []
-            event_auto_break_detected = True
+        for event, tips in triggered_tip_groups:
+            notification_hash = hash((event.id, tips[0].unique_tip_group_id))
 
-            for market_id, bets in event_snapshot.snapshot.items():
-                for tip_group_id, tip_snapshots in bets.items():
-                    tips = [ts.tip for ts in tip_snapshots.values()]
-
-                    try:
-                        filter_ident = hash((event_snapshot.event.sport_id, market_id, tips[0].bet_group_id))
-                        trigger_time = self.enabled_filters[filter_ident]
-                    except KeyError:
-                        continue
-
-                    min_idle_time = min(ts.time_since_last_change for ts in tip_snapshots.values())
-                    notification_hash = hash((event_id, tip_group_id))
-
-                    is_market_active = tips[0].is_active
-
-                    min_market_odds = min(t.odds for t in tips)
-                    max_market_odds = max(t.odds for t in tips)
-
-                    if is_market_active and min_idle_time >= trigger_time \
-                            and min_market_odds >= self.min_odds and max_market_odds <= self.max_odds:
-                        if notification_hash in self.notifications:
-                            event_updated_notifications.append((notification_hash, event_snapshot.event))
-                        else:
-                            event_new_notifications.append(Notification(event_snapshot.event, tips))
-
-                    if min_idle_time < self.auto_break_min_idle_time:
-                        event_auto_break_detected = False
-
-            if len(event_snapshot.event.tips) <= 5:
-                event_auto_break_detected = False
-
-            if not event_auto_break_detected:
-                new_notifications.extend(event_new_notifications)
-                updated_notifications.extend(event_updated_notifications)
+            if notification_hash in self.notifications:
+                updated_notifications.append((notification_hash, event))
+            else:
+                new_notifications.append(Notification(event, tips, self.clock))
 
         notifications = {}
 
@@ -238,10 +438,14 @@ class Scanner:
             print(f'{len(notifications)} notifications processed: {len(new_notifications)} new and {len(updated_notifications)} updated')
 
         self.notifications = notifications
-        self.redis_manager.set_notifications(notifications.values())
-        self.redis_manager.set_app_status(len(self.event_snapshots), len(self.notifications))
+        self.metrics.observe('notifications', perf_counter() - start)
+
+        with self.metrics.time('redis_write'):
+            self.notification_store.update(notifications.values())
+            self.redis_manager.set_app_status(len(self.snapshot_engine), len(self.notifications))
 
-        self._send_telegram_notification()
+        with self.metrics.time('telegram_enqueue'):
+            self._send_telegram_notification()
 
     def _send_telegram_notification(self):
         to_send = []
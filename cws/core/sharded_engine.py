@@ -0,0 +1,259 @@
+from __future__ import annotations
+
+import multiprocessing
+from datetime import datetime
+from multiprocessing.connection import Connection
+from multiprocessing.process import BaseProcess
+from typing import Dict, List, Tuple, Iterable, Type, Any, Optional, Callable
+
+from cws.api.models import Event, Tip
+from cws.core.filter_index import FilterIndex
+from cws.core.snapshots import SnapshotEngine, TipState_t
+
+
+def _run_worker(conn: Connection, engine_class: Type[SnapshotEngine]):
+    engine = engine_class()
+    events: Dict[int, Event] = {}
+    enabled_filters = FilterIndex()
+
+    while True:
+        command, *args = conn.recv()
+
+        if command == 'stop':
+            break
+
+        try:
+            if command == 'update':
+                changed_events, live_event_ids, timestamp, new_filters = args
+
+                if new_filters is not None:
+                    enabled_filters = new_filters
+
+                # Events that were not sent again are unchanged and keep their object. A patched event carries only
+                # its changed tips, the others are the objects of the previous cycle, as with the parse cache.
+                for event, is_patch, removed_tip_ids in changed_events:
+                    if is_patch:
+                        tips = {t.id: t for t in events[event.id].tips}
+
+                        for tip_id in removed_tip_ids:
+                            del tips[tip_id]
+
+                        tips.update((t.id, t) for t in event.tips)
+                        event.tips = list(tips.values())
+
+                    events[event.id] = event
+
+                events = {event_id: events[event_id] for event_id in live_event_ids}
+
+                engine.update(list(events.values()), timestamp, enabled_filters)
+                result = getattr(engine, 'changed_tips', 0)
+            elif command == 'find':
+                result = [
+                    (event.id, tips[0].unique_tip_group_id)
+                    for event, tips in engine.find_triggered_tip_groups(enabled_filters, *args)
+                ]
+            elif command == 'export':
+                result = engine.export_tip_states()
+            elif command == 'restore':
+                result = engine.restore_tip_states(args[0])
+            else:
+                raise ValueError(f'Unknown snapshot worker command: {command}')
+        except Exception as e:
+            conn.send((False, e))
+        else:
+            conn.send((True, result))
+
+    conn.close()
+
+
+def _diff_event(event: Event, sent_event: Optional[Event]) -> Optional[Tuple[Event, bool, List[int]]]:
+    # What a worker needs to bring its copy of the event up to date: the event, whether its tips are only the
+    # changed ones, and the ids of the removed tips. None if the very same event was sent before.
+    if sent_event is event:
+        return None
+
+    if sent_event is None:
+        return event, False, []
+
+    sent_tips = {t.id: t for t in sent_event.tips}
+    changed_tips = []
+
+    for tip in event.tips:
+        sent_tip = sent_tips.pop(tip.id, None)
+
+        if sent_tip is not tip and sent_tip != tip:
+            changed_tips.append(tip)
+
+    patch = Event(*Event._FIELD_VALUES(event))
+    patch.tips = changed_tips
+
+    return patch, True, list(sent_tips)
+
+
+class ShardedSnapshotEngine(SnapshotEngine):
+    # Partitions the live events by event id across worker processes. Every worker owns the snapshot state of its
+    # shard across cycles. The clock and score of a live event change on every poll, so every event is sent on
+    # every cycle, but only with the tips that changed. Workers report the triggered tip groups as ids, which are
+    # resolved against the events held by this process.
+    #
+    # Parsing stays in this process and the events still have to be pickled, so workers only pay off with several
+    # idle cores and large feeds. Compare with benchmarks/sharded_engine.py on the target host before enabling them.
+
+    events: List[Event]
+    changed_tips: int
+
+    def __init__(self, engine_class: Type[SnapshotEngine], workers: int):
+        self.events = []
+        self.changed_tips = 0
+
+        self._engine_class = engine_class
+        self._context = multiprocessing.get_context('spawn')
+        self._workers: List[Optional[Tuple[BaseProcess, Connection]]] = [None] * workers
+        self._sent: List[Dict[int, Event]] = [{} for _ in range(workers)]
+        self._sent_filters: List[Optional[FilterIndex]] = [None] * workers
+
+        for shard in range(workers):
+            self._start_worker(shard)
+
+    def _start_worker(self, shard: int):
+        if self._workers[shard] is not None:
+            old_process, old_conn = self._workers[shard]
+            old_conn.close()
+
+            if old_process.is_alive():
+                old_process.kill()
+
+            old_process.join()
+
+        conn, worker_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_run_worker, args=(worker_conn, self._engine_class), name=f'Snapshot worker {shard}', daemon=True
+        )
+        process.start()
+        worker_conn.close()
+
+        self._workers[shard] = (process, conn)
+        self._sent[shard] = {}
+        self._sent_filters[shard] = None
+
+    def _shard(self, event_id: int) -> int:
+        return event_id % len(self._workers)
+
+    def _call(self, messages: List[Tuple]) -> List[Any]:
+        replies = self._exchange(messages)
+        errors = [result for ok, result in replies if not ok]
+
+        if len(errors) > 0:
+            raise errors[0]
+
+        return [result for _, result in replies]
+
+    def _exchange(self, messages: List[Tuple],
+                  resend: Optional[Callable[[int], Tuple]] = None) -> List[Tuple[bool, Any]]:
+        # Every worker gets its message before any reply is awaited, so the shards are processed in parallel
+        for shard, message in enumerate(messages):
+            self._send(shard, message, resend)
+
+        replies = []
+
+        for shard, (process, conn) in enumerate(self._workers):
+            try:
+                replies.append(conn.recv())
+            except (EOFError, OSError) as e:
+                # A crashed worker is replaced. Its shard starts over with fresh snapshot state.
+                self._start_worker(shard)
+                replies.append((False, e))
+
+        return replies
+
+    def _send(self, shard: int, message: Tuple, resend: Optional[Callable[[int], Tuple]]):
+        try:
+            self._workers[shard][1].send(message)
+        except OSError as e:
+            # The worker died since the previous call. Its replacement starts with an empty state, so the message is
+            # built again for it, an update then carries the whole shard instead of the changes.
+            print(f'Snapshot worker {shard} is gone ({type(e).__name__}), starting a new one')
+            self._start_worker(shard)
+            self._workers[shard][1].send(message if resend is None else resend(shard))
+
+    def _update_message(self, shard: int, events_of_shard: List[Event], timestamp: datetime,
+                        enabled_filters: FilterIndex) -> Tuple:
+        sent = self._sent[shard]
+        changed = [c for c in (_diff_event(e, sent.get(e.id)) for e in events_of_shard) if c is not None]
+        new_filters = None if self._sent_filters[shard] is enabled_filters else enabled_filters
+
+        return 'update', changed, [e.id for e in events_of_shard], timestamp, new_filters
+
+    def update(self, events: List[Event], timestamp: datetime, enabled_filters: FilterIndex):
+        shard_events = [[] for _ in self._workers]
+
+        for event in events:
+            shard_events[self._shard(event.id)].append(event)
+
+        def message(shard: int) -> Tuple:
+            return self._update_message(shard, shard_events[shard], timestamp, enabled_filters)
+
+        replies = self._exchange([message(shard) for shard in range(len(self._workers))], message)
+        errors = []
+
+        # The next diffs are only based on what the workers confirmed. A worker that failed is sent its whole shard
+        # again on the next cycle.
+        for shard, (ok, result) in enumerate(replies):
+            if ok:
+                self._sent[shard] = {e.id: e for e in shard_events[shard]}
+                self._sent_filters[shard] = enabled_filters
+            else:
+                self._sent[shard] = {}
+                self._sent_filters[shard] = None
+                errors.append(result)
+
+        self.events = events
+
+        if len(errors) > 0:
+            raise errors[0]
+
+        self.changed_tips = sum(result for _, result in replies)
+
+    def find_triggered_tip_groups(self, enabled_filters: FilterIndex, min_odds: float, max_odds: float,
+                                  auto_break_min_idle_time: int) -> List[Tuple[Event, List[Tip]]]:
+        results = self._call([('find', min_odds, max_odds, auto_break_min_idle_time)] * len(self._workers))
+
+        triggered_groups = {}
+
+        for shard_result in results:
+            for event_id, tip_group_id in shard_result:
+                triggered_groups.setdefault(event_id, []).append(tip_group_id)
+
+        # Same order as a single engine: events in feed order, tip groups in the order their engine reported them
+        triggered = []
+
+        for event in self.events:
+            for tip_group_id in triggered_groups.get(event.id, []):
+                triggered.append((event, [t for t in event.tips if t.unique_tip_group_id == tip_group_id]))
+
+        return triggered
+
+    def export_tip_states(self) -> List[TipState_t]:
+        return [s for shard_states in self._call([('export',)] * len(self._workers)) for s in shard_states]
+
+    def restore_tip_states(self, tip_states: Iterable[TipState_t]) -> int:
+        shard_states = [[] for _ in self._workers]
+
+        for s in tip_states:
+            shard_states[self._shard(s[0])].append(s)
+
+        return sum(self._call([('restore', states) for states in shard_states]))
+
+    def stop(self):
+        for process, conn in self._workers:
+            try:
+                conn.send(('stop',))
+            except OSError:
+                # Already gone
+                pass
+
+            process.join()
+            conn.close()
+
+    def __len__(self):
+        return len(self.events)
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Dict, List, Tuple, Optional, Iterable
+
+from cws.api.models import Event, Tip
+from cws.core.filter_index import FilterIndex
+from cws.core.snapshots import SnapshotEngine, TipState_t
+
+MarketID_t = TipGroupID_t = TipID_t = int
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _same_tips(group: TipGroupState, tips: List[Tip]) -> bool:
+    # Compared by value, the identity check only saves the comparison for tips reused by the parse cache
+    if len(tips) != len(group.tips):
+        return False
+
+    for tip in tips:
+        old_tip = group.tips.get(tip.id)
+
+        if old_tip is not tip and old_tip != tip:
+            return False
+
+    return True
+
+
+class TipGroupState:
+    __slots__ = ('tips', 'last_changes', 'trigger_time', 'tip_list', 'is_active', 'last_change', 'min_odds', 'max_odds')
+
+    tips: Dict[TipID_t, Tip]
+    last_changes: Dict[TipID_t, int]
+    trigger_time: int
+    tip_list: List[Tip]
+    is_active: bool
+    last_change: int
+    min_odds: float
+    max_odds: float
+
+    def __init__(self, trigger_time: int):
+        self.tips = {}
+        self.last_changes = {}
+        self.trigger_time = trigger_time
+
+    def finalize(self):
+        self.tip_list = list(self.tips.values())
+        self.is_active = self.tip_list[0].is_active
+        self.last_change = max(self.last_changes.values())
+        self.min_odds = min(t.odds for t in self.tip_list)
+        self.max_odds = max(t.odds for t in self.tip_list)
+
+
+class EventState:
+    __slots__ = ('event', 'groups')
+
+    event: Event
+    groups: Dict[Tuple[MarketID_t, TipGroupID_t], TipGroupState]
+
+    def __init__(self, event: Event, groups: Dict[Tuple[MarketID_t, TipGroupID_t], TipGroupState]):
+        self.event = event
+        self.groups = groups
+
+
+class SnapshotStore(SnapshotEngine):
+    # Long-lived snapshot state. Every tracked tip remembers when its odds last changed, the tip groups whose tips
+    # did not change since the previous feed are kept as they are and finished events are evicted.
+
+    events: Dict[int, EventState]
+    timestamp: Optional[int]
+    changed_tips: int
+    rebuilt_groups: int
+
+    def __init__(self):
+        self.events = {}
+        self.timestamp = None
+        self.changed_tips = 0
+        self.rebuilt_groups = 0
+
+    def update(self, events: List[Event], timestamp: datetime, enabled_filters: FilterIndex):
+        now = int((timestamp - _EPOCH).total_seconds())
+
+        self.changed_tips = 0
+        self.rebuilt_groups = 0
+        live_events = {}
+
+        for event in events:
+            live_events[event.id] = self._sync_event(event, self.events.get(event.id), now, enabled_filters)
+
+        self.events = live_events
+        self.timestamp = now
+
+    def _sync_event(self, event: Event, state: Optional[EventState], now: int, enabled_filters: FilterIndex) -> EventState:
+        old_groups = state.groups if state is not None else {}
+        groups = {}
+
+        market_filters = enabled_filters.get_sport_filters(event.sport_id)
+
+        if market_filters is None:
+            return EventState(event, groups)
+
+        group_tips: Dict[Tuple[MarketID_t, TipGroupID_t], List[Tip]] = {}
+
+        for tip in event.tips:
+            group_tips.setdefault((tip.market_group_id, tip.unique_tip_group_id), []).append(tip)
+
+        for group_key, tips in group_tips.items():
+            bet_filters = market_filters.get(group_key[0])
+
+            if bet_filters is None:
+                continue
+
+            trigger_time = bet_filters.get(tips[0].bet_group_id)
+
+            if trigger_time is None:
+                continue
+
+            old_group = old_groups.get(group_key)
+
+            # Groups whose tips did not change keep their state, only the changed ones are built again
+            if old_group is not None and old_group.trigger_time == trigger_time and _same_tips(old_group, tips):
+                groups[group_key] = old_group
+                continue
+
+            group = groups[group_key] = TipGroupState(trigger_time)
+            self.rebuilt_groups += 1
+
+            for tip in tips:
+                old_tip = old_group.tips.get(tip.id) if old_group is not None else None
+
+                if old_tip is not None and old_tip.odds == tip.odds:
+                    group.last_changes[tip.id] = old_group.last_changes[tip.id]
+                else:
+                    group.last_changes[tip.id] = now
+
+                    if old_tip is not None:
+                        self.changed_tips += 1
+
+                group.tips[tip.id] = tip
+
+            group.finalize()
+
+        return EventState(event, groups)
+
+    def find_triggered_tip_groups(self, enabled_filters: FilterIndex, min_odds: float, max_odds: float,
+                                  auto_break_min_idle_time: int) -> List[Tuple[Event, List[Tip]]]:
+        triggered = []
+
+        for state in self.events.values():
+            event = state.event
+
+            if event.is_break:
+                continue
+
+            event_triggered = []
+            event_auto_break_detected = len(event.tips) > 5
+
+            for group in state.groups.values():
+                min_idle_time = self.timestamp - group.last_change
+
+                if group.is_active and min_idle_time >= group.trigger_time \
+                        and group.min_odds >= min_odds and group.max_odds <= max_odds:
+                    event_triggered.append((event, group.tip_list))
+
+                if min_idle_time < auto_break_min_idle_time:
+                    event_auto_break_detected = False
+
+            if not event_auto_break_detected:
+                triggered.extend(event_triggered)
+
+        return triggered
+
+    def export_tip_states(self) -> List[TipState_t]:
+        return [
+            (event_id, market_id, tip_group_id, tip_id, tip.odds, self.timestamp - group.last_changes[tip_id])
+            for event_id, state in self.events.items()
+            for (market_id, tip_group_id), group in state.groups.items()
+            for tip_id, tip in group.tips.items()
+        ]
+
+    def restore_tip_states(self, tip_states: Iterable[TipState_t]) -> int:
+        restored = set()
+
+        for event_id, market_id, tip_group_id, tip_id, odds, idle_time in tip_states:
+            try:
+                group = self.events[event_id].groups[(market_id, tip_group_id)]
+                tip = group.tips[tip_id]
+            except KeyError:
+                continue
+
+            if tip.odds == odds:
+                group.last_changes[tip_id] = self.timestamp - idle_time
+                restored.add((group, tip_id))
+
+        for group in {group for group, _ in restored}:
+            group.finalize()
+
+        return len(restored)
+
+    def __len__(self):
+        return len(self.events)
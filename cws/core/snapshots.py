@@ -1,30 +1,144 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import Dict
+from typing import Dict, List, Tuple, Iterable
 
 from cws.api.models import Event, Tip
+from cws.core.filter_index import FilterIndex
 
 MarketID_t = BetID_t = TipGroupID_t = int
 
+# (event id, market id, tip group id, tip id, odds, seconds since the last odds change)
+TipState_t = Tuple[int, int, int, int, float, int]
+
+
+class SnapshotEngine:
+    def update(self, events: List[Event], timestamp: datetime, enabled_filters: FilterIndex):
+        raise NotImplementedError
+
+    def find_triggered_tip_groups(self, enabled_filters: FilterIndex, min_odds: float, max_odds: float,
+                                  auto_break_min_idle_time: int) -> List[Tuple[Event, List[Tip]]]:
+        raise NotImplementedError
+
+    def export_tip_states(self) -> List[TipState_t]:
+        raise NotImplementedError
+
+    def restore_tip_states(self, tip_states: Iterable[TipState_t]) -> int:
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+
+class DictSnapshotEngine(SnapshotEngine):
+    event_snapshots: Dict[int, EventSnapshot]
+
+    def __init__(self):
+        self.event_snapshots = {}
+
+    def update(self, events: List[Event], timestamp: datetime, enabled_filters: FilterIndex):
+        new_event_snapshots = {event.id: EventSnapshot(event, timestamp, enabled_filters) for event in events}
+
+        for event_id, event_snapshot in new_event_snapshots.items():
+            old_event_snapshot = self.event_snapshots.get(event_id)
+
+            if old_event_snapshot is not None:
+                event_snapshot.update(old_event_snapshot)
+
+        self.event_snapshots = new_event_snapshots
+
+    def find_triggered_tip_groups(self, enabled_filters: FilterIndex, min_odds: float, max_odds: float,
+                                  auto_break_min_idle_time: int) -> List[Tuple[Event, List[Tip]]]:
+        triggered = []
+
+        for event_id, event_snapshot in self.event_snapshots.items():
+            if event_snapshot.event.is_break:
+                continue
+
+            event_triggered = []
+            event_auto_break_detected = True
+
+            for market_id, bets in event_snapshot.snapshot.items():
+                for tip_group_id, tip_snapshots in bets.items():
+                    tips = [ts.tip for ts in tip_snapshots.values()]
+
+                    trigger_time = enabled_filters.get_trigger_time(event_snapshot.event.sport_id, market_id, tips[0].bet_group_id)
+
+                    if trigger_time is None:
+                        continue
+
+                    min_idle_time = min(ts.time_since_last_change for ts in tip_snapshots.values())
+
+                    is_market_active = tips[0].is_active
+
+                    min_market_odds = min(t.odds for t in tips)
+                    max_market_odds = max(t.odds for t in tips)
+
+                    if is_market_active and min_idle_time >= trigger_time \
+                            and min_market_odds >= min_odds and max_market_odds <= max_odds:
+                        event_triggered.append((event_snapshot.event, tips))
+
+                    if min_idle_time < auto_break_min_idle_time:
+                        event_auto_break_detected = False
+
+            if len(event_snapshot.event.tips) <= 5:
+                event_auto_break_detected = False
+
+            if not event_auto_break_detected:
+                triggered.extend(event_triggered)
+
+        return triggered
+
+    def export_tip_states(self) -> List[TipState_t]:
+        return [
+            (event_id, market_id, tip_group_id, tip_id, ts.tip.odds, ts.time_since_last_change)
+            for event_id, event_snapshot in self.event_snapshots.items()
+            for market_id, bets in event_snapshot.snapshot.items()
+            for tip_group_id, tip_snapshots in bets.items()
+            for tip_id, ts in tip_snapshots.items()
+        ]
+
+    def restore_tip_states(self, tip_states: Iterable[TipState_t]) -> int:
+        restored = 0
+
+        for event_id, market_id, tip_group_id, tip_id, odds, idle_time in tip_states:
+            try:
+                tip_snapshot = self.event_snapshots[event_id].snapshot[market_id][tip_group_id][tip_id]
+            except KeyError:
+                continue
+
+            if tip_snapshot.tip.odds == odds:
+                tip_snapshot.time_since_last_change = idle_time
+                restored += 1
+
+        return restored
+
+    def __len__(self):
+        return len(self.event_snapshots)
+
 
 class EventSnapshot:
     snapshot: Dict[MarketID_t, Dict[BetID_t, Dict[TipGroupID_t, TipSnapshot]]]
     event: Event
     timestamp: datetime
 
-    def __init__(self, event: Event, timestamp: datetime, enabled_filters: Dict[int, int]):
+    def __init__(self, event: Event, timestamp: datetime, enabled_filters: FilterIndex):
         self.snapshot = {}
         self.event = event
         self.timestamp = timestamp
 
         self._create_snapshot(enabled_filters)
 
-    def _create_snapshot(self, enabled_filters: Dict[int, int]):
+    def _create_snapshot(self, enabled_filters: FilterIndex):
+        market_filters = enabled_filters.get_sport_filters(self.event.sport_id)
+
+        if market_filters is None:
+            return
+
         for tip in self.event.tips:
-            ident = hash((self.event.sport_id, tip.market_group_id, tip.bet_group_id))
+            bet_filters = market_filters.get(tip.market_group_id)
 
-            if ident not in enabled_filters:
+            if bet_filters is None or tip.bet_group_id not in bet_filters:
                 continue
 
             market_group = self.snapshot.setdefault(tip.market_group_id, {})
@@ -5,12 +5,21 @@ from cws.redis_manager import RedisManager
 
 class StatusMonitor:
     SUBSCRIBED_EVENTS = EVENT_JOB_EXECUTED | EVENT_JOB_MAX_INSTANCES | EVENT_JOB_ERROR
+    CYCLE_JOB_ID = 'Scanner cycle'
+    BOT_REFRESH_JOB_ID = 'Bot refresh'
 
     def __init__(self):
         self.redis_manager = RedisManager()
 
     def scheduler_monitor(self, event: JobExecutionEvent):
         if event.code == EVENT_JOB_ERROR:
-            self.redis_manager.set_app_status_error(type(event.exception).__name__, str(event.exception), event.traceback)
-        elif event.code == EVENT_JOB_MAX_INSTANCES:
-            self.redis_manager.set_app_status_heavy_load()
+            self.cycle_failed(event.exception, event.traceback)
+        elif event.code == EVENT_JOB_MAX_INSTANCES and event.job_id == StatusMonitor.CYCLE_JOB_ID:
+            # A bot refresh that is still running when the next one is due is no sign of heavy load on the scanner
+            self.cycle_late()
+
+    def cycle_failed(self, exception: BaseException, traceback: str):
+        self.redis_manager.set_app_status_error(type(exception).__name__, str(exception), traceback)
+
+    def cycle_late(self):
+        self.redis_manager.set_app_status_heavy_load()
@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from time import monotonic
+from typing import Callable, Dict, Hashable, Iterable, List, Tuple
+
+from telegram.error import BadRequest, NetworkError, RetryAfter
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._clock = clock
+        self._updated = clock()
+
+    def _refill(self):
+        now = self._clock()
+
+        # While paused the bucket stays empty
+        if now <= self._updated:
+            return
+
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self) -> float:
+        self._refill()
+        return max(0.0, self._updated - self._clock()) + max(0.0, (1 - self.tokens) / self.rate)
+
+    def take(self):
+        self._refill()
+        self.tokens -= 1
+
+    def pause(self, seconds: float):
+        # Exactly one send is let through once the pause is over
+        self.tokens = 1
+        self._updated = max(self._updated, self._clock() + seconds)
+
+
+@dataclass
+class _PendingMessage:
+    chat_id: str
+    text: str
+    enqueued_at: float
+    attempts: int = 0
+
+
+class TelegramDispatcher:
+    # Outbound stage between the scanner and Telegram. The scanner only queues rendered messages, a sender thread
+    # delivers them within the rate limits of Telegram.
+
+    MAX_QUEUE_SIZE = 500
+    MAX_MSG_LENGTH = 4050
+    MSG_GROUP_DELIMITER = '\n\n'
+    MAX_ATTEMPTS = 5
+    RETRY_DELAY = 2.0  # seconds, doubled on every attempt
+
+    # About one message per second in a chat and 20 per minute in a group. Burst plus a minute of refill stays
+    # within the group limit, so a burst never ends in 429 responses.
+    CHAT_RATE = 1.0  # messages per second
+    CHAT_BURST = 1
+    GROUP_RATE = 0.25  # messages per second
+    GROUP_BURST = 5
+
+    _pending: OrderedDict[Tuple[str, Hashable], _PendingMessage]
+    _buckets: Dict[str, List[TokenBucket]]
+
+    def __init__(self, send: Callable[[str, str], None], max_queue_size: int = MAX_QUEUE_SIZE,
+                 clock: Callable[[], float] = monotonic):
+        self._send = send
+        self.max_queue_size = max_queue_size
+        self._clock = clock
+
+        self._pending = OrderedDict()
+        self._buckets = {}
+        self._condition = threading.Condition()
+        self._timings = deque(maxlen=1000)
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name='Telegram dispatcher', daemon=True)
+
+        self.sent_messages = 0
+        self.sent_notifications = 0
+        self.coalesced_notifications = 0
+        self.dropped_notifications = 0
+        self.failed_notifications = 0
+        self.rate_limited_sends = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._pending)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+
+    def submit(self, chat_id: str, messages: Iterable[Tuple[Hashable, str]]):
+        now = self._clock()
+
+        with self._condition:
+            for key, text in messages:
+                pending = self._pending.get((chat_id, key))
+
+                # A newer rendering of a notification that is still queued replaces it and keeps its place
+                if pending is not None:
+                    pending.text = text
+                    self.coalesced_notifications += 1
+                    continue
+
+                if len(self._pending) >= self.max_queue_size:
+                    self._pending.popitem(last=False)
+                    self.dropped_notifications += 1
+
+                self._pending[(chat_id, key)] = _PendingMessage(chat_id, text, now)
+
+            self._condition.notify()
+
+    def drain_timings(self) -> List[Tuple[str, float]]:
+        # (stage, seconds) pairs of the deliveries since the last call, for the metrics of the scanner
+        timings = []
+
+        while len(self._timings) > 0:
+            timings.append(self._timings.popleft())
+
+        return timings
+
+    def _get_buckets(self, chat_id: str) -> List[TokenBucket]:
+        buckets = self._buckets.get(chat_id)
+
+        if buckets is None:
+            buckets = [TokenBucket(TelegramDispatcher.CHAT_RATE, TelegramDispatcher.CHAT_BURST, self._clock)]
+
+            if str(chat_id).startswith('-'):
+                buckets.append(TokenBucket(TelegramDispatcher.GROUP_RATE, TelegramDispatcher.GROUP_BURST, self._clock))
+
+            self._buckets[chat_id] = buckets
+
+        return buckets
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stopped and len(self._pending) == 0:
+                    self._condition.wait()
+
+                if self._stopped:
+                    return
+
+            delay = self._dispatch_next()
+
+            # Messages keep being queued and coalesced while the limiter holds the sender back
+            if delay > 0:
+                with self._condition:
+                    self._condition.wait_for(lambda: self._stopped, timeout=delay)
+
+    def _dispatch_next(self) -> float:
+        # Delivers the next message if the limiter lets it through, otherwise returns the seconds to wait for it
+        with self._condition:
+            if len(self._pending) == 0:
+                return 0.0
+
+            chat_id = next(iter(self._pending.values())).chat_id
+
+        buckets = self._get_buckets(chat_id)
+        delay = max(b.wait_time() for b in buckets)
+
+        if delay > 0:
+            return delay
+
+        with self._condition:
+            batch = self._take_batch(chat_id)
+
+        self._deliver(chat_id, batch, buckets)
+
+        return 0.0
+
+    def _take_batch(self, chat_id: str) -> List[Tuple[Tuple[str, Hashable], _PendingMessage]]:
+        # Fills one message as far as it goes: the oldest queued notification first, then every younger one that
+        # still fits. Nothing waits for a later message because a younger one was packed in front of it.
+        batch = []
+        length = 0
+        delimiter_length = len(TelegramDispatcher.MSG_GROUP_DELIMITER)
+
+        for key, m in self._pending.items():
+            if m.chat_id != chat_id:
+                continue
+
+            added = len(m.text) + (delimiter_length if len(batch) > 0 else 0)
+
+            if len(batch) > 0 and length + added > TelegramDispatcher.MAX_MSG_LENGTH:
+                continue
+
+            batch.append((key, m))
+            length += added
+
+            if TelegramDispatcher.MAX_MSG_LENGTH - length <= delimiter_length:
+                break
+
+        for key, _ in batch:
+            del self._pending[key]
+
+        return batch
+
+    def _deliver(self, chat_id: str, batch: List[Tuple[Tuple[str, Hashable], _PendingMessage]], buckets: List[TokenBucket]):
+        for b in buckets:
+            b.take()
+
+        start = self._clock()
+
+        try:
+            self._send(chat_id, TelegramDispatcher.MSG_GROUP_DELIMITER.join(m.text for _, m in batch))
+        except RetryAfter as e:
+            # Telegram's own back-off overrides the limiter, nothing is sent to the chat until it is over
+            print(f'Telegram rate limit hit, retrying in {e.retry_after} seconds')
+            self.rate_limited_sends += 1
+            self._requeue(batch, buckets, float(e.retry_after), count_attempt=False)
+            return
+        except BadRequest as e:
+            print(f'Telegram rejected a message: {e}')
+            self.failed_notifications += len(batch)
+            return
+        except NetworkError as e:
+            print(f'Sending a Telegram message failed: {e}')
+            self._requeue(batch, buckets, TelegramDispatcher.RETRY_DELAY * 2 ** batch[0][1].attempts, count_attempt=True)
+            return
+        # noinspection PyBroadException
+        except Exception as e:
+            print(f'Sending a Telegram message failed: {type(e).__name__}: {e}')
+            self.failed_notifications += len(batch)
+            return
+
+        sent = self._clock()
+        self._timings.append(('telegram_send', sent - start))
+        self._timings.extend(('telegram_delivery', sent - m.enqueued_at) for _, m in batch)
+
+        self.sent_messages += 1
+        self.sent_notifications += len(batch)
+
+    def _requeue(self, batch: List[Tuple[Tuple[str, Hashable], _PendingMessage]], buckets: List[TokenBucket],
+                 delay: float, count_attempt: bool):
+        for b in buckets:
+            b.pause(delay)
+
+        with self._condition:
+            for key, m in reversed(batch):
+                if count_attempt:
+                    m.attempts += 1
+
+                    if m.attempts >= TelegramDispatcher.MAX_ATTEMPTS:
+                        self.failed_notifications += 1
+                        continue
+
+                # A newer rendering queued in the meantime is kept, at the place of the one that failed
+                if key not in self._pending:
+                    self._pending[key] = m
+
+                self._pending.move_to_end(key, last=False)
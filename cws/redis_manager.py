@@ -1,17 +1,22 @@
 from datetime import datetime
+from itertools import chain
 from json import dumps
-from typing import List, Iterable, Optional, Dict, Union
+from time import time
+from typing import List, Optional, Dict, Union, Tuple, Collection
 
 from redis import Redis
+from redis.client import PubSub
 
 from cws.bots.bet_bot import WalletBalance
 from cws.bots.bet_history_item import BetHistoryItem
 from cws.config import AppConfig
-from cws.core.notification import Notification
 
 
 class RedisManager:
-    NOTIFICATION_LIST_KEY = 'cw_notifications'
+    NOTIFICATIONS_KEY = 'cw_notification_map'
+    NOTIFICATIONS_VERSION_KEY = 'cw_notifications_version'
+    NOTIFICATIONS_CHANGELOG_KEY = 'cw_notifications_changelog'
+    NOTIFICATIONS_CHANGELOG_SIZE = 120  # changes, 10 minutes of cycles
     APP_STATUS_EVENTS_KEY = 'cw_app_status_event_count'
     APP_STATUS_NOTIFICATIONS_KEY = 'cw_app_status_notification_count'
     APP_STATUS_HEAVY_LOAD_KEY = 'cw_app_status_heavy_load'
@@ -21,25 +26,137 @@ class RedisManager:
     APP_LAST_ERRORS_KEY = 'cw_last_errors'
     BET_BOT_WALLETS_KEY = 'cw_bet_bots_wallet_balance'
     BET_BOT_HISTORY_KEY = 'cw_bet_bots_bet_history'
+    SNAPSHOT_CHECKPOINT_KEY = 'cw_snapshot_checkpoint'
+    CONFIG_VERSION_KEY = 'cw_config_version'
+    SCANNER_LEADER_KEY = 'cw_scanner_leader'
+    METRICS_KEY = 'cw_metrics'
+    PROFILE_REQUEST_KEY = 'cw_profile_request'
+    PROFILE_STATS_KEY = 'cw_profile_stats'
+    PROFILE_SUMMARY_KEY = 'cw_profile_summary'
+    UPDATES_CHANNEL = 'cw_updates'
+    STATUS_UPDATE_MESSAGE = '{"type": "status"}'
+
+    RENEW_IF_OWNER_SCRIPT = """
+        if redis.call('get', KEYS[1]) == ARGV[1] then
+            return redis.call('pexpire', KEYS[1], ARGV[2])
+        else
+            return 0
+        end
+    """
+
+    DELETE_IF_OWNER_SCRIPT = """
+        if redis.call('get', KEYS[1]) == ARGV[1] then
+            return redis.call('del', KEYS[1])
+        else
+            return 0
+        end
+    """
+
+    # Notification changes go to the open dashboards as
+    # {"type": "notifications", "version": ..., "replace": ..., "now": ..., "changed": [...], "removed": [...]}
+    # and into the changelog, a sorted set scored by version, for the polling dashboards.
+    # The JSON is put together by hand because cjson would encode empty lists as objects.
+    UPDATE_NOTIFICATIONS_SCRIPT = """
+        local replace = ARGV[1] == '1'
+        local changed_count = tonumber(ARGV[6])
+        local first_removed = 7 + 2 * changed_count
+        local changed = {}
+        local removed = {}
+
+        if replace then
+            redis.call('del', KEYS[1])
+        end
+
+        for i = 7, first_removed - 1, 2 do
+            redis.call('hset', KEYS[1], ARGV[i], ARGV[i + 1])
+            changed[#changed + 1] = ARGV[i + 1]
+        end
+
+        for i = first_removed, #ARGV do
+            redis.call('hdel', KEYS[1], ARGV[i])
+            removed[#removed + 1] = '"' .. ARGV[i] .. '"'
+        end
+
+        local version
+
+        if replace or #changed > 0 or #removed > 0 then
+            version = redis.call('incr', KEYS[2])
+
+            local message = '{"type": "notifications", "version": ' .. version ..
+                ', "replace": ' .. tostring(replace) .. ', "now": ' .. ARGV[4] ..
+                ', "changed": [' .. table.concat(changed, ',') .. '], "removed": [' .. table.concat(removed, ',') .. ']}'
+
+            redis.call('publish', ARGV[3], message)
+            redis.call('zadd', KEYS[3], version, message)
+            redis.call('zremrangebyrank', KEYS[3], 0, -tonumber(ARGV[5]) - 1)
+        else
+            version = tonumber(redis.call('get', KEYS[2]) or '0')
+        end
+
+        -- Notifications of a scanner that stopped disappear, the version is kept so that it never goes back
+        redis.call('expire', KEYS[1], ARGV[2])
+        redis.call('expire', KEYS[3], ARGV[2])
+
+        return {version, redis.call('hlen', KEYS[1])}
+    """
 
     def __init__(self):
         self.conn = Redis(host=AppConfig.get(AppConfig.Variables.REDIS_HOST), port=AppConfig.get(AppConfig.Variables.REDIS_PORT))
 
-    def set_notifications(self, notifications: Iterable[Notification]):
-        self.conn.delete(RedisManager.NOTIFICATION_LIST_KEY)
+        self._renew_if_owner = self.conn.register_script(RedisManager.RENEW_IF_OWNER_SCRIPT)
+        self._delete_if_owner = self.conn.register_script(RedisManager.DELETE_IF_OWNER_SCRIPT)
+        self._update_notifications = self.conn.register_script(RedisManager.UPDATE_NOTIFICATIONS_SCRIPT)
+
+    def update_notifications(self, changed: Dict[str, str], removed: Collection[str], replace: bool = False) -> Tuple[int, int]:
+        # Writes the changes to the notification hash in one round trip and returns its version and size afterwards.
+        # The changes are published with their version in the same script, so no stream misses or reorders them.
+        version, size = self._update_notifications(
+            keys=[RedisManager.NOTIFICATIONS_KEY, RedisManager.NOTIFICATIONS_VERSION_KEY,
+                  RedisManager.NOTIFICATIONS_CHANGELOG_KEY],
+            args=['1' if replace else '0', 30, RedisManager.UPDATES_CHANNEL, time(),
+                  RedisManager.NOTIFICATIONS_CHANGELOG_SIZE, len(changed),
+                  *chain.from_iterable(changed.items()), *removed]
+        )
 
-        notifications_json = [n.to_json() for n in notifications]
+        return version, size
 
-        if len(notifications_json) > 0:
-            self.conn.lpush(RedisManager.NOTIFICATION_LIST_KEY, *notifications_json)
-            self.conn.expire(RedisManager.NOTIFICATION_LIST_KEY, 30)
+    def get_notifications(self) -> Tuple[int, List[str]]:
+        pipe = self.conn.pipeline(transaction=True)
+        pipe.get(RedisManager.NOTIFICATIONS_VERSION_KEY)
+        pipe.hvals(RedisManager.NOTIFICATIONS_KEY)
+        version, notifications = pipe.execute()
 
-    def get_notifications_json(self) -> List[str]:
-        return [n.decode('utf-8') for n in self.conn.lrange(RedisManager.NOTIFICATION_LIST_KEY, 0, -1)]
+        return int(version or 0), [n.decode('utf-8') for n in notifications]
+
+    def get_notifications_version(self) -> Tuple[int, bool]:
+        # The version and whether the hash is still there, which changes without a new version when it expires
+        pipe = self.conn.pipeline(transaction=True)
+        pipe.get(RedisManager.NOTIFICATIONS_VERSION_KEY)
+        pipe.exists(RedisManager.NOTIFICATIONS_KEY)
+        version, exists = pipe.execute()
+
+        return int(version or 0), exists > 0
+
+    def get_notification_changes(self, since: int) -> Tuple[int, Optional[List[str]]]:
+        # The changes after the given version, oldest first, or None when the changelog no longer goes back that far
+        pipe = self.conn.pipeline(transaction=True)
+        pipe.get(RedisManager.NOTIFICATIONS_VERSION_KEY)
+        pipe.zrange(RedisManager.NOTIFICATIONS_CHANGELOG_KEY, 0, 0, withscores=True)
+        pipe.zrangebyscore(RedisManager.NOTIFICATIONS_CHANGELOG_KEY, f'({since}', '+inf')
+        version, oldest, changes = pipe.execute()
+        version = int(version or 0)
+
+        if len(oldest) == 0 or since > version or since < int(oldest[0][1]) - 1:
+            return version, None
+
+        return version, [c.decode('utf-8') for c in changes]
 
     def set_app_status(self, event_count: int, notification_count: int):
-        self.conn.setex(RedisManager.APP_STATUS_EVENTS_KEY, 10, event_count)
-        self.conn.setex(RedisManager.APP_STATUS_NOTIFICATIONS_KEY, 10, notification_count)
+        pipe = self.conn.pipeline(transaction=False)
+        pipe.setex(RedisManager.APP_STATUS_EVENTS_KEY, 10, event_count)
+        pipe.setex(RedisManager.APP_STATUS_NOTIFICATIONS_KEY, 10, notification_count)
+        pipe.publish(RedisManager.UPDATES_CHANNEL, RedisManager.STATUS_UPDATE_MESSAGE)
+        pipe.execute()
 
     def get_app_status(self) -> Union[Dict[str, int], Dict[str, str]]:
         event_count = self.conn.get(RedisManager.APP_STATUS_EVENTS_KEY)
@@ -71,6 +188,7 @@ class RedisManager:
 
         self.conn.lpush(RedisManager.APP_LAST_ERRORS_KEY, dumps(e, ensure_ascii=False))
         self.conn.ltrim(RedisManager.APP_LAST_ERRORS_KEY, 0, 25)
+        self.conn.publish(RedisManager.UPDATES_CHANNEL, RedisManager.STATUS_UPDATE_MESSAGE)
 
     def get_last_errors(self) -> List[str]:
         return [e.decode('utf-8') for e in self.conn.lrange(RedisManager.APP_LAST_ERRORS_KEY, 0, -1)]
@@ -91,12 +209,32 @@ class RedisManager:
 
     def set_app_status_heavy_load(self):
         self.conn.setex(RedisManager.APP_STATUS_HEAVY_LOAD_KEY, 10, '1')
+        self.conn.publish(RedisManager.UPDATES_CHANNEL, RedisManager.STATUS_UPDATE_MESSAGE)
 
     def get_app_status_heavy_load(self) -> bool:
         return self.conn.get(RedisManager.APP_STATUS_HEAVY_LOAD_KEY) is not None
 
+    def get_status(self) -> dict:
+        return {
+            'heavy_load': self.get_app_status_heavy_load(),
+            'error': self.get_app_status_error(),
+            'status': self.get_app_status()
+        }
+
+    def notifications_exist(self) -> bool:
+        return self.conn.exists(RedisManager.NOTIFICATIONS_KEY) > 0
+
+    def subscribe_updates(self) -> PubSub:
+        pubsub = self.conn.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(RedisManager.UPDATES_CHANNEL)
+
+        return pubsub
+
     def set_bet_bots_wallet_balance(self, wallet_balances: Dict[int, Optional[WalletBalance]]):
         for bot_id, wallet in wallet_balances.items():
+            if wallet is None:
+                continue
+
             self.conn.set(f'{RedisManager.BET_BOT_WALLETS_KEY}:{bot_id}', wallet.funds)
 
     def get_bet_bot_wallet_balance(self, bot_id: int) -> Optional[str]:
@@ -108,6 +246,9 @@ class RedisManager:
 
     def set_bet_bots_bet_history(self, bet_histories: Dict[int, Optional[List[BetHistoryItem]]]):
         for bot_id, history in bet_histories.items():
+            if history is None:
+                continue
+
             self.conn.set(f'{RedisManager.BET_BOT_HISTORY_KEY}:{bot_id}', BetHistoryItem.to_json_str_multiple(history))
 
     def get_bet_bot_bet_history(self, bot_id: int) -> Optional[str]:
@@ -116,3 +257,67 @@ class RedisManager:
             return bh.decode('utf-8')
         else:
             return None
+
+    def set_snapshot_checkpoint(self, checkpoint: bytes, ttl: int):
+        self.conn.setex(RedisManager.SNAPSHOT_CHECKPOINT_KEY, ttl, checkpoint)
+
+    def get_snapshot_checkpoint(self) -> Optional[bytes]:
+        return self.conn.get(RedisManager.SNAPSHOT_CHECKPOINT_KEY)
+
+    def bump_config_version(self):
+        self.conn.incr(RedisManager.CONFIG_VERSION_KEY)
+
+    def get_config_version(self) -> Optional[int]:
+        version = self.conn.get(RedisManager.CONFIG_VERSION_KEY)
+
+        if version is not None:
+            return int(version)
+        else:
+            return None
+
+    def get_scanner_control(self) -> Tuple[Optional[int], Optional[int]]:
+        # Everything the scanner polls for once per cycle, in a single round trip: (config version, cycles to profile)
+        values = self.conn.mget(RedisManager.CONFIG_VERSION_KEY, RedisManager.PROFILE_REQUEST_KEY)
+
+        return tuple(int(v) if v is not None else None for v in values)
+
+    def acquire_scanner_leader(self, token: str, ttl_ms: int) -> bool:
+        return bool(self.conn.set(RedisManager.SCANNER_LEADER_KEY, token, nx=True, px=ttl_ms))
+
+    def renew_scanner_leader(self, token: str, ttl_ms: int) -> bool:
+        return bool(self._renew_if_owner(keys=[RedisManager.SCANNER_LEADER_KEY], args=[token, ttl_ms]))
+
+    def release_scanner_leader(self, token: str):
+        self._delete_if_owner(keys=[RedisManager.SCANNER_LEADER_KEY], args=[token])
+
+    def set_metrics(self, metrics: str):
+        self.conn.setex(RedisManager.METRICS_KEY, 60, metrics)
+
+    def get_metrics(self) -> Optional[str]:
+        metrics = self.conn.get(RedisManager.METRICS_KEY)
+
+        if metrics is not None:
+            return metrics.decode('utf-8')
+        else:
+            return None
+
+    def request_profile(self, cycles: int):
+        self.conn.setex(RedisManager.PROFILE_REQUEST_KEY, 300, cycles)
+
+    def clear_profile_request(self):
+        self.conn.delete(RedisManager.PROFILE_REQUEST_KEY)
+
+    def set_profile(self, stats: bytes, summary: str):
+        self.conn.setex(RedisManager.PROFILE_STATS_KEY, 86400, stats)
+        self.conn.setex(RedisManager.PROFILE_SUMMARY_KEY, 86400, summary)
+
+    def get_profile_stats(self) -> Optional[bytes]:
+        return self.conn.get(RedisManager.PROFILE_STATS_KEY)
+
+    def get_profile_summary(self) -> Optional[str]:
+        summary = self.conn.get(RedisManager.PROFILE_SUMMARY_KEY)
+
+        if summary is not None:
+            return summary.decode('utf-8')
+        else:
+            return None
@@ -0,0 +1,162 @@
+import json
+import threading
+import traceback
+from queue import Queue, Full, Empty
+from time import monotonic
+from typing import Optional, Set, Tuple
+
+from cws.redis_manager import RedisManager
+
+
+class UpdateSubscription:
+    QUEUE_SIZE = 64
+
+    def __init__(self):
+        # (version, replace, message) of the notification changes, None only wakes the stream up
+        self._queue = Queue(maxsize=UpdateSubscription.QUEUE_SIZE)
+        self._resync = False
+
+    def put(self, update: Optional[Tuple[int, bool, str]]):
+        try:
+            self._queue.put_nowait(update)
+        except Full:
+            # A stream that cannot keep up starts over from a snapshot instead of holding back the others
+            if update is not None:
+                self.request_resync()
+
+    def get(self, timeout: float) -> Optional[Tuple[int, bool, str]]:
+        return self._queue.get(timeout=timeout)
+
+    def request_resync(self):
+        self._resync = True
+        self.put(None)
+
+    def take_resync(self) -> bool:
+        if not self._resync:
+            return False
+
+        self._resync = False
+
+        # Everything queued so far is part of the snapshot
+        while True:
+            try:
+                self._queue.get_nowait()
+            except Empty:
+                return True
+
+
+class UpdateBroadcaster:
+    # One subscription to the update channel per web process, shared by all of its open streams. A dashboard only
+    # costs a queue put per update, the Redis work does not grow with the number of dashboards.
+
+    POLL_TIMEOUT = 1.0  # seconds
+    STATUS_REFRESH = 5  # seconds, the status keys expire without anything being published
+    RECONNECT_DELAY = 1  # seconds
+
+    _subscriptions: Set[UpdateSubscription]
+
+    def __init__(self, redis_manager: RedisManager):
+        self.redis_manager = redis_manager
+        self.status = None  # JSON of the last read status
+
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+        self._notifications_exist = False
+
+    def subscribe(self) -> UpdateSubscription:
+        subscription = UpdateSubscription()
+
+        with self._lock:
+            # Started on the first stream, after the web server forked its workers
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='Update broadcaster', daemon=True)
+                self._thread.start()
+
+            self._subscriptions.add(subscription)
+
+        return subscription
+
+    def unsubscribe(self, subscription: UpdateSubscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def stop(self):
+        self._stopped.set()
+
+        with self._lock:
+            thread = self._thread
+
+        if thread is not None:
+            thread.join()
+
+    def _broadcast(self, update: Optional[Tuple[int, bool, str]] = None, resync: bool = False):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+
+        for s in subscriptions:
+            if resync:
+                s.request_resync()
+            else:
+                s.put(update)
+
+    def _run(self):
+        try:
+            while not self._stopped.is_set():
+                pubsub = None
+
+                # noinspection PyBroadException
+                try:
+                    pubsub = self.redis_manager.subscribe_updates()
+                    self._listen(pubsub)
+                except Exception as e:
+                    # Anything but a Redis error is unexpected, but must not leave the streams without updates either
+                    print(f'Update channel lost: {type(e).__name__}: {e}')
+                    traceback.print_exc()
+                    self._stopped.wait(UpdateBroadcaster.RECONNECT_DELAY)
+                finally:
+                    if pubsub is not None:
+                        pubsub.close()
+        finally:
+            # The next stream starts a new thread
+            with self._lock:
+                self._thread = None
+
+    def _listen(self, pubsub):
+        # Changes published while the channel was not listened to are lost, so every stream starts over
+        self._broadcast(resync=True)
+        self._refresh_status()
+        status_refreshed_on = monotonic()
+
+        while not self._stopped.is_set():
+            message = pubsub.get_message(timeout=UpdateBroadcaster.POLL_TIMEOUT)
+
+            if message is not None and message['type'] == 'message':
+                update = json.loads(message['data'])
+
+                if update['type'] == 'notifications':
+                    self._notifications_exist = True
+                    self._broadcast((update['version'], update['replace'], message['data'].decode('utf-8')))
+                else:
+                    self._refresh_status()
+                    status_refreshed_on = monotonic()
+
+            if monotonic() - status_refreshed_on >= UpdateBroadcaster.STATUS_REFRESH:
+                self._refresh_status()
+                status_refreshed_on = monotonic()
+
+    def _refresh_status(self):
+        status = json.dumps(self.redis_manager.get_status(), ensure_ascii=False)
+
+        if status != self.status:
+            self.status = status
+            self._broadcast()
+
+        # The notifications of a scanner that stopped expire without a change being published
+        notifications_exist = self.redis_manager.notifications_exist()
+
+        if self._notifications_exist and not notifications_exist:
+            self._broadcast(resync=True)
+
+        self._notifications_exist = notifications_exist
@@ -1,6 +1,12 @@
-from flask import Blueprint, render_template, current_app, Response
+from queue import Empty
+from time import time
+from typing import List
 
-from cws.views.auth import login_required
+from flask import Blueprint, render_template, current_app, Response, request, jsonify
+
+from cws.config import AppConfig
+from cws.core.profiler import CycleProfiler
+from cws.views.auth import login_required, login_or_token_required
 
 bp = Blueprint('app', __name__, url_prefix='/')
 
@@ -10,29 +16,177 @@ def main():
     return render_template('main.html')
 
 
+# Comment lines sent on an idle stream, so proxies keep it open and a closed one is noticed
+STREAM_KEEPALIVE = 15  # seconds
+
+
+def notifications_json(version: int, notifications: List[str]) -> str:
+    # The server time lets the browser work out the uptime of the notifications regardless of its own clock
+    return '{"version": %d, "now": %f, "notifications": [%s]}' % (version, time(), ','.join(notifications))
+
+
+def server_sent_event(event: str, data: str) -> str:
+    return f'event: {event}\ndata: {data}\n\n'
+
+
+def conditional(response: Response) -> Response:
+    # Browsers revalidate every request with If-None-Match and get an empty 304 while nothing changed
+    if response.get_etag()[0] is None:
+        response.add_etag()
+
+    response.headers['Cache-Control'] = 'no-cache'
+
+    return response.make_conditional(request)
+
+
 @bp.route('/notifications')
 @login_required
 def get_notifications():
-    notifications = ','.join(current_app.redis_manager.get_notifications_json())
+    # ?since=<version> returns the changes after that version, or all notifications when the changelog no longer
+    # goes back that far. The ETag is checked before anything else is read, an idle dashboard costs one round trip.
+    redis_manager = current_app.redis_manager
+    version, exists = redis_manager.get_notifications_version()
+    etag = f'{version}-{int(exists)}'
 
-    response = Response('{"notifications": [%s]}' % notifications)
-    response.headers['Content-Type'] = 'application/json'
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        since = request.args.get('since', type=int)
+        changes = None
 
-    return response
+        if since is not None:
+            version, changes = redis_manager.get_notification_changes(since)
+
+        if changes is not None:
+            response = Response('{"version": %d, "now": %f, "changes": [%s]}' % (version, time(), ','.join(changes)))
+        else:
+            response = Response(notifications_json(*redis_manager.get_notifications()))
+
+        response.headers['Content-Type'] = 'application/json'
+
+    # Weak, as the server time in the body differs between responses for the same version
+    response.set_etag(etag, weak=True)
+
+    return conditional(response)
 
 
 @bp.route('/status')
 @login_required
 def get_app_status():
-    heavy_load = current_app.redis_manager.get_app_status_heavy_load()
-    error = current_app.redis_manager.get_app_status_error()
-    status = current_app.redis_manager.get_app_status()
+    return conditional(jsonify(current_app.redis_manager.get_status()))
+
+
+@bp.route('/stream')
+@login_required
+def stream_updates():
+    # Status changes and, with ?notifications=1, a snapshot of the notifications followed by their changes
+    redis_manager = current_app.redis_manager
+    broadcaster = current_app.update_broadcaster
+    with_notifications = request.args.get('notifications') == '1'
+    subscription = broadcaster.subscribe()
+
+    def generate():
+        version = None
+        status = None
+
+        try:
+            while True:
+                if subscription.take_resync() or (with_notifications and version is None):
+                    version = None
 
-    return {
-        'heavy_load': heavy_load,
-        'error': error,
-        'status': status
-    }
+                    if with_notifications:
+                        version, notifications = redis_manager.get_notifications()
+                        yield server_sent_event('snapshot', notifications_json(version, notifications))
+
+                if broadcaster.status is not None and broadcaster.status != status:
+                    status = broadcaster.status
+                    yield server_sent_event('status', status)
+
+                try:
+                    update = subscription.get(timeout=STREAM_KEEPALIVE)
+                except Empty:
+                    yield ': keepalive\n\n'
+                    continue
+
+                if update is None or not with_notifications:
+                    continue
+
+                update_version, replace, message = update
+
+                # Changes already in the snapshot are skipped, a gap means some were lost and the stream starts over
+                if replace or update_version == version + 1:
+                    version = update_version
+                    yield server_sent_event('notifications', message)
+                elif update_version > version:
+                    subscription.request_resync()
+        finally:
+            broadcaster.unsubscribe(subscription)
+
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+
+    return response
+
+
+@bp.route('/metrics')
+@login_or_token_required(AppConfig.Variables.METRICS_TOKEN)
+def get_metrics():
+    # Scraped by Prometheus with the token as bearer_token, or viewed by a logged in admin
+    metrics = current_app.redis_manager.get_metrics()
+
+    if metrics is None:
+        return '', 503
+
+    response = Response(metrics)
+    response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+
+    return response
+
+
+@bp.route('/profile', methods=('POST',))
+@login_required
+def request_profile():
+    try:
+        cycles = int(request.json.get('cycles', 5))
+    except (AttributeError, TypeError, ValueError):
+        return '', 400
+
+    if not 1 <= cycles <= CycleProfiler.MAX_CYCLES:
+        return '', 400
+
+    current_app.redis_manager.request_profile(cycles)
+
+    return '', 202
+
+
+@bp.route('/profile')
+@login_required
+def get_profile_summary():
+    summary = current_app.redis_manager.get_profile_summary()
+
+    if summary is None:
+        return '', 404
+
+    response = Response(summary)
+    response.headers['Content-Type'] = 'text/plain; charset=utf-8'
+
+    return response
+
+
+@bp.route('/profile/stats')
+@login_required
+def get_profile_stats():
+    stats = current_app.redis_manager.get_profile_stats()
+
+    if stats is None:
+        return '', 404
+
+    response = Response(stats)
+    response.headers['Content-Type'] = 'application/octet-stream'
+    response.headers['Content-Disposition'] = 'attachment; filename=scanner.prof'
+
+    return response
 
 
 @bp.route('/errors')
@@ -43,4 +197,4 @@ def get_last_errors():
     response = Response('{"errors": [%s]}' % errors)
     response.headers['Content-Type'] = 'application/json'
 
-    return response
+    return conditional(response)
@@ -1,4 +1,5 @@
 import functools
+import hmac
 
 from flask import Blueprint, render_template, request, session, url_for, redirect, g
 
@@ -18,6 +19,27 @@ def login_required(view):
     return wrapped_view
 
 
+def login_or_token_required(token_variable: AppConfig.Variables):
+    # For clients that cannot log in, such as Prometheus: a request with the configured token as a bearer token is
+    # let in as well. Without a token configured only a logged in admin is.
+    def decorator(view):
+        logged_in_view = login_required(view)
+
+        @functools.wraps(view)
+        def wrapped_view(**kwargs):
+            token = AppConfig.get(token_variable)
+            authorization = request.headers.get('Authorization', '')
+
+            if token is not None and hmac.compare_digest(authorization.encode(), f'Bearer {token}'.encode()):
+                return view(**kwargs)
+
+            return logged_in_view(**kwargs)
+
+        return wrapped_view
+
+    return decorator
+
+
 @bp.before_app_request
 def load_logged_in_user():
     g.admin = session.get('admin') is not None
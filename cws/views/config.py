@@ -121,6 +121,7 @@ def set_sport_data():
             existing_sport.is_enabled = is_enabled
             existing_sport.trigger_time = trigger_time
             current_app.session.commit()
+            current_app.redis_manager.bump_config_version()
     except SQLAlchemyError:
         db_error = True
         current_app.session.rollback()
@@ -169,6 +170,7 @@ def set_market_data():
             existing_market.is_enabled = is_enabled
             existing_market.trigger_time = trigger_time
             current_app.session.commit()
+            current_app.redis_manager.bump_config_version()
     except SQLAlchemyError:
         db_error = True
         current_app.session.rollback()
@@ -210,6 +212,7 @@ def set_bet_data():
         else:
             existing_bet.is_enabled = is_enabled
             current_app.session.commit()
+            current_app.redis_manager.bump_config_version()
     except SQLAlchemyError:
         db_error = True
         current_app.session.rollback()
@@ -268,6 +271,7 @@ def set_option(option_id):
 
             if existing_option.check():
                 current_app.session.commit()
+                current_app.redis_manager.bump_config_version()
             else:
                 check_failed_error = True
     except SQLAlchemyError:
@@ -0,0 +1,62 @@
+import signal
+import sys
+
+from apscheduler.schedulers.background import BackgroundScheduler
+
+from app import create_scanner, schedule_core
+from cws.bots.bot_manager import BotManager
+from cws.core.leader_lock import LeaderLock
+from cws.database import SessionLocal
+from cws.redis_manager import RedisManager
+
+
+def _exit(signum, frame):
+    sys.exit(0)
+
+
+def main() -> int:
+    # Any number of these processes may run on any number of hosts: one scans, the others stand by
+    signal.signal(signal.SIGTERM, _exit)
+
+    leader_lock = LeaderLock(RedisManager())
+    leader_lock.start()
+    scheduler = None
+    scanner = None
+
+    try:
+        print('Waiting for the scanner leader lock')
+        leader_lock.wait()
+        print(f'Scanner leader lock acquired: {leader_lock.token}')
+
+        scanner = create_scanner()
+        bot_manager = BotManager(SessionLocal())
+
+        def cycle():
+            if leader_lock.is_leader:
+                return scanner.cycle()
+
+        def bot_refresh():
+            if leader_lock.is_leader:
+                bot_manager.refresh()
+
+        scheduler = BackgroundScheduler()
+        schedule_core(scheduler, scanner, cycle, bot_refresh)
+        scheduler.start()
+
+        leader_lock.lost.wait()
+        print('Scanner leader lock lost')
+
+        # Exits so that the supervisor restarts the process as a standby with a fresh scanner
+        return 1
+    finally:
+        if scheduler is not None:
+            scheduler.shutdown(wait=False)
+
+        if scanner is not None:
+            scanner.stop()
+
+        leader_lock.stop()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
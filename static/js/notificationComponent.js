@@ -37,14 +37,19 @@ class NotificationComponent {
         this.root = template.content.firstElementChild.cloneNode(true);
 
         this.id = data.id;
+        this.triggeredOn = data.triggered_on;
         this.score = data.score;
         this.soundPlayed = false;
 
         this._setNotificationData(data);
     }
 
-    _setUptime(uptimeSeconds, uptimeFormatted) {
-        this.root.querySelector('.n--uptime').innerText = uptimeFormatted;
+    refreshUptime(now) {
+        const uptimeSeconds = Math.max(0, Math.floor(now - this.triggeredOn));
+        const minutes = String(Math.floor(uptimeSeconds / 60)).padStart(2, '0');
+        const seconds = String(uptimeSeconds % 60).padStart(2, '0');
+
+        this.root.querySelector('.n--uptime').innerText = `${minutes}:${seconds}`;
 
         if (uptimeSeconds < 60) {
             // Just added
@@ -104,7 +109,6 @@ class NotificationComponent {
     }
 
     updateNotificationData(data) {
-        this._setUptime(data.uptime_seconds, data.uptime);
         this._setMatchTime(data.time);
         this._setScore(data.score);
     }
@@ -3,6 +3,14 @@ class NotificationManager {
         this.notifications = [];
         this.notificationsIds = new Set();
         this.updateLock = false;
+
+        // Version of the notifications shown, polls only ask for the changes after it
+        this.version = null;
+
+        // Server time minus browser time, in seconds. Uptimes are counted from the server's clock.
+        this.serverTimeOffset = 0;
+
+        setInterval(() => this._refreshUptimes(), 1000);
     }
 
     async fetchNotifications() {
@@ -15,21 +23,41 @@ class NotificationManager {
         let response;
 
         try {
-            response = await axios.get('/notifications');
+            response = await axios.get('/notifications', {params: {since: this.version}});
         } catch (e) {
             console.error('While fetching notifications:', e);
             this.updateLock = false;
             return;
         }
 
+        if (response.data.changes) {
+            response.data.changes.forEach(update => this.applyUpdate(update));
+            this.version = response.data.version;
+        } else {
+            this.applySnapshot(response.data);
+        }
+
+        this.updateLock = false;
+    }
+
+    listen(updateStream) {
+        updateStream.on('snapshot', snapshot => this.applySnapshot(snapshot));
+        updateStream.on('notifications', update => this.applyUpdate(update));
+        updateStream.pollWith(() => this.fetchNotifications());
+    }
+
+    applySnapshot(snapshot) {
+        this.version = snapshot.version;
+        this.serverTimeOffset = snapshot.now - Date.now() / 1000;
+
         let newNotificationsData = [];
         let updatedNotificationsData = [];
         let removedNotifications = [];
 
-        let responseNotificationIds = new Set();
+        let snapshotNotificationIds = new Set();
 
-        response.data.notifications.forEach(nData => {
-            responseNotificationIds.add(nData.id);
+        snapshot.notifications.forEach(nData => {
+            snapshotNotificationIds.add(nData.id);
 
             if (this.notificationsIds.has(nData.id)) {
                 updatedNotificationsData.push(nData);
@@ -39,16 +67,40 @@ class NotificationManager {
         });
 
         this.notifications.forEach(nComponent => {
-            if (!responseNotificationIds.has(nComponent.id)) {
+            if (!snapshotNotificationIds.has(nComponent.id)) {
                 removedNotifications.push(nComponent);
             }
         });
 
-        this._addNotifications(newNotificationsData.sort((a, b) => b.uptime_seconds - a.uptime_seconds));
+        this._addNotifications(newNotificationsData.sort((a, b) => a.triggered_on - b.triggered_on));
         this._updateNotifications(updatedNotificationsData);
         this._removeNotifications(removedNotifications);
+        this._refreshUptimes();
+    }
 
-        this.updateLock = false;
+    applyUpdate(update) {
+        // Only the notifications that changed, unless the whole list was written again
+        if (update.replace) {
+            this.applySnapshot({version: update.version, now: update.now, notifications: update.changed});
+            return;
+        }
+
+        this.version = update.version;
+        this.serverTimeOffset = update.now - Date.now() / 1000;
+
+        const newNotificationsData = update.changed.filter(nData => !this.notificationsIds.has(nData.id));
+        const updatedNotificationsData = update.changed.filter(nData => this.notificationsIds.has(nData.id));
+        const removedIds = new Set(update.removed);
+
+        this._addNotifications(newNotificationsData.sort((a, b) => a.triggered_on - b.triggered_on));
+        this._updateNotifications(updatedNotificationsData);
+        this._removeNotifications(this.notifications.filter(n => removedIds.has(n.id)));
+        this._refreshUptimes();
+    }
+
+    _refreshUptimes() {
+        const now = Date.now() / 1000 + this.serverTimeOffset;
+        this.notifications.forEach(n => n.refreshUptime(now));
     }
 
     _addNotifications(notificationsData) {
@@ -5,7 +5,8 @@ class StatusManager {
         this.heavyLoadElement = document.getElementById('status-heavy-load');
         this.errorElement = document.getElementById('status-error');
 
-        setInterval(async () => await this.getAppStatus(), 5000);
+        updateStream.on('status', status => this.showAppStatus(status));
+        updateStream.pollWith(() => this.getAppStatus());
     }
 
     async getAppStatus() {
@@ -18,13 +19,17 @@ class StatusManager {
             return;
         }
 
-        this.eventCountElement.innerText = response.data.status.events;
-        this.notificationCountElement.innerText = response.data.status.notifications;
-        this.heavyLoadElement.innerText = response.data.heavy_load ? 'yes' : 'no';
-        this.errorElement.innerText = response.data.error ? 'yes' : 'no';
+        this.showAppStatus(response.data);
+    }
+
+    showAppStatus(status) {
+        this.eventCountElement.innerText = status.status.events;
+        this.notificationCountElement.innerText = status.status.notifications;
+        this.heavyLoadElement.innerText = status.heavy_load ? 'yes' : 'no';
+        this.errorElement.innerText = status.error ? 'yes' : 'no';
 
-        if (response.data.error) {
-            this.errorElement.setAttribute('title', response.data.error.error_class);
+        if (status.error) {
+            this.errorElement.setAttribute('title', status.error.error_class);
         } else {
             this.errorElement.removeAttribute('title');
         }
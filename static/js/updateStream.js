@@ -0,0 +1,70 @@
+class UpdateStream {
+    // One server-sent event stream per page, shared by the managers listening to it. The notifications are only
+    // streamed to pages that listen to them. Without a stream, because the browser has no EventSource or the stream
+    // was closed, the managers poll their endpoints instead until it is open again.
+
+    static POLL_INTERVAL = 5000;  // ms
+    static RECONNECT_DELAY = 5000;  // ms
+
+    constructor(url) {
+        this.url = url;
+        this.handlers = new Map();
+        this.pollers = [];
+        this.source = null;
+        this.pollTimer = null;
+    }
+
+    on(eventType, handler) {
+        this.handlers.set(eventType, handler);
+    }
+
+    pollWith(poller) {
+        this.pollers.push(poller);
+    }
+
+    connect() {
+        if (!window.EventSource) {
+            this._startPolling();
+            return;
+        }
+
+        const url = this.handlers.has('notifications') ? this.url + '?notifications=1' : this.url;
+        this.source = new EventSource(url);
+
+        this.handlers.forEach((handler, eventType) => {
+            this.source.addEventListener(eventType, e => handler(JSON.parse(e.data)));
+        });
+
+        // The stream starts with a snapshot, so nothing polled in the meantime is missed
+        this.source.onopen = () => this._stopPolling();
+
+        this.source.onerror = () => {
+            // Network errors are retried by the browser, a closed stream (e.g. a failed response) is opened again here
+            if (this.source.readyState === EventSource.CLOSED) {
+                console.error('Update stream closed, polling until it is reconnected');
+                this._startPolling();
+                setTimeout(() => this.connect(), UpdateStream.RECONNECT_DELAY);
+            }
+        };
+    }
+
+    _startPolling() {
+        if (this.pollTimer !== null) {
+            return;
+        }
+
+        const poll = () => this.pollers.forEach(poller => poller());
+
+        poll();
+        this.pollTimer = setInterval(poll, UpdateStream.POLL_INTERVAL);
+    }
+
+    _stopPolling() {
+        if (this.pollTimer !== null) {
+            clearInterval(this.pollTimer);
+            this.pollTimer = null;
+        }
+    }
+}
+
+const updateStream = new UpdateStream('/stream');
@@ -0,0 +1,17 @@
+import fakeredis
+import pytest
+
+from benchmarks.standins import use_offline_environment
+
+use_offline_environment()
+
+
+@pytest.fixture
+def redis_manager(monkeypatch):
+    import cws.redis_manager
+
+    # Every test gets a server of its own
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(cws.redis_manager, 'Redis', lambda **kwargs: fakeredis.FakeRedis(server=server))
+
+    return cws.redis_manager.RedisManager()
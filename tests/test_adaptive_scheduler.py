@@ -0,0 +1,76 @@
+from cws.core.adaptive_scheduler import AdaptiveScheduler
+from cws.core.status_monitor import StatusMonitor
+
+
+def make_scheduler(**kwargs) -> AdaptiveScheduler:
+    return AdaptiveScheduler(lambda: None, StatusMonitor(), **kwargs)
+
+
+def poll(scheduler: AdaptiveScheduler, digests, start: float = 0.0):
+    # Every poll starts one current period after the previous one
+    now = start
+
+    for digest in digests:
+        scheduler._record_feed_digest(digest, now)
+        now += scheduler.period
+
+    return now
+
+
+def test_starts_at_the_target_period():
+    scheduler = make_scheduler(target_period=5.0)
+
+    poll(scheduler, [1])
+
+    assert scheduler.period == 5.0
+
+
+def test_unchanged_odds_stretch_the_period():
+    scheduler = make_scheduler(target_period=5.0)
+
+    poll(scheduler, [1, 1, 1, 2])
+
+    assert scheduler.stale_cycles == 2
+    assert scheduler.period == 15.0
+
+
+def test_long_lull_stays_within_the_maximum_period():
+    scheduler = make_scheduler(target_period=5.0, max_period=15.0)
+
+    now = poll(scheduler, [1] + [1] * 30)
+    poll(scheduler, [2], start=now + 3600)
+
+    assert scheduler.stale_cycles == 30
+    assert scheduler.period <= 15.0
+
+
+def test_new_odds_on_every_poll_speed_polling_up():
+    scheduler = make_scheduler(target_period=5.0, min_period=1.0)
+
+    poll(scheduler, range(10))
+
+    assert scheduler.stale_cycles == 0
+    assert 1.0 <= scheduler.period < 5.0
+
+
+def test_period_never_drops_below_the_minimum_or_the_cycle_latency():
+    scheduler = make_scheduler(target_period=5.0, min_period=1.0, min_gap=0.5)
+
+    poll(scheduler, range(50))
+    assert scheduler.period == 1.0
+
+    scheduler.cycle_latency = 2.0
+    assert scheduler.period == 2.5
+
+
+def test_settles_near_the_cadence_of_the_feed():
+    scheduler = make_scheduler(target_period=5.0, min_period=0.5, min_gap=0.0)
+    now = 0.0
+
+    # The odds change every 2 seconds
+    for _ in range(200):
+        scheduler._record_feed_digest(int(now // 2), now)
+        now += scheduler.period
+
+    assert 1.0 <= scheduler.period <= 3.0
+    assert scheduler.stale_cycles > 0
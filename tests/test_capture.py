@@ -0,0 +1,53 @@
+import json
+
+import pytest
+from requests.structures import CaseInsensitiveDict
+
+from benchmarks.synthetic_feed import SyntheticFeed
+from cws.api.capture import CaptureExhaustedError, FeedCapture, FeedRecorder, ReplayFeedClient
+from cws.api.casino_winner import CasinoWinnerApi
+from cws.api.models import Event
+
+DATE = 'Fri, 01 Jan 2021 00:00:00 GMT'
+
+
+def snapshot(events):
+    return [(e.id, e.sport_id, [(t.id, t.odds, t.is_active) for t in e.tips]) for e in events]
+
+
+@pytest.fixture
+def recorded(tmp_path):
+    feed = SyntheticFeed(event_count=10, tips_per_event=5)
+    path = str(tmp_path / 'feed.capture')
+    recorder = FeedRecorder(path)
+    bodies = []
+
+    for _ in range(3):
+        bodies.append(feed.serialize())
+        recorder.record(CasinoWinnerApi.EVENTS_PARAMS, CaseInsensitiveDict({'Date': DATE}), bodies[-1])
+        feed.advance()
+
+    # Everything still queued is written out
+    recorder.close()
+
+    return path, bodies
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_capture_replays_into_the_same_events(recorded, streaming):
+    path, bodies = recorded
+    capture = FeedCapture(path)
+    api = CasinoWinnerApi(ReplayFeedClient(capture), streaming=streaming)
+
+    assert len(capture) == len(bodies)
+
+    for body in bodies:
+        events, timestamp = api.get_all_live_events()
+
+        assert snapshot(events) == snapshot(Event.from_json_multiple(json.loads(body)))
+        assert timestamp.strftime(CasinoWinnerApi.DATE_FORMAT) == DATE
+
+    with pytest.raises(CaptureExhaustedError):
+        api.get_all_live_events()
+
+    capture.close()
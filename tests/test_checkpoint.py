@@ -0,0 +1,34 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from benchmarks.synthetic_feed import SyntheticFeed
+from cws.api.models import Event
+from cws.core.checkpoint import SnapshotCheckpoint
+from cws.core.columnar import ColumnarSnapshotEngine
+from cws.core.filter_index import FilterIndex
+from cws.core.snapshot_store import SnapshotStore
+from cws.core.snapshots import DictSnapshotEngine
+
+START = datetime(2021, 1, 1)
+
+
+@pytest.mark.parametrize('engine_class', [SnapshotStore, DictSnapshotEngine, ColumnarSnapshotEngine])
+def test_downtime_is_not_counted_as_idle_time(engine_class):
+    feed = SyntheticFeed(event_count=5, tips_per_event=6, churn_rate=0.0)
+    events = Event.from_json_multiple(json.loads(feed.serialize()))
+    filters = FilterIndex({(e.sport_id, t.market_group_id, t.bet_group_id, 10) for e in events for t in e.tips})
+
+    engine = engine_class()
+    engine.update(events, START, filters)
+    engine.update(events, START + timedelta(seconds=60), filters)
+    checkpoint = SnapshotCheckpoint.loads(SnapshotCheckpoint.create(START + timedelta(seconds=60), engine, []).dumps())
+
+    # Restarted ten minutes later
+    restarted = engine_class()
+    restarted.update(events, START + timedelta(seconds=660), filters)
+    restored_tips, _ = checkpoint.restore(restarted, events)
+
+    assert restored_tips == len(checkpoint.tip_states)
+    assert {s[5] for s in restarted.export_tip_states()} == {60}
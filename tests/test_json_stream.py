@@ -0,0 +1,42 @@
+import json
+
+import pytest
+
+from cws.api.json_stream import JsonArrayStream
+
+PAYLOAD = '{"ts": 1.5e3, "el": [1.25, -3e-2, 17, {"msp": 2.5}, "x", true, null, 4.0E+1], "n": -0.5}'
+
+
+def split(text: str, *positions: int):
+    data = text.encode('utf-8')
+    bounds = [0, *positions, len(data)]
+
+    return [data[a:b] for a, b in zip(bounds, bounds[1:])]
+
+
+def decode(chunks):
+    stream = JsonArrayStream(chunks, 'el')
+    items = list(stream)
+
+    return items, stream.envelope
+
+
+@pytest.mark.parametrize('position', range(1, len(PAYLOAD)))
+def test_any_chunk_boundary(position):
+    expected = json.loads(PAYLOAD)
+    items, envelope = decode(split(PAYLOAD, position))
+
+    assert items == expected['el']
+    assert envelope == {'ts': expected['ts'], 'n': expected['n']}
+
+
+def test_number_cut_after_the_point_and_the_exponent():
+    text = '{"el": [12.5, 3e7]}'
+
+    assert decode(split(text, text.index('.') + 1, text.rindex('e') + 1))[0] == [12.5, 3e7]
+
+
+def test_single_byte_chunks():
+    items, _ = decode(split(PAYLOAD, *range(1, len(PAYLOAD))))
+
+    assert items == json.loads(PAYLOAD)['el']
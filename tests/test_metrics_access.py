@@ -0,0 +1,46 @@
+import pytest
+from flask import Flask
+
+from cws.config import AppConfig
+from cws.views import app as app_views, auth
+
+
+@pytest.fixture
+def client(redis_manager, monkeypatch):
+    AppConfig.get(AppConfig.Variables.METRICS_TOKEN)
+    monkeypatch.setitem(AppConfig._vars, AppConfig.Variables.METRICS_TOKEN, 'scrape-token')
+
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.redis_manager = redis_manager
+    app.register_blueprint(auth.bp)
+    app.register_blueprint(app_views.bp)
+
+    redis_manager.set_metrics('cws_events 1\n')
+
+    return app.test_client()
+
+
+def test_scrape_with_the_token(client):
+    response = client.get('/metrics', headers={'Authorization': 'Bearer scrape-token'})
+
+    assert response.status_code == 200
+    assert response.data == b'cws_events 1\n'
+
+
+@pytest.mark.parametrize('headers', [{}, {'Authorization': 'Bearer wrong'}, {'Authorization': 'Bearer ünïcode'}])
+def test_no_metrics_without_the_token_or_a_login(client, headers):
+    assert client.get('/metrics', headers=headers).status_code == 302
+
+
+def test_logged_in_admin_needs_no_token(client):
+    with client.session_transaction() as session:
+        session['admin'] = True
+
+    assert client.get('/metrics').status_code == 200
+
+
+def test_no_token_configured(client, monkeypatch):
+    monkeypatch.setitem(AppConfig._vars, AppConfig.Variables.METRICS_TOKEN, None)
+
+    assert client.get('/metrics', headers={'Authorization': 'Bearer None'}).status_code == 302
@@ -0,0 +1,99 @@
+import json
+
+from cws.core.notification_store import NotificationStore
+from cws.redis_manager import RedisManager
+
+
+class StaticNotification:
+    def __init__(self, n_id: str, score: str = '0 - 0'):
+        self.id = n_id
+        self.score = score
+
+    def to_json(self) -> str:
+        return json.dumps({'id': self.id, 'score': self.score})
+
+
+def test_only_changes_are_written(redis_manager):
+    store = NotificationStore(redis_manager)
+    a, b = StaticNotification('1-1'), StaticNotification('2-1')
+
+    store.update([a, b])
+    store.update([a, StaticNotification('2-1', '1 - 0')])
+    store.update([a])
+
+    version, notifications = redis_manager.get_notifications()
+
+    assert version == store.version == 3
+    assert [json.loads(n)['id'] for n in notifications] == ['1-1']
+    assert store.written_notifications == 3
+    assert store.removed_notifications == 1
+    assert store.full_writes == 0
+
+
+def test_unchanged_cycle_keeps_the_version(redis_manager):
+    store = NotificationStore(redis_manager)
+    store.update([StaticNotification('1-1')])
+    store.update([StaticNotification('1-1')])
+
+    assert store.version == 1
+
+
+def test_lost_hash_is_written_again(redis_manager):
+    store = NotificationStore(redis_manager)
+    store.update([StaticNotification('1-1'), StaticNotification('2-1')])
+
+    redis_manager.conn.delete(RedisManager.NOTIFICATIONS_KEY)
+    store.update([StaticNotification('1-1'), StaticNotification('2-1')])
+
+    assert store.full_writes == 1
+    assert len(redis_manager.get_notifications()[1]) == 2
+
+
+def test_changes_are_published(redis_manager):
+    pubsub = redis_manager.subscribe_updates()
+    store = NotificationStore(redis_manager)
+
+    store.update([StaticNotification('1-1')])
+    store.update([])
+
+    # The subscription confirmation is read as None
+    messages = (pubsub.get_message(timeout=1) for _ in range(3))
+    updates = [json.loads(m['data']) for m in messages if m is not None]
+
+    assert [(u['version'], u['replace']) for u in updates] == [(1, False), (2, False)]
+    assert updates[0]['changed'] == [{'id': '1-1', 'score': '0 - 0'}] and updates[0]['removed'] == []
+    assert updates[1]['changed'] == [] and updates[1]['removed'] == ['1-1']
+
+
+def test_changes_since_a_version(redis_manager):
+    for i in range(3):
+        redis_manager.update_notifications({f'{i}-1': StaticNotification(f'{i}-1').to_json()}, ())
+
+    version, changes = redis_manager.get_notification_changes(1)
+
+    assert version == 3
+    assert [json.loads(c)['version'] for c in changes] == [2, 3]
+    assert redis_manager.get_notification_changes(3) == (3, [])
+
+
+def test_changes_since_a_version_older_than_the_changelog(redis_manager, monkeypatch):
+    monkeypatch.setattr(RedisManager, 'NOTIFICATIONS_CHANGELOG_SIZE', 2)
+
+    for i in range(4):
+        redis_manager.update_notifications({f'{i}-1': StaticNotification(f'{i}-1').to_json()}, ())
+
+    assert redis_manager.get_notification_changes(2)[1] is not None
+    assert redis_manager.get_notification_changes(1) == (4, None)
+
+
+def test_changes_since_a_version_ahead_of_the_server(redis_manager):
+    redis_manager.update_notifications({'1-1': StaticNotification('1-1').to_json()}, ())
+
+    assert redis_manager.get_notification_changes(7) == (1, None)
+
+
+def test_changes_after_the_changelog_expired(redis_manager):
+    redis_manager.update_notifications({'1-1': StaticNotification('1-1').to_json()}, ())
+    redis_manager.conn.delete(RedisManager.NOTIFICATIONS_CHANGELOG_KEY, RedisManager.NOTIFICATIONS_KEY)
+
+    assert redis_manager.get_notification_changes(1) == (1, None)
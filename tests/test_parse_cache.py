@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+from benchmarks.synthetic_feed import SyntheticFeed
+from cws.api.models import Event, EventParseCache
+
+
+@pytest.fixture
+def feed():
+    return SyntheticFeed(event_count=20, tips_per_event=10, churn_rate=0.0)
+
+
+def parse(feed: SyntheticFeed, parse_cache: EventParseCache):
+    return Event.from_json_multiple(json.loads(feed.serialize()), parse_cache)
+
+
+def test_clock_only_change_is_a_cache_hit(feed):
+    parse_cache = EventParseCache()
+    first = parse(feed, parse_cache)
+
+    feed.advance()
+    second = parse(feed, parse_cache)
+
+    market_count = sum(len({t.unique_tip_group_id for t in e.tips}) for e in first)
+
+    assert parse_cache.hits == parse_cache.misses == market_count
+    assert all(t1 is t2 for e1, e2 in zip(first, second) for t1, t2 in zip(e1.tips, e2.tips))
+
+    # The rest of the event is parsed again
+    assert all(e1.time != e2.time for e1, e2 in zip(first, second))
+    assert [e.time for e in second] == [e.time for e in Event.from_json_multiple(json.loads(feed.serialize()))]
+
+
+def test_odds_change_is_a_cache_miss(feed):
+    parse_cache = EventParseCache()
+    parse(feed, parse_cache)
+
+    feed.churn_rate = 1.0
+    feed.advance()
+    second = parse(feed, parse_cache)
+
+    assert parse_cache.hits == 0
+    assert second == Event.from_json_multiple(json.loads(feed.serialize()))
+
+
+def test_only_changed_markets_are_parsed_again():
+    parse_cache = EventParseCache()
+    data = SyntheticFeed(event_count=1, tips_per_event=10).payload()['el'][0]
+    first = parse_cache.from_json(data)
+
+    data['ml'][0]['msl'][0]['msp'] += 1
+    second = parse_cache.from_json(data)
+    changed_market = data['ml'][0]['mi']
+
+    assert parse_cache.misses == len(data['ml']) + 1
+    assert second.tips[0].odds == first.tips[0].odds + 1
+    assert all((t1 is t2) == (t1.unique_tip_group_id != changed_market) for t1, t2 in zip(first.tips, second.tips))
+
+
+def test_score_change_is_parsed_on_a_hit():
+    parse_cache = EventParseCache()
+    data = SyntheticFeed(event_count=1, tips_per_event=3).payload()['el'][0]
+    data['ss'] = '0 - 0'
+    parse_cache.from_json(data)
+
+    data['ss'] = '1 - 0'
+    event = parse_cache.from_json(data)
+
+    assert parse_cache.hits == parse_cache.misses
+    assert event.get_score() == '1:0'
+
+
+def test_phase_analysis_is_carried_over_on_a_hit(feed):
+    parse_cache = EventParseCache()
+    first = parse(feed, parse_cache)
+
+    for e in first:
+        e.is_tip_eligible_for_notification(e.tips[0])
+
+    feed.advance()
+    second = parse(feed, parse_cache)
+
+    assert all(e2.current_phase_bet_names is e1.current_phase_bet_names for e1, e2 in zip(first, second))
@@ -0,0 +1,87 @@
+import threading
+from itertools import count
+from time import sleep
+
+import pytest
+
+from cws.core.prefetcher import FeedPrefetcher
+
+
+class StubFeed:
+    def __init__(self, error: Exception = None):
+        self.error = error
+        self.fetches = 0
+        self.release = threading.Event()
+        self.release.set()
+        self._payloads = count(1)
+
+    def fetch(self) -> int:
+        self.release.wait()
+        self.fetches += 1
+
+        if self.error is not None:
+            raise self.error
+
+        return next(self._payloads)
+
+
+@pytest.fixture
+def started():
+    prefetchers = []
+
+    def start(prefetcher: FeedPrefetcher) -> FeedPrefetcher:
+        prefetchers.append(prefetcher)
+        prefetcher.start()
+        return prefetcher
+
+    yield start
+
+    for p in prefetchers:
+        p.stop()
+
+
+def test_payloads_in_order(started):
+    prefetcher = started(FeedPrefetcher(StubFeed().fetch))
+
+    assert [prefetcher.get(timeout=1) for _ in range(3)] == [1, 2, 3]
+
+
+def test_fetch_error_reaches_the_cycle(started):
+    prefetcher = started(FeedPrefetcher(StubFeed(ConnectionError('feed down')).fetch))
+
+    with pytest.raises(ConnectionError, match='feed down'):
+        prefetcher.get(timeout=1)
+
+
+def test_get_times_out_without_a_payload(started):
+    feed = StubFeed()
+    feed.release.clear()
+    prefetcher = started(FeedPrefetcher(feed.fetch))
+
+    with pytest.raises(TimeoutError):
+        prefetcher.get(timeout=0.05)
+
+    feed.release.set()
+
+
+def test_stale_payload_is_dropped_for_a_fresh_one(started):
+    prefetcher = started(FeedPrefetcher(StubFeed().fetch, max_payload_age=0.05))
+
+    assert prefetcher.get(timeout=1) == 1
+
+    # Payload 2 is fetched right away and goes stale while the consumer is busy
+    sleep(0.1)
+
+    assert prefetcher.get(timeout=1) == 3
+    assert prefetcher.dropped_payloads == 1
+
+
+def test_no_polling_without_demand(started):
+    feed = StubFeed()
+    prefetcher = started(FeedPrefetcher(feed.fetch, max_payload_age=0.01))
+
+    prefetcher.get(timeout=1)
+    sleep(0.1)
+
+    # The payload for the next get and nothing more
+    assert feed.fetches == 2
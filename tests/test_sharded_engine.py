@@ -0,0 +1,99 @@
+import json
+import os
+import signal
+from datetime import datetime, timedelta
+
+import pytest
+
+from benchmarks.synthetic_feed import SyntheticFeed
+from cws.api.models import Event
+from cws.core.filter_index import FilterIndex
+from cws.core.sharded_engine import ShardedSnapshotEngine
+from cws.core.snapshot_store import SnapshotStore
+
+START = datetime(2021, 1, 1)
+
+
+def parse(feed: SyntheticFeed):
+    return Event.from_json_multiple(json.loads(feed.serialize()))
+
+
+def make_feed():
+    return SyntheticFeed(event_count=20, tips_per_event=10, churn_rate=0.2)
+
+
+FILTERS = FilterIndex({(e.sport_id, t.market_group_id, t.bet_group_id, 10) for e in parse(make_feed()) for t in e.tips})
+
+
+def triggered_ids(engine):
+    return [(e.id, [t.id for t in tips]) for e, tips in engine.find_triggered_tip_groups(FILTERS, 1.0, 100.0, 0)]
+
+
+@pytest.fixture
+def sharded():
+    engine = ShardedSnapshotEngine(SnapshotStore, 2)
+    yield engine
+    engine.stop()
+
+
+def run_cycles(engines, feed, cycles, start=0):
+    for cycle in range(start, start + cycles):
+        events = parse(feed)
+
+        for engine in engines:
+            engine.update(events, START + timedelta(seconds=5 * cycle), FILTERS)
+
+        feed.advance()
+
+
+def test_same_results_as_one_engine(sharded):
+    feed = make_feed()
+    single = SnapshotStore()
+    run_cycles([single, sharded], feed, 6)
+
+    assert triggered_ids(sharded) == triggered_ids(single)
+    assert sorted(sharded.export_tip_states()) == sorted(single.export_tip_states())
+
+
+def test_killed_worker_is_replaced_with_its_whole_shard(sharded):
+    feed = make_feed()
+    single = SnapshotStore()
+    run_cycles([single, sharded], feed, 3)
+
+    process, _ = sharded._workers[0]
+    os.kill(process.pid, signal.SIGKILL)
+    process.join()
+
+    # The next message to the dead worker fails on send, not only on the reply
+    run_cycles([single, sharded], feed, 3, start=3)
+
+    assert sharded._workers[0][0] is not process
+    assert sharded._workers[0][0].is_alive()
+
+    # The new worker tracks every tip of its shard, only the idle times start over
+    states = sharded.export_tip_states()
+    assert sorted(s[:5] for s in states) == sorted(s[:5] for s in single.export_tip_states())
+    assert {s[5] for s in states if sharded._shard(s[0]) == 0} <= {0, 5, 10}
+
+
+def test_failed_update_resends_the_whole_shard(sharded):
+    feed = make_feed()
+    single = SnapshotStore()
+    run_cycles([single, sharded], feed, 2)
+
+    # Recorded as sent although the worker of shard 0 never got it, so its patch fails there with a KeyError
+    events = parse(feed)
+    ghost = Event(*Event._FIELD_VALUES(next(e for e in events if sharded._shard(e.id) == 0)))
+    ghost.id += 2 * 10 ** 6
+    sharded._sent[0][ghost.id] = ghost
+    worker_process = sharded._workers[0][0]
+
+    with pytest.raises(KeyError):
+        sharded.update(events + [Event(*Event._FIELD_VALUES(ghost))], START + timedelta(seconds=10), FILTERS)
+
+    assert sharded._sent[0] == {}
+    assert sharded._workers[0][0] is worker_process
+
+    run_cycles([single, sharded], feed, 2, start=2)
+
+    assert sorted(s[:5] for s in sharded.export_tip_states()) == sorted(s[:5] for s in single.export_tip_states())
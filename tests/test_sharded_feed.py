@@ -0,0 +1,88 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from cws.api.sharded_feed import ShardedEventFeed
+
+TIMESTAMP = datetime(2021, 1, 1)
+
+
+class FakeApi:
+    def __init__(self, events, apply_sport_filter: bool = True, failing_sport_id: int = None, cap: int = None):
+        self.events = events
+        self.cap = cap
+        self.apply_sport_filter = apply_sport_filter
+        self.failing_sport_id = failing_sport_id
+        self.full_requests = 0
+
+    def get_all_live_events(self):
+        self.full_requests += 1
+        return list(self.events[:self.cap]), TIMESTAMP
+
+    def get_live_sport_events(self, sport_id: int):
+        if sport_id == self.failing_sport_id:
+            raise ConnectionError('connection reset')
+
+        if self.apply_sport_filter:
+            return [e for e in self.events if e.sport_id == sport_id], TIMESTAMP
+        else:
+            return list(self.events), TIMESTAMP
+
+
+@pytest.fixture
+def events():
+    return [SimpleNamespace(id=i, sport_id=sport_id) for i, sport_id in enumerate([1, 1, 2, 4])]
+
+
+def sharded_feed(api: FakeApi) -> ShardedEventFeed:
+    feed = ShardedEventFeed(api, discovery_interval=100)
+    feed.get_live_events(set())
+
+    return feed
+
+
+def test_shards_cover_every_event_once(events):
+    feed = sharded_feed(FakeApi(events))
+    shard_events, _ = feed.get_live_events(set())
+
+    assert sorted(e.id for e in shard_events) == [0, 1, 2, 3]
+
+
+def test_ignored_sport_filter_does_not_repeat_events(events):
+    feed = sharded_feed(FakeApi(events, apply_sport_filter=False))
+    shard_events, _ = feed.get_live_events(set())
+
+    assert sorted(e.id for e in shard_events) == [0, 1, 2, 3]
+    assert feed.foreign_events == 8
+    assert feed.active_sport_ids == {1, 2, 4}
+
+
+def test_failing_shard_falls_back_to_the_full_feed(events):
+    api = FakeApi(events, failing_sport_id=2)
+    feed = sharded_feed(api)
+    shard_events, _ = feed.get_live_events(set())
+
+    assert sorted(e.id for e in shard_events) == [0, 1, 2, 3]
+    assert api.full_requests == 2
+    assert feed.fallbacks == 1
+
+
+def test_capped_discovery_requests_every_known_sport(events, monkeypatch):
+    monkeypatch.setattr(ShardedEventFeed, 'EVENT_CAP', 3)
+    feed = ShardedEventFeed(FakeApi(events, cap=3), discovery_interval=100)
+
+    # Sport 4 is cut off by the cap, sport 7 is known but not live
+    discovered, _ = feed.get_live_events(set(), {1, 2, 4, 7})
+    shard_events, _ = feed.get_live_events(set(), {1, 2, 4, 7})
+
+    assert sorted(e.id for e in discovered) == [0, 1, 2]
+    assert sorted(e.id for e in shard_events) == [0, 1, 2, 3]
+    assert feed.active_sport_ids == {1, 2, 4}
+
+
+def test_uncapped_discovery_requests_only_live_sports(events):
+    feed = ShardedEventFeed(FakeApi(events), discovery_interval=100)
+    feed.get_live_events(set(), {1, 2, 4, 7})
+
+    assert feed.active_sport_ids == {1, 2, 4}
@@ -0,0 +1,83 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from benchmarks.synthetic_feed import SyntheticFeed
+from cws.api.models import Event
+from cws.core.filter_index import FilterIndex
+from cws.core.snapshot_store import SnapshotStore
+
+START = datetime(2021, 1, 1)
+
+
+def parse(feed: SyntheticFeed):
+    # Parsed without a cache, so no tip is the same object as in the previous cycle
+    return Event.from_json_multiple(json.loads(feed.serialize()))
+
+
+def all_filters(events, trigger_time: int = 10) -> FilterIndex:
+    return FilterIndex({(e.sport_id, t.market_group_id, t.bet_group_id, trigger_time) for e in events for t in e.tips})
+
+
+@pytest.fixture
+def feed():
+    return SyntheticFeed(event_count=10, tips_per_event=10, churn_rate=0.0)
+
+
+def test_unchanged_tips_keep_their_groups(feed):
+    store = SnapshotStore()
+    events = parse(feed)
+    filters = all_filters(events)
+    store.update(events, START, filters)
+    groups = {event_id: state.groups for event_id, state in store.events.items()}
+
+    feed.advance()
+    store.update(parse(feed), START + timedelta(seconds=5), filters)
+
+    assert store.rebuilt_groups == 0
+    assert all(store.events[event_id].groups == g for event_id, g in groups.items())
+    assert all(g is store.events[event_id].groups[k] for event_id, gs in groups.items() for k, g in gs.items())
+
+
+def test_events_are_replaced_every_cycle(feed):
+    store = SnapshotStore()
+    filters = all_filters(parse(feed))
+    store.update(parse(feed), START, filters)
+
+    feed.advance()
+    events = parse(feed)
+    store.update(events, START + timedelta(seconds=5), filters)
+
+    assert all(store.events[e.id].event is e for e in events)
+
+
+def test_changed_odds_rebuild_their_group_only(feed):
+    store = SnapshotStore()
+    events = parse(feed)
+    filters = all_filters(events)
+    store.update(events, START, filters)
+
+    changed_tip = feed._events[0]['ml'][0]['msl'][0]
+    changed_tip['msp'] += 1
+    store.update(parse(feed), START + timedelta(seconds=5), filters)
+
+    group = next(g for g in store.events[feed._events[0]['ei']].groups.values() if changed_tip['msi'] in g.tips)
+
+    assert store.rebuilt_groups == 1
+    assert store.changed_tips == 1
+    assert group.last_changes[changed_tip['msi']] == group.last_change
+    assert store.timestamp - group.last_change == 0
+
+
+def test_changed_trigger_time_rebuilds_the_groups(feed):
+    store = SnapshotStore()
+    events = parse(feed)
+    store.update(events, START, all_filters(events, 10))
+    group_count = sum(len(state.groups) for state in store.events.values())
+
+    store.update(parse(feed), START + timedelta(seconds=5), all_filters(events, 20))
+
+    assert store.rebuilt_groups == group_count
+    assert store.changed_tips == 0
+    assert all(g.trigger_time == 20 for state in store.events.values() for g in state.groups.values())
@@ -0,0 +1,177 @@
+import pytest
+from telegram.error import BadRequest, NetworkError, RetryAfter
+
+from cws.core.telegram_dispatcher import TelegramDispatcher
+
+CHAT = '42'
+GROUP = '-100'
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+class FakeTelegram:
+    def __init__(self):
+        self.sent = []
+        self.errors = []
+
+    def send(self, chat_id: str, text: str):
+        if len(self.errors) > 0:
+            error = self.errors.pop(0)
+
+            if callable(error) and not isinstance(error, Exception):
+                error = error()
+
+            if error is not None:
+                raise error
+
+        self.sent.append((chat_id, text))
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def telegram():
+    return FakeTelegram()
+
+
+@pytest.fixture
+def dispatcher(clock, telegram):
+    # Driven step by step, the sender thread is never started
+    return TelegramDispatcher(telegram.send, clock=clock)
+
+
+def drain(dispatcher: TelegramDispatcher, clock: FakeClock, limit: int = 100):
+    # Runs the sender until the queue is empty, waiting out the limiter on the fake clock. Returns the waits.
+    waits = []
+
+    for _ in range(limit):
+        if dispatcher.queue_depth == 0:
+            return waits
+
+        delay = dispatcher._dispatch_next()
+
+        if delay > 0:
+            waits.append(delay)
+            clock.advance(delay)
+
+    raise AssertionError('The queue was not drained')
+
+
+def test_newer_rendering_replaces_the_queued_one_in_place(dispatcher, clock, telegram):
+    dispatcher.submit(CHAT, [(1, 'one'), (2, 'two')])
+    dispatcher.submit(CHAT, [(1, 'one, updated')])
+
+    drain(dispatcher, clock)
+
+    assert telegram.sent == [(CHAT, 'one, updated\n\ntwo')]
+    assert dispatcher.coalesced_notifications == 1
+    assert dispatcher.sent_notifications == 2
+
+
+def test_batches_fill_up_to_the_message_length_in_order(dispatcher, clock, telegram):
+    texts = ['a' * 2000, 'b' * 2000, 'c' * 2000, 'd' * 10]
+    dispatcher.submit(CHAT, enumerate(texts))
+
+    drain(dispatcher, clock)
+
+    # 'c' does not fit behind 'a' and 'b', the short 'd' still does
+    assert [text for _, text in telegram.sent] == ['\n\n'.join(texts[:2] + texts[3:]), texts[2]]
+    assert all(len(text) <= TelegramDispatcher.MAX_MSG_LENGTH for _, text in telegram.sent)
+
+
+def test_one_message_per_second_in_a_chat(dispatcher, clock, telegram):
+    dispatcher.submit(CHAT, [(1, 'x' * 4000), (2, 'y' * 4000), (3, 'z' * 4000)])
+
+    waits = drain(dispatcher, clock)
+
+    assert len(telegram.sent) == 3
+    assert waits == [pytest.approx(1.0)] * 2
+
+
+def test_group_burst_then_its_own_rate(dispatcher, clock, telegram):
+    dispatcher.submit(GROUP, [(i, str(i) * 4000) for i in range(7)])
+
+    waits = drain(dispatcher, clock)
+
+    # Five at the chat rate use up the burst, the group bucket refilled one more meanwhile, then 4 s apart
+    assert len(telegram.sent) == 7
+    assert waits == [pytest.approx(1.0)] * 5 + [pytest.approx(3.0)]
+
+
+def test_retry_after_pauses_the_chat_without_counting_an_attempt(dispatcher, clock, telegram):
+    telegram.errors = [RetryAfter(30)]
+    dispatcher.submit(CHAT, [(1, 'one')])
+
+    waits = drain(dispatcher, clock)
+
+    assert waits == [pytest.approx(30.0)]
+    assert telegram.sent == [(CHAT, 'one')]
+    assert dispatcher.rate_limited_sends == 1
+    assert dispatcher.failed_notifications == 0
+
+
+def test_network_errors_back_off_and_give_up_after_max_attempts(dispatcher, clock, telegram):
+    telegram.errors = [NetworkError('timed out')] * TelegramDispatcher.MAX_ATTEMPTS
+    dispatcher.submit(CHAT, [(1, 'one')])
+
+    waits = drain(dispatcher, clock)
+
+    assert telegram.sent == []
+    assert waits == [pytest.approx(TelegramDispatcher.RETRY_DELAY * 2 ** i) for i in range(TelegramDispatcher.MAX_ATTEMPTS - 1)]
+    assert dispatcher.failed_notifications == 1
+
+
+def test_network_error_retries_until_delivered(dispatcher, clock, telegram):
+    telegram.errors = [NetworkError('timed out')]
+    dispatcher.submit(CHAT, [(1, 'one')])
+
+    drain(dispatcher, clock)
+
+    assert telegram.sent == [(CHAT, 'one')]
+    assert dispatcher.failed_notifications == 0
+
+
+def test_bad_request_drops_the_batch(dispatcher, clock, telegram):
+    telegram.errors = [BadRequest('message is too long')]
+    dispatcher.submit(CHAT, [(1, 'one'), (2, 'two')])
+
+    drain(dispatcher, clock)
+
+    assert telegram.sent == []
+    assert dispatcher.failed_notifications == 2
+
+
+def test_requeued_batch_goes_first_and_keeps_newer_renderings(dispatcher, clock, telegram):
+    def fail_while_updated():
+        dispatcher.submit(CHAT, [(1, 'one, updated'), (3, 'three')])
+        return NetworkError('timed out')
+
+    telegram.errors = [fail_while_updated]
+    dispatcher.submit(CHAT, [(1, 'x' * 4000), (2, 'y' * 4000)])
+
+    drain(dispatcher, clock)
+
+    # The failed batch was only the first notification, which goes out again before the younger ones
+    assert telegram.sent == [(CHAT, 'one, updated\n\n' + 'y' * 4000 + '\n\nthree')]
+
+
+def test_full_queue_drops_the_oldest(clock, telegram):
+    dispatcher = TelegramDispatcher(telegram.send, max_queue_size=2, clock=clock)
+    dispatcher.submit(CHAT, [(1, 'one'), (2, 'two'), (3, 'three')])
+
+    drain(dispatcher, clock)
+
+    assert telegram.sent == [(CHAT, 'two\n\nthree')]
+    assert dispatcher.dropped_notifications == 1
@@ -0,0 +1,86 @@
+import threading
+
+import pytest
+
+from cws.update_broadcaster import UpdateBroadcaster
+
+
+class FakePubSub:
+    def __init__(self, messages):
+        self.messages = list(messages)
+        self.closed = False
+
+    def get_message(self, timeout: float):
+        # A quiet channel once the messages are used up
+        if len(self.messages) == 0:
+            return None
+
+        message = self.messages.pop(0)
+
+        if isinstance(message, Exception):
+            raise message
+
+        return message
+
+    def close(self):
+        self.closed = True
+
+
+class FakeRedisManager:
+    def __init__(self, pubsubs):
+        self.pubsubs = list(pubsubs)
+        self.subscribed = threading.Event()
+        self.exhausted = threading.Event()
+
+    def subscribe_updates(self):
+        if len(self.pubsubs) == 0:
+            self.exhausted.set()
+            raise ConnectionError('Redis is gone')
+
+        self.subscribed.set()
+        return self.pubsubs.pop(0)
+
+    def get_status(self):
+        return {'status': None}
+
+    def notifications_exist(self):
+        return True
+
+
+@pytest.fixture(autouse=True)
+def short_reconnect_delay(monkeypatch):
+    monkeypatch.setattr(UpdateBroadcaster, 'RECONNECT_DELAY', 0.01)
+
+
+def test_reconnects_after_any_error_and_closes_the_old_channel(capsys):
+    update = b'{"type": "notifications", "version": 3, "replace": false}'
+    pubsubs = [FakePubSub([ValueError('bad message')]), FakePubSub([{'type': 'message', 'data': update}, KeyError()])]
+    broadcaster = UpdateBroadcaster(FakeRedisManager(pubsubs))
+
+    subscription = broadcaster.subscribe()
+    assert broadcaster.redis_manager.exhausted.wait(5)
+    broadcaster.stop()
+
+    assert all(p.closed for p in pubsubs)
+    assert 'Update channel lost: ValueError: bad message' in capsys.readouterr().out
+
+    updates = []
+
+    while not subscription._queue.empty():
+        updates.append(subscription.get(timeout=0))
+
+    assert (3, False, update.decode()) in updates
+
+
+def test_stop_closes_the_channel_and_ends_the_thread():
+    pubsub = FakePubSub([])
+    broadcaster = UpdateBroadcaster(FakeRedisManager([pubsub]))
+
+    broadcaster.subscribe()
+    thread = broadcaster._thread
+    assert broadcaster.redis_manager.subscribed.wait(5)
+    broadcaster.stop()
+
+    assert not thread.is_alive()
+    assert broadcaster._thread is None
+    assert pubsub.closed
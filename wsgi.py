@@ -0,0 +1,5 @@
+from app import init_app
+
+# Web-only application, safe to run under any number of WSGI workers. Every open dashboard holds a /stream response,
+# so the workers need threads to spare, e.g. gunicorn -w 4 -k gthread --threads 32 wsgi:application
+application = init_app(launch_core=False)